@@ -11,6 +11,14 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'OptifireAPP.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'OptifireAPT.settings')
 
 application = get_asgi_application()
+
+# Workers de PDF listos antes del primer request (usuarios/pdf.py). Va aquí y
+# no en AppConfig.ready() para no levantar procesos en migrate/test/shell.
+from django.conf import settings
+
+if getattr(settings, 'PDF_PRECALENTAR', False):
+    from usuarios.pdf import precalentar_pool
+    precalentar_pool()
@@ -49,6 +49,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'usuarios.middleware.RolesUsuarioMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -86,6 +87,62 @@ DATABASES = {
     }
 }
 
+# SQLite con escrituras concurrentes (usuarios/sqlite.py). Opt-in: WAL,
+# synchronous=NORMAL y transacciones BEGIN IMMEDIATE en cada conexión.
+# Comparar antes/después con `python manage.py benchmark_sqlite`.
+SQLITE_AJUSTES = False
+SQLITE_BUSY_TIMEOUT = 20            # s que una escritura espera el lock antes de "database is locked"
+SQLITE_MMAP_MB = 256                # Lecturas vía mmap (0 = desactivado)
+SQLITE_CACHE_MB = 64                # Cache de páginas por conexión
+
+# Réplica de solo lectura y base propia para las notificaciones
+# (usuarios/routers.py). Ambas son opcionales y se activan por entorno:
+#   OPTIFIRE_DB_REPLICA=/ruta/replica.sqlite3
+#   OPTIFIRE_DB_NOTIFICACIONES=/ruta/notificaciones.sqlite3
+# Con OPTIFIRE_DB_<ALIAS>_ENGINE/_USER/_PASSWORD/_HOST/_PORT se usa otro motor.
+# La base de notificaciones se crea con `python manage.py migrate --database notificaciones`.
+def _base_datos_entorno(variable, **extra):
+    nombre = os.environ.get(variable)
+    if not nombre:
+        return None
+    return {
+        'ENGINE': os.environ.get(f'{variable}_ENGINE', 'django.db.backends.sqlite3'),
+        'NAME': nombre,
+        'USER': os.environ.get(f'{variable}_USER', ''),
+        'PASSWORD': os.environ.get(f'{variable}_PASSWORD', ''),
+        'HOST': os.environ.get(f'{variable}_HOST', ''),
+        'PORT': os.environ.get(f'{variable}_PORT', ''),
+        **extra,
+    }
+
+_replica = _base_datos_entorno('OPTIFIRE_DB_REPLICA', TEST={'MIRROR': 'default'})  # En tests, la réplica ES default
+if _replica:
+    DATABASES['replica'] = _replica
+_notificaciones = _base_datos_entorno('OPTIFIRE_DB_NOTIFICACIONES')
+if _notificaciones:
+    DATABASES['notificaciones'] = _notificaciones
+
+DATABASE_ROUTERS = ['usuarios.routers.OptifireRouter']
+
+
+# Autenticación: carga request.user junto a su Perfil en una sola consulta.
+# ModelBackend queda después: las sesiones abiertas antes de PerfilBackend
+# guardan su ruta y, sin él, esos usuarios quedarían deslogueados.
+AUTHENTICATION_BACKENDS = [
+    'usuarios.backends.PerfilBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Guardar los roles del usuario en la sesión (evita consultar auth_group en
+# cada request). Requiere un CACHE compartido entre procesos (Redis/Memcached)
+# para que la invalidación al cambiar grupos llegue a todos los workers.
+ROLES_CACHE_SESION = False
+
+# Sin CACHES se usa locmem: un cache por proceso. Con varios workers
+# configurar uno compartido (Redis/Memcached); si no, la disponibilidad de
+# técnicos (usuarios/disponibilidad.py) solo se cachea unos segundos y
+# ROLES_CACHE_SESION debe quedar en False.
+
 
 # Password validation
 # https://docs.docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -189,4 +246,64 @@ DEFAULT_FROM_EMAIL = 'Optifire <notificaciones@optifire.cl>'
 
 # Correo del equipo de Cobranzas / Finanzas
 EMAIL_COBRANZA_DESTINO = 'guerraflorescarlos@gmail.com' # <--- CAMBIA ESTO POR EL REAL
-IVA_CHILE = 0.19 # 19%
\ No newline at end of file
+IVA_CHILE = 0.19 # 19%
+
+# -------------------------------------------------------------
+# LOGS (logger "usuarios": servicios, workers y comandos de la app)
+# -------------------------------------------------------------
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '{asctime} {levelname} {name}: {message}', 'style': '{'},
+    },
+    'handlers': {
+        'consola': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        'usuarios': {
+            'handlers': ['consola'],
+            'level': os.environ.get('OPTIFIRE_LOG_NIVEL', 'INFO'),
+        },
+    },
+}
+
+# -------------------------------------------------------------
+# BANDEJA DE SALIDA DE CORREOS (python manage.py enviar_correos)
+# -------------------------------------------------------------
+CORREOS_TAMANO_LOTE = 50        # Correos enviados por conexión SMTP
+CORREOS_MAX_INTENTOS = 5        # Luego el correo queda FALLIDO (dead-letter)
+CORREOS_BACKOFF_BASE = 60       # Segundos; se duplica en cada reintento
+CORREOS_BACKOFF_MAXIMO = 3600
+
+# -------------------------------------------------------------
+# SERVICIO DE PDF (WeasyPrint en procesos precalentados)
+# -------------------------------------------------------------
+PDF_WORKERS = 2                 # Procesos de render (0 = en el hilo de la vista)
+PDF_MAX_CONCURRENCIA = 4        # Renders en vuelo por proceso web
+PDF_TIMEOUT = 60                # Segundos máximos de espera por PDF
+PDF_PRECALENTAR = True          # Levantar los workers al arrancar el servidor web
+
+# -------------------------------------------------------------
+# FOTOS DE EVIDENCIA (usuarios/imagenes.py)
+# -------------------------------------------------------------
+EVIDENCIA_EN_SEGUNDO_PLANO = True   # Procesar fuera del request
+EVIDENCIA_HILOS = 2
+EVIDENCIA_FORMATO = 'JPEG'          # 'JPEG' o 'WEBP'
+EVIDENCIA_LADO_MAXIMO = 1600        # px del lado mayor de la foto guardada
+EVIDENCIA_CALIDAD = 82
+EVIDENCIA_LADO_MINIATURA = 200      # px (miniatura cuadrada)
+EVIDENCIA_CALIDAD_MINIATURA = 75
+CHECKLIST_HILOS_SUBIDA = 4          # Fotos del checklist subidas en paralelo (usuarios/checklist.py)
+
+# -------------------------------------------------------------
+# NOTIFICACIONES (usuarios/notificaciones.py)
+# -------------------------------------------------------------
+NOTIFICACIONES_MAX_VISIBLES = 5     # Toasts mostrados por página
+
+# Tiempo real (usuarios/tiempo_real.py). Con varios workers usar
+# 'usuarios.tiempo_real.BackendRedis' y definir TIEMPO_REAL_REDIS_URL.
+TIEMPO_REAL_BACKEND = 'usuarios.tiempo_real.BackendMemoria'
+TIEMPO_REAL_DURACION_STREAM = 300   # s que dura una conexión SSE (ASGI)
+TIEMPO_REAL_ESPERA = 25             # s máximos de un long-poll
+TIEMPO_REAL_LATIDO = 15             # s entre comentarios keep-alive del SSE
\ No newline at end of file
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'OptifireAPP.settings')
 
 application = get_wsgi_application()
+
+# Workers de PDF listos antes del primer request (usuarios/pdf.py). Va aquí y
+# no en AppConfig.ready() para no levantar procesos en migrate/test/shell.
+from django.conf import settings
+
+if getattr(settings, 'PDF_PRECALENTAR', False):
+    from usuarios.pdf import precalentar_pool
+    precalentar_pool()
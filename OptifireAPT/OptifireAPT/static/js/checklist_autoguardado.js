@@ -0,0 +1,121 @@
+/**
+ * Autoguardado del checklist (completar_inspeccion).
+ * Cada cambio se envía solo: el estado/observación de UNA tarea como PATCH JSON
+ * (con espera de AUTOGUARDADO_ESPERA_MS para agrupar lo que se teclea) y cada
+ * foto en su propio POST, en vez de reenviar el formulario completo.
+ * Si algo falla, el dato queda en el formulario y viaja con "Guardar Progreso".
+ */
+
+const AUTOGUARDADO_ESPERA_MS = 800;   // Espera tras la última tecla antes de enviar
+const AUTOGUARDADO_REINTENTO_MS = 5000;
+
+const formularioChecklist = document.getElementById('inspectionForm');
+const pendientesPorTarea = new Map();   // id tarea -> {campo: valor} aún sin enviar
+const temporizadores = new Map();       // id tarea -> setTimeout del envío
+
+function urlTarea(plantilla, tareaId) {
+    return plantilla.replace('/0/', '/' + tareaId + '/');
+}
+
+function tokenCsrf() {
+    return formularioChecklist.querySelector('[name=csrfmiddlewaretoken]').value;
+}
+
+// 1. INDICADOR DE ESTADO (por tarjeta)
+function mostrarEstado(tarjeta, texto, clase) {
+    const indicador = tarjeta.querySelector('[data-autoguardado-estado]');
+    if (!indicador) return;
+    indicador.innerText = texto;
+    indicador.className = 'small ms-auto ' + clase;
+}
+
+// 2. PATCH DE UNA TAREA (solo los campos que cambiaron)
+async function enviarTarea(tarjeta, tareaId, mantenerVivo = false) {
+    const cambios = pendientesPorTarea.get(tareaId);
+    if (!cambios) return;
+    pendientesPorTarea.delete(tareaId);
+    mostrarEstado(tarjeta, 'Guardando…', 'text-muted');
+
+    try {
+        const respuesta = await fetch(urlTarea(formularioChecklist.dataset.urlTarea, tareaId), {
+            method: 'PATCH',
+            headers: { 'Content-Type': 'application/json', 'X-CSRFToken': tokenCsrf() },
+            body: JSON.stringify(cambios),
+            credentials: 'same-origin',
+            keepalive: mantenerVivo,
+        });
+        if (respuesta.status === 400 || respuesta.status === 409) {
+            mostrarEstado(tarjeta, 'No se pudo guardar: revise el formulario.', 'text-danger');
+            return;
+        }
+        if (!respuesta.ok) throw new Error(respuesta.status);
+        mostrarEstado(tarjeta, 'Guardado ✓', 'text-success');
+    } catch (error) {
+        // Sin red: se reintenta (lo más nuevo que se haya escrito gana)
+        pendientesPorTarea.set(tareaId, Object.assign(cambios, pendientesPorTarea.get(tareaId)));
+        mostrarEstado(tarjeta, 'Sin conexión, reintentando…', 'text-warning');
+        programarEnvio(tarjeta, tareaId, AUTOGUARDADO_REINTENTO_MS);
+    }
+}
+
+function programarEnvio(tarjeta, tareaId, espera) {
+    clearTimeout(temporizadores.get(tareaId));
+    temporizadores.set(tareaId, setTimeout(() => enviarTarea(tarjeta, tareaId), espera));
+}
+
+function registrarCambio(tarjeta, campo, valor) {
+    const tareaId = tarjeta.dataset.tarea;
+    const cambios = pendientesPorTarea.get(tareaId) || {};
+    cambios[campo] = valor;
+    pendientesPorTarea.set(tareaId, cambios);
+    mostrarEstado(tarjeta, 'Cambios sin guardar', 'text-muted');
+    programarEnvio(tarjeta, tareaId, AUTOGUARDADO_ESPERA_MS);
+}
+
+// 3. SUBIDA DE UNA FOTO
+async function subirFoto(tarjeta, input) {
+    if (!input.files.length) return;
+    const datos = new FormData();
+    datos.append('imagen_evidencia', input.files[0]);
+    mostrarEstado(tarjeta, 'Subiendo foto…', 'text-muted');
+
+    try {
+        const respuesta = await fetch(urlTarea(formularioChecklist.dataset.urlEvidencia, tarjeta.dataset.tarea), {
+            method: 'POST',
+            headers: { 'X-CSRFToken': tokenCsrf() },
+            body: datos,
+            credentials: 'same-origin',
+        });
+        if (!respuesta.ok) throw new Error(respuesta.status);
+        // Ya está en el servidor: no se vuelve a enviar con el formulario
+        input.value = '';
+        mostrarEstado(tarjeta, 'Foto guardada ✓', 'text-success');
+    } catch (error) {
+        mostrarEstado(tarjeta, 'Foto pendiente: se enviará al guardar el progreso.', 'text-warning');
+    }
+}
+
+// 4. ENGANCHE DE CADA TARJETA
+formularioChecklist.querySelectorAll('[data-tarea]').forEach(tarjeta => {
+    const estado = tarjeta.querySelector('[name$="-estado"]');
+    const observacion = tarjeta.querySelector('[name$="-observacion"]');
+    const foto = tarjeta.querySelector('[name$="-imagen_evidencia"]');
+
+    if (estado) estado.addEventListener('change', () => registrarCambio(tarjeta, 'estado', estado.value));
+    if (observacion) observacion.addEventListener('input', () => registrarCambio(tarjeta, 'observacion', observacion.value));
+    if (foto) foto.addEventListener('change', () => subirFoto(tarjeta, foto));
+});
+
+// 5. AL SALIR DE LA PÁGINA: enviar lo pendiente sin esperar la espera
+window.addEventListener('pagehide', () => {
+    formularioChecklist.querySelectorAll('[data-tarea]').forEach(tarjeta => {
+        clearTimeout(temporizadores.get(tarjeta.dataset.tarea));
+        enviarTarea(tarjeta, tarjeta.dataset.tarea, true);
+    });
+});
+
+// Al enviar el formulario completo, lo pendiente viaja en él
+formularioChecklist.addEventListener('submit', () => {
+    temporizadores.forEach(temporizador => clearTimeout(temporizador));
+    pendientesPorTarea.clear();
+});
@@ -62,6 +62,8 @@ function tomarFoto() {
         // Asignamos el archivo al input oculto de Django
         const input = document.getElementById(currentInputId);
         input.files = dataTransfer.files;
+        // Asignar .files no dispara "change": lo emitimos para el autoguardado
+        input.dispatchEvent(new Event('change'));
 
         // Actualizamos la vista previa visualmente
         mostrarPreview(canvas.toDataURL("image/jpeg"));
@@ -0,0 +1,125 @@
+"""
+Cache en disco de las actas de inspección en PDF.
+
+Cada acta se guarda en ``MEDIA_ROOT/actas/<id_inspeccion>/<huella>.pdf``.
+La huella es un SHA-256 de TODOS los datos que usa el template
+``pdf/acta_inspeccion.html`` (inspección, solicitud, técnico y tareas), por lo
+que cualquier cambio en ellos genera un archivo nuevo y el anterior se borra.
+La misma huella se usa como ETag al servir el archivo.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from .pdf import enviar_render, renderizar_pdf
+
+# Subir este número si cambia el template pdf/acta_inspeccion.html (o su .css)
+VERSION_PLANTILLA_ACTA = 2
+
+CARPETA_ACTAS = 'actas'
+
+logger = logging.getLogger(__name__)
+
+
+def obtener_tareas_acta(inspeccion):
+    return list(inspeccion.tareas.all().order_by('id'))
+
+
+def huella_acta(inspeccion, tareas):
+    """Hash del contenido del acta (sin renderizarla)."""
+    solicitud = inspeccion.solicitud
+    tecnico = inspeccion.tecnico
+    datos = [
+        VERSION_PLANTILLA_ACTA,
+        inspeccion.pk,
+        inspeccion.estado,
+        inspeccion.fecha_finalizacion,
+        inspeccion.comentarios_generales,
+        [
+            solicitud.nombre_cliente, solicitud.apellido_cliente, solicitud.direccion,
+            solicitud.telefono, solicitud.maquinaria,
+        ] if solicitud else None,
+        [tecnico.username, tecnico.first_name, tecnico.last_name],
+        [(t.pk, t.descripcion, t.estado, t.observacion) for t in tareas],
+    ]
+    contenido = json.dumps(datos, default=str, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def ruta_acta(inspeccion_id, huella):
+    return Path(settings.MEDIA_ROOT) / CARPETA_ACTAS / str(inspeccion_id) / f"{huella}.pdf"
+
+
+def html_acta(inspeccion, tareas):
+    return render_to_string('pdf/acta_inspeccion.html', {
+        'inspeccion': inspeccion,
+        'tareas': tareas,
+    })
+
+
+def _guardar(ruta, contenido):
+    """Escritura atómica: nunca se sirve un PDF a medio escribir."""
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(contenido)
+    os.replace(temporal, ruta)
+
+    # Eliminamos las versiones anteriores del acta de esta inspección
+    for anterior in ruta.parent.glob('*.pdf'):
+        if anterior != ruta:
+            anterior.unlink(missing_ok=True)
+
+
+def obtener_acta(inspeccion, tareas=None, huella=None):
+    """
+    Devuelve ``(ruta, huella)`` del PDF del acta, generándolo solo si no
+    existe una versión con el contenido actual.
+    """
+    if tareas is None:
+        tareas = obtener_tareas_acta(inspeccion)
+    if huella is None:
+        huella = huella_acta(inspeccion, tareas)
+
+    ruta = ruta_acta(inspeccion.pk, huella)
+    if not ruta.exists():
+        _guardar(ruta, renderizar_pdf(html_acta(inspeccion, tareas), 'acta_inspeccion'))
+    return ruta, huella
+
+
+def pregenerar_acta(inspeccion_id):
+    """
+    Genera el acta por adelantado (p.ej. al completar la inspección) sin
+    esperar el render: el pool de PDF la escribe en disco cuando termina.
+    Nunca bloquea a quien la llama: sin pool (PDF_WORKERS = 0) o sin cupo
+    libre no se pregenera y el acta se genera en la primera descarga.
+    """
+    from .models import Inspeccion
+
+    def _al_terminar(futuro):
+        try:
+            _guardar(ruta, futuro.result())
+        except Exception:
+            # El acta se generará en la primera descarga
+            logger.exception("No se pudo pregenerar el acta de la OT #%s", inspeccion_id)
+
+    if getattr(settings, 'PDF_WORKERS', 0) <= 0:
+        return
+    try:
+        inspeccion = Inspeccion.objects.select_related('solicitud', 'tecnico').get(pk=inspeccion_id)
+        tareas = obtener_tareas_acta(inspeccion)
+        ruta = ruta_acta(inspeccion.pk, huella_acta(inspeccion, tareas))
+        if not ruta.exists():
+            # timeout=0: con el pool saturado no se espera un cupo
+            enviar_render(html_acta(inspeccion, tareas), 'acta_inspeccion', timeout=0).add_done_callback(_al_terminar)
+    except TimeoutError:
+        logger.info("Pool de PDF saturado: el acta de la OT #%s se generará al descargarla", inspeccion_id)
+    except Exception:
+        logger.exception("No se pudo pregenerar el acta de la OT #%s", inspeccion_id)
@@ -1,8 +1,11 @@
 """Configuración del panel de administración de la app usuarios."""
 
 from django.contrib import admin
+from django.contrib.auth.models import User
 
 from .models import (
+    CorreoPendiente,
+    NotificacionArchivada,
     Inspeccion,
     PlantillaInspeccion,
     SolicitudInspeccion,
@@ -21,7 +24,7 @@ class PlantillaTareaInline(admin.TabularInline):
 
 @admin.register(PlantillaInspeccion)
 class PlantillaInspeccionAdmin(admin.ModelAdmin):
-    list_display = ("nombre", "fecha_creacion")
+    list_display = ("nombre", "version", "fecha_creacion")
     search_fields = ("nombre",)
     inlines = [PlantillaTareaInline]
 
@@ -44,4 +47,29 @@ class SolicitudInspeccionAdmin(admin.ModelAdmin):
 class TareaInspeccionAdmin(admin.ModelAdmin):
     list_display = ("inspeccion", "descripcion", "estado")
     list_filter = ("estado",)
-    search_fields = ("inspeccion__nombre_inspeccion", "descripcion")
\ No newline at end of file
+    search_fields = ("inspeccion__nombre_inspeccion", "descripcion")
+
+
+@admin.register(CorreoPendiente)
+class CorreoPendienteAdmin(admin.ModelAdmin):
+    """Permite revisar la bandeja de salida y los correos FALLIDOS."""
+
+    list_display = ("id", "asunto", "estado", "intentos", "proximo_intento", "fecha_envio")
+    list_filter = ("estado",)
+    search_fields = ("asunto", "ultimo_error")
+    exclude = ("adjunto_contenido",)
+
+
+@admin.register(NotificacionArchivada)
+class NotificacionArchivadaAdmin(admin.ModelAdmin):
+    list_display = ("usuario", "mensaje", "fecha_creacion", "fecha_archivado")
+    search_fields = ("mensaje",)
+    # Sin JOIN con auth_user: puede estar en otra base (usuarios/routers.py)
+    list_select_related = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset, duplicados = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            ids = list(User.objects.filter(username__icontains=search_term).values_list("pk", flat=True))
+            queryset |= self.model.objects.filter(usuario_id__in=ids)
+        return queryset, duplicados
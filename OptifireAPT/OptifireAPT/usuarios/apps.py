@@ -8,4 +8,6 @@ class UsuariosConfig(AppConfig):
     def ready(self):
         #  Importamos las señales para asegurarnos de que se conecten
         # Esto hace que las funciones de notificacion se registren.
-        import usuarios.signals
\ No newline at end of file
+        import usuarios.signals
+        # PRAGMAs de SQLite al abrir cada conexión (solo con SQLITE_AJUSTES)
+        import usuarios.sqlite
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""
+Motor de asignación automática de técnicos.
+
+Cada técnico activo recibe un puntaje para una solicitud (mayor = mejor):
+
+* Carga actual: inspecciones ASIGNADAS/EN CURSO más las solicitudes que ya
+  tiene preasignadas y aún no se convierten en OT (PENDIENTE/COTIZANDO).
+* Disponibilidad: cuántos trabajos tiene ese mismo día
+  (``fecha_programada_preasignada`` de la solicitud o la fecha indicada).
+* Zona: la solicitud solo tiene ``direccion`` (texto libre), así que se busca
+  la ``ciudad`` y la ``region`` del Perfil del técnico dentro de ella.
+
+El ranking de TODOS los candidatos se calcula con un número fijo de consultas
+(técnicos, cargas, reservas y ocupación por fecha), sin importar cuántos
+técnicos o solicitudes haya. ``asignar_pendientes`` reparte un lote completo
+de solicitudes PENDIENTES actualizando las cargas en memoria a medida que
+asigna, y guarda todo con un solo ``bulk_update``.
+"""
+
+import unicodedata
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count
+
+from .disponibilidad import ESTADOS_OCUPADO, invalidar_disponibilidad
+from .models import EstadoSolicitud, Inspeccion, Roles, SolicitudInspeccion
+
+# Pesos del puntaje
+PESO_CARGA = 1.0
+PESO_MISMO_DIA = 3.0
+PESO_CIUDAD = 4.0
+PESO_REGION = 1.5
+
+# Solicitudes con técnico preasignado que todavía no son OT
+ESTADOS_RESERVA = (EstadoSolicitud.PENDIENTE, EstadoSolicitud.COTIZANDO)
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes, para comparar 'Viña del Mar' con 'vina del mar'."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower().strip()
+
+
+class Candidato:
+    def __init__(self, tecnico, carga):
+        self.tecnico = tecnico
+        self.carga = carga
+        self.trabajos_dia = 0
+        self.misma_ciudad = False
+        self.misma_region = False
+        perfil = getattr(tecnico, 'perfil', None)
+        self._ciudad = normalizar(perfil.ciudad) if perfil else ''
+        self._region = normalizar(perfil.region) if perfil else ''
+
+    @property
+    def puntaje(self):
+        return round(
+            - PESO_CARGA * self.carga
+            - PESO_MISMO_DIA * self.trabajos_dia
+            + PESO_CIUDAD * self.misma_ciudad
+            + PESO_REGION * self.misma_region,
+            2,
+        )
+
+    def evaluar(self, direccion_normalizada, trabajos_dia):
+        self.trabajos_dia = trabajos_dia
+        self.misma_ciudad = bool(self._ciudad) and self._ciudad in direccion_normalizada
+        self.misma_region = bool(self._region) and self._region in direccion_normalizada
+        return self
+
+
+class Asignador:
+    """
+    Carga una sola vez el estado de todos los técnicos (y la ocupación de las
+    ``fechas`` indicadas) y luego rankea solicitudes sin más consultas.
+    """
+
+    def __init__(self, fechas=()):
+        tecnicos = list(
+            User.objects.filter(groups__name=Roles.TECNICO, is_active=True)
+            .select_related('perfil').order_by('id')
+        )
+        ids = [t.pk for t in tecnicos]
+
+        carga = Counter(dict(
+            Inspeccion.objects.filter(tecnico_id__in=ids, estado__in=ESTADOS_OCUPADO)
+            .values_list('tecnico_id').annotate(n=Count('id')).order_by()
+        ))
+        carga.update(dict(
+            SolicitudInspeccion.objects.filter(tecnico_preasignado_id__in=ids, estado__in=ESTADOS_RESERVA)
+            .values_list('tecnico_preasignado_id').annotate(n=Count('id')).order_by()
+        ))
+
+        self.ocupacion = Counter()
+        fechas = {f for f in fechas if f}
+        if fechas:
+            self.ocupacion.update(dict(
+                ((tecnico_id, fecha), n) for tecnico_id, fecha, n in
+                Inspeccion.objects.filter(tecnico_id__in=ids, estado__in=ESTADOS_OCUPADO, fecha_programada__in=fechas)
+                .values_list('tecnico_id', 'fecha_programada').annotate(n=Count('id')).order_by()
+            ))
+            self.ocupacion.update(dict(
+                ((tecnico_id, fecha), n) for tecnico_id, fecha, n in
+                SolicitudInspeccion.objects.filter(
+                    tecnico_preasignado_id__in=ids, estado__in=ESTADOS_RESERVA,
+                    fecha_programada_preasignada__in=fechas,
+                ).values_list('tecnico_preasignado_id', 'fecha_programada_preasignada').annotate(n=Count('id')).order_by()
+            ))
+
+        self.candidatos = [Candidato(t, carga[t.pk]) for t in tecnicos]
+        self._por_id = {c.tecnico.pk: c for c in self.candidatos}
+
+    def ranking(self, solicitud, fecha=None):
+        """Candidatos ordenados del mejor al peor para ``solicitud``."""
+        fecha = fecha or solicitud.fecha_programada_preasignada
+        direccion = normalizar(solicitud.direccion)
+        evaluados = [
+            c.evaluar(direccion, self.ocupacion[(c.tecnico.pk, fecha)] if fecha else 0)
+            for c in self.candidatos
+        ]
+        # Desempate estable por id: el resultado es reproducible
+        return sorted(evaluados, key=lambda c: (-c.puntaje, c.tecnico.pk))
+
+    def reservar(self, candidato, fecha=None, cantidad=1):
+        """Suma la nueva asignación a la carga en memoria (para el resto del lote)."""
+        candidato.carga += cantidad
+        if fecha:
+            self.ocupacion[(candidato.tecnico.pk, fecha)] += cantidad
+
+    def liberar(self, tecnico_id, fecha=None):
+        """Descuenta una preasignación que se va a reemplazar."""
+        candidato = self._por_id.get(tecnico_id)
+        if candidato is not None:
+            self.reservar(candidato, fecha, cantidad=-1)
+
+
+def ranking_tecnicos(solicitud, fecha=None):
+    fecha = fecha or solicitud.fecha_programada_preasignada
+    return Asignador(fechas=[fecha]).ranking(solicitud, fecha)
+
+
+def asignar_pendientes(limite=None, reasignar=False, simular=False):
+    """
+    Preasigna el mejor técnico a cada solicitud PENDIENTE (las más antiguas
+    primero). Con ``reasignar=False`` respeta las que ya tienen técnico.
+    Retorna la lista de ``(solicitud, puntaje, tecnico)`` asignados.
+
+    Las solicitudes se bloquean (``select_for_update``) desde la lectura
+    hasta el ``bulk_update``: una que el administrador cotice, rechace o
+    asigne mientras tanto no se pisa (en Postgres el WHERE se vuelve a
+    evaluar al obtener el lock y la fila queda fuera).
+    """
+    with transaction.atomic():
+        pendientes = SolicitudInspeccion.objects.filter(estado=EstadoSolicitud.PENDIENTE).only(
+            'id', 'direccion', 'fecha_programada_preasignada', 'tecnico_preasignado'
+        ).order_by('fecha_solicitud', 'id')
+        if not reasignar:
+            pendientes = pendientes.filter(tecnico_preasignado__isnull=True)
+        if not simular:
+            pendientes = pendientes.select_for_update()
+        if limite:
+            pendientes = pendientes[:limite]
+        pendientes = list(pendientes)
+        if not pendientes:
+            return []
+
+        asignador = Asignador(fechas=[s.fecha_programada_preasignada for s in pendientes])
+        if not asignador.candidatos:
+            return []
+
+        asignaciones = []
+        anteriores = set()
+        for solicitud in pendientes:
+            if solicitud.tecnico_preasignado_id:
+                anteriores.add(solicitud.tecnico_preasignado_id)
+                asignador.liberar(solicitud.tecnico_preasignado_id, solicitud.fecha_programada_preasignada)
+            mejor = asignador.ranking(solicitud)[0]
+            asignador.reservar(mejor, solicitud.fecha_programada_preasignada)
+            solicitud.tecnico_preasignado = mejor.tecnico
+            asignaciones.append((solicitud, mejor.puntaje, mejor.tecnico))
+
+        if not simular:
+            # bulk_update: no cambia el estado, así que no hay señales que perder
+            SolicitudInspeccion.objects.bulk_update(
+                [s for s, _, _ in asignaciones], ['tecnico_preasignado'], batch_size=500
+            )
+            # Calendario de los técnicos que ganan o pierden preasignaciones (después del commit)
+            invalidar_disponibilidad(anteriores | {t.pk for _, _, t in asignaciones})
+    return asignaciones
@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+User = get_user_model()
+
+
+class PerfilBackend(ModelBackend):
+    """
+    Igual que ModelBackend, pero al reconstruir ``request.user`` desde la sesión
+    trae también su Perfil en la misma consulta (JOIN), evitando el SELECT extra
+    de ``request.user.perfil`` en cada vista y template.
+    """
+
+    def get_user(self, user_id):
+        try:
+            user = User._default_manager.select_related('perfil').get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
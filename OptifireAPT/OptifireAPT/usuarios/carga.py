@@ -0,0 +1,396 @@
+"""
+Prueba de carga de punta a punta del flujo de cotización (``manage.py prueba_carga``).
+
+Cada usuario virtual repite el flujo real contra un servidor ya levantado
+(``runserver``, gunicorn, ...), usando solo HTTP y la biblioteca estándar:
+
+1. El cliente envía ``solicitar_inspeccion``.
+2. Un administrador la cotiza en ``gestionar_solicitud`` (``aprobar_solicitud``).
+3. El cliente la acepta en ``aceptar_cotizacion_cliente``.
+4. El técnico completa el checklist con una foto por tarea y la termina.
+5. El cliente descarga el acta en PDF.
+
+Se mide cada request por separado (sin seguir redirecciones) y se reporta
+throughput y percentiles p50/p95/p99 por endpoint. Las cuentas son las de
+``seed_optifire`` (``sintetico.cliente0@optifire.test``, ...): el usuario
+virtual ``i`` usa el cliente ``i``, el técnico ``i % tecnicos`` y el
+administrador ``i % administradores``.
+"""
+
+import datetime
+import http.cookiejar
+import re
+import struct
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+
+from .percentiles import percentil
+
+CLAVE_POR_DEFECTO = 'optifire123'
+
+PERCENTILES = (50, 95, 99)
+
+
+class ErrorFlujo(Exception):
+    """Una respuesta inesperada: se cuenta y el usuario virtual reintenta el flujo."""
+
+
+# ==========================================================
+# 1. MÉTRICAS
+# ==========================================================
+
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tiempos = {}  # endpoint -> [ms, ...]
+        self.errores = {}  # endpoint -> cantidad
+        self.flujos = 0
+        self.flujos_fallidos = 0
+        self.inicio = time.perf_counter()
+        self.fin = None
+
+    def registrar(self, endpoint, milisegundos, ok=True):
+        with self._lock:
+            self.tiempos.setdefault(endpoint, []).append(milisegundos)
+            if not ok:
+                self.errores[endpoint] = self.errores.get(endpoint, 0) + 1
+
+    def flujo(self, ok):
+        with self._lock:
+            if ok:
+                self.flujos += 1
+            else:
+                self.flujos_fallidos += 1
+
+    def terminar(self):
+        self.fin = time.perf_counter()
+
+    @property
+    def segundos(self):
+        return (self.fin or time.perf_counter()) - self.inicio
+
+    def resumen(self):
+        duracion = self.segundos
+        endpoints = {}
+        for endpoint, tiempos in sorted(self.tiempos.items()):
+            ordenados = sorted(tiempos)
+            fila = {
+                'requests': len(ordenados),
+                'errores': self.errores.get(endpoint, 0),
+                'rps': round(len(ordenados) / duracion, 2),
+                'max_ms': round(ordenados[-1], 1),
+            }
+            for p in PERCENTILES:
+                fila[f'p{p}_ms'] = round(percentil(ordenados, p), 1)
+            endpoints[endpoint] = fila
+        total = sum(len(t) for t in self.tiempos.values())
+        return {
+            'segundos': round(duracion, 2),
+            'requests': total,
+            'rps': round(total / duracion, 2),
+            'flujos': self.flujos,
+            'flujos_fallidos': self.flujos_fallidos,
+            'flujos_por_minuto': round(self.flujos / duracion * 60, 1),
+            'endpoints': endpoints,
+        }
+
+
+# ==========================================================
+# 2. CLIENTE HTTP (cookies + CSRF, sin seguir redirecciones)
+# ==========================================================
+
+class _SinRedireccion(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Respuesta:
+    def __init__(self, estado, cabeceras, cuerpo):
+        self.estado = estado
+        self.cabeceras = cabeceras
+        self.cuerpo = cuerpo
+
+    @property
+    def texto(self):
+        return self.cuerpo.decode('utf-8', errors='replace')
+
+    @property
+    def destino(self):
+        return self.cabeceras.get('Location', '')
+
+
+def _multipart(campos, archivos):
+    limite = uuid.uuid4().hex
+    partes = []
+    for nombre, valor in campos:
+        partes.append(
+            f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"\r\n\r\n{valor}\r\n'.encode()
+        )
+    for nombre, (archivo, contenido, tipo) in archivos.items():
+        partes.append(
+            f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"; filename="{archivo}"\r\n'
+            f'Content-Type: {tipo}\r\n\r\n'.encode() + contenido + b'\r\n'
+        )
+    partes.append(f'--{limite}--\r\n'.encode())
+    return b''.join(partes), f'multipart/form-data; boundary={limite}'
+
+
+class SesionHttp:
+    def __init__(self, base, metricas, timeout=30):
+        self.base = base.rstrip('/')
+        self.metricas = metricas
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _SinRedireccion()
+        )
+
+    def _csrf(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def _enviar(self, endpoint, ruta, datos=None, cabeceras=None, esperado=(200,)):
+        url = self.base + ruta
+        peticion = urllib.request.Request(url, data=datos, headers=cabeceras or {})
+        inicio = time.perf_counter()
+        try:
+            with self.opener.open(peticion, timeout=self.timeout) as r:
+                respuesta = Respuesta(r.status, r.headers, r.read())
+        except urllib.error.HTTPError as error:
+            respuesta = Respuesta(error.code, error.headers, error.read())
+        except OSError as error:
+            self.metricas.registrar(endpoint, (time.perf_counter() - inicio) * 1000, ok=False)
+            raise ErrorFlujo(f'{endpoint}: {error}') from error
+        ok = respuesta.estado in esperado
+        self.metricas.registrar(endpoint, (time.perf_counter() - inicio) * 1000, ok=ok)
+        if not ok:
+            destino = f' -> {respuesta.destino}' if respuesta.destino else ''
+            raise ErrorFlujo(f'{endpoint}: HTTP {respuesta.estado}{destino} (esperado {esperado})')
+        return respuesta
+
+    def get(self, endpoint, ruta, esperado=(200,)):
+        return self._enviar(endpoint, ruta, esperado=esperado)
+
+    def post(self, endpoint, ruta, campos, archivos=None, esperado=(302,)):
+        campos = list(campos.items() if isinstance(campos, dict) else campos)
+        campos.append(('csrfmiddlewaretoken', self._csrf()))
+        cabeceras = {'Referer': self.base + ruta, 'X-CSRFToken': self._csrf()}
+        if archivos:
+            cuerpo, tipo = _multipart(campos, archivos)
+        else:
+            cuerpo, tipo = urllib.parse.urlencode(campos).encode(), 'application/x-www-form-urlencoded'
+        cabeceras['Content-Type'] = tipo
+        return self._enviar(endpoint, ruta, cuerpo, cabeceras, esperado)
+
+    def login(self, email, clave):
+        self.get('login GET', '/usuarios/login/')
+        respuesta = self.post('login POST', '/usuarios/login/', {'email': email, 'password': clave})
+        if 'login' in respuesta.destino or 'cambiar-password' in respuesta.destino:
+            raise ErrorFlujo(f'No se pudo iniciar sesión como {email} (destino {respuesta.destino!r})')
+
+
+class _CamposFormulario(HTMLParser):
+    """Valores que enviaría el navegador: inputs, selects (opción elegida o primera) y textareas."""
+
+    def __init__(self):
+        super().__init__()
+        self.campos = {}
+        self._select = None
+        self._textarea = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        nombre = attrs.get('name')
+        if tag == 'input' and nombre and attrs.get('type') not in ('file', 'submit', 'button'):
+            if attrs.get('type') in ('checkbox', 'radio') and 'checked' not in attrs:
+                return
+            self.campos[nombre] = attrs.get('value') or ''
+        elif tag == 'select' and nombre:
+            self._select = nombre
+        elif tag == 'option' and self._select:
+            if self._select not in self.campos or 'selected' in attrs:
+                self.campos[self._select] = attrs.get('value', '')
+        elif tag == 'textarea' and nombre:
+            self._textarea = nombre
+            self.campos[nombre] = ''
+
+    def handle_endtag(self, tag):
+        if tag == 'select':
+            self._select = None
+        elif tag == 'textarea':
+            self._textarea = None
+
+    def handle_data(self, data):
+        if self._textarea:
+            self.campos[self._textarea] += data
+
+
+def campos_formulario(html):
+    lector = _CamposFormulario()
+    lector.feed(html)
+    return lector.campos
+
+
+def imagen_png(lado=64, semilla=0):
+    """PNG RGB válido generado con la biblioteca estándar (evidencia de prueba)."""
+    def bloque(tipo, datos):
+        return struct.pack('>I', len(datos)) + tipo + datos + struct.pack('>I', zlib.crc32(tipo + datos) & 0xffffffff)
+
+    # Cada fila: byte de filtro (0) + RGB de cada pixel (un degradado)
+    filas = b''.join(
+        b'\x00' + b''.join(bytes(((x * 4 + semilla) % 256, (y * 4) % 256, 128)) for x in range(lado))
+        for y in range(lado)
+    )
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + bloque(b'IHDR', struct.pack('>IIBBBBB', lado, lado, 8, 2, 0, 0, 0))
+        + bloque(b'IDAT', zlib.compress(filas))
+        + bloque(b'IEND', b'')
+    )
+
+
+# ==========================================================
+# 3. FLUJO DE UN USUARIO VIRTUAL
+# ==========================================================
+
+class UsuarioVirtual:
+    def __init__(self, indice, base, metricas, clave, tecnicos, administradores, dominio='optifire.test', prefijo='sintetico'):
+        self.indice = indice
+        self.metricas = metricas
+        self.foto = imagen_png(semilla=indice)
+        self.usuario_tecnico = f'{prefijo}_tecnico{indice % tecnicos}'
+        cuentas = {
+            'cliente': f'{prefijo}.cliente{indice}@{dominio}',
+            'admin': f'{prefijo}.admin{indice % administradores}@{dominio}',
+            'tecnico': f'{prefijo}.tecnico{indice % tecnicos}@{dominio}',
+        }
+        self.sesiones = {}
+        for rol, email in cuentas.items():
+            sesion = SesionHttp(base, metricas)
+            sesion.login(email, clave)
+            self.sesiones[rol] = sesion
+
+    def flujo(self):
+        cliente, admin, tecnico = self.sesiones['cliente'], self.sesiones['admin'], self.sesiones['tecnico']
+        marca = f'Carga {uuid.uuid4().hex[:10]}'
+
+        # 1. Solicitud del cliente
+        cliente.get('solicitar_inspeccion GET', '/usuarios/solicitar-inspeccion/')
+        cliente.post('solicitar_inspeccion POST', '/usuarios/solicitar-inspeccion/', {
+            'nombre_cliente': 'Carga', 'apellido_cliente': str(self.indice),
+            'direccion': 'Av. Providencia 1234, Providencia', 'telefono': '+56911111111',
+            'maquinaria': 'Extintores', 'observaciones_cliente': marca,
+        })
+        tablero = cliente.get('dashboard_cliente', '/usuarios/dashboard/cliente/?estado=PENDIENTE').texto
+        # Cada usuario virtual tiene su propio cliente: la pendiente más nueva es la suya
+        ids = [int(pk) for pk in re.findall(r'/usuarios/solicitud/anular/(\d+)/', tablero)]
+        if not ids:
+            raise ErrorFlujo('La solicitud recién creada no aparece en el dashboard del cliente')
+        solicitud = max(ids)
+
+        # 2. Cotización del administrador
+        gestion = admin.get('gestionar_solicitud GET', f'/usuarios/solicitud/gestionar/{solicitud}/').texto
+        tecnico_id = re.search(
+            r'<option value="(\d+)"[^>]*>[^<]*\(' + re.escape(self.usuario_tecnico) + r'\)', gestion
+        )
+        plantilla_id = re.search(r'<select name="plantilla"[^>]*>.*?<option value="(\d+)"', gestion, re.S)
+        if not tecnico_id or not plantilla_id:
+            raise ErrorFlujo(f'Sin técnico {self.usuario_tecnico} o plantilla en gestionar_solicitud')
+        admin.post('gestionar_solicitud POST', f'/usuarios/solicitud/gestionar/{solicitud}/', {
+            'action': 'aprobar', 'tecnico': tecnico_id.group(1), 'plantilla': plantilla_id.group(1),
+            'nombre_inspeccion': marca, 'monto_cotizacion': '85000',
+            'fecha_programada': (datetime.date.today() + datetime.timedelta(days=1)).isoformat(),
+        })
+
+        # 3. El cliente acepta
+        cliente.get('aceptar_cotizacion GET', f'/usuarios/solicitud/aceptar-cotizacion/{solicitud}/')
+        cliente.post('aceptar_cotizacion POST', f'/usuarios/solicitud/aceptar-cotizacion/{solicitud}/', {'action': 'aceptar'})
+
+        # 4. El técnico completa el checklist con fotos
+        agenda = tecnico.get('dashboard_tecnico', '/usuarios/dashboard/tecnico/').texto
+        posicion = agenda.find(marca)
+        enlace = re.compile(r'/usuarios/inspeccion/completar/(\d+)/').search(agenda, posicion) if posicion >= 0 else None
+        if not enlace:
+            raise ErrorFlujo('La inspección no aparece en la agenda del técnico')
+        inspeccion = enlace.group(1)
+        ruta = f'/usuarios/inspeccion/completar/{inspeccion}/'
+        campos = campos_formulario(tecnico.get('completar_inspeccion GET', ruta).texto)
+        archivos = {}
+        for nombre in list(campos):
+            encontrado = re.fullmatch(r'(.+-\d+)-estado', nombre)
+            if encontrado:
+                prefijo = encontrado.group(1)
+                campos[nombre] = 'B'
+                campos[f'{prefijo}-observacion'] = 'Sin observaciones'
+                archivos[f'{prefijo}-imagen_evidencia'] = (f'{prefijo}.png', self.foto, 'image/png')
+        campos.pop('csrfmiddlewaretoken', None)
+        campos.update({'comentarios_generales': marca, 'action': 'terminar'})
+        tecnico.post('completar_inspeccion POST', ruta, campos, archivos)
+
+        # 5. Acta en PDF
+        acta = cliente.get('descargar_acta', f'/usuarios/inspeccion/acta/{inspeccion}/')
+        if not acta.cuerpo.startswith(b'%PDF'):
+            raise ErrorFlujo('El acta descargada no es un PDF')
+
+
+# ==========================================================
+# 4. ORQUESTACIÓN
+# ==========================================================
+
+def ejecutar(base, usuarios=5, iteraciones=3, duracion=None, clave=CLAVE_POR_DEFECTO,
+             tecnicos=3, administradores=1, errores=None):
+    """
+    Lanza ``usuarios`` usuarios virtuales concurrentes; cada uno repite el
+    flujo ``iteraciones`` veces (o hasta ``duracion`` segundos si se da).
+    ``errores`` (lista) recibe los mensajes de los flujos fallidos.
+    """
+    metricas = Metricas()
+    errores = errores if errores is not None else []
+    limite = time.perf_counter() + duracion if duracion else None
+
+    def trabajar(indice):
+        try:
+            virtual = UsuarioVirtual(indice, base, metricas, clave, tecnicos, administradores)
+        except ErrorFlujo as error:
+            errores.append(str(error))
+            metricas.flujo(ok=False)
+            return
+        hechas = 0
+        while (limite and time.perf_counter() < limite) or (not limite and hechas < iteraciones):
+            try:
+                virtual.flujo()
+                metricas.flujo(ok=True)
+            except ErrorFlujo as error:
+                errores.append(str(error))
+                metricas.flujo(ok=False)
+            hechas += 1
+
+    with ThreadPoolExecutor(max_workers=usuarios) as pool:
+        list(pool.map(trabajar, range(usuarios)))
+    metricas.terminar()
+    return metricas.resumen()
+
+
+def formatear(resumen):
+    lineas = [
+        f"{'endpoint':<28}{'req':>7}{'err':>6}{'rps':>8}" + ''.join(f"{f'p{p}':>9}" for p in PERCENTILES) + f"{'max':>9}"
+    ]
+    for endpoint, fila in resumen['endpoints'].items():
+        lineas.append(
+            f"{endpoint:<28}{fila['requests']:>7}{fila['errores']:>6}{fila['rps']:>8}"
+            + ''.join(f"{fila[f'p{p}_ms']:>9}" for p in PERCENTILES) + f"{fila['max_ms']:>9}"
+        )
+    lineas.append(
+        f"Total: {resumen['requests']} requests en {resumen['segundos']}s ({resumen['rps']} req/s), "
+        f"{resumen['flujos']} flujos OK ({resumen['flujos_por_minuto']}/min), {resumen['flujos_fallidos']} fallidos"
+    )
+    return '\n'.join(lineas)
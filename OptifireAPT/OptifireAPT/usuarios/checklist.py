@@ -0,0 +1,115 @@
+"""
+Guardado en lote del checklist de ``completar_inspeccion``.
+
+``formset.save()`` guarda tarea por tarea: un UPDATE de la fila completa y
+las señales ``post_save`` por cada tarea que cambió. Con ``guardar_checklist``:
+
+1. Se compara cada formulario con la tarea cargada (``form.changed_data``):
+   solo se escriben las tareas y las columnas que cambiaron.
+2. Las fotos nuevas se suben al storage en paralelo (``CHECKLIST_HILOS_SUBIDA``)
+   ANTES de abrir la transacción, para no retener el lock de escritura
+   mientras se suben.
+3. Todas las tareas se escriben con UN ``bulk_update``.
+4. Las fotos nuevas se notifican con un solo INSERT (``notificar_evidencias``)
+   y su procesamiento se agenda en un solo callback de commit.
+
+Uso (el bloque corre en la MISMA transacción que las tareas)::
+
+    with guardar_checklist(formset):
+        inspeccion.save()
+
+Si la transacción falla, las fotos recién subidas se borran del storage.
+
+El autoguardado del checklist (una tarea o una foto por request, ver
+``static/js/checklist_autoguardado.js``) usa el mismo camino con
+``guardar_tareas([tarea], campos)``.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+from .imagenes import programar_procesamiento_lote
+from .models import EstadoInspeccion, TareaInspeccion
+from .notificaciones import notificar_evidencias
+
+
+def tareas_cambiadas(formset):
+    """Retorna ``(tareas, campos)``: las tareas editadas y la unión de sus columnas cambiadas."""
+    editables = set(formset.form._meta.fields)
+    tareas, campos = [], set()
+    for form in formset.initial_forms:
+        cambiados = editables.intersection(form.changed_data)
+        if form.instance.pk is None or not cambiados:
+            continue
+        tareas.append(form.instance)
+        campos.update(cambiados)
+    return tareas, sorted(campos)
+
+
+def _subir(tarea):
+    # Lo mismo que hace save(): FileField.pre_save guarda el archivo en el storage
+    TareaInspeccion._meta.get_field('imagen_evidencia').pre_save(tarea, add=False)
+    return tarea.imagen_evidencia.name
+
+
+def _borrar(nombres):
+    storage = TareaInspeccion._meta.get_field('imagen_evidencia').storage
+    for nombre in nombres:
+        storage.delete(nombre)
+
+
+def subir_fotos(tareas):
+    """Sube en paralelo las fotos que todavía no están en el storage. Retorna sus nombres."""
+    pendientes = [t for t in tareas if t.imagen_evidencia and not t.imagen_evidencia._committed]
+    if len(pendientes) <= 1:
+        return [_subir(t) for t in pendientes]
+
+    hilos = min(getattr(settings, 'CHECKLIST_HILOS_SUBIDA', 4), len(pendientes))
+    with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='checklist') as ejecutor:
+        futuros = [ejecutor.submit(_subir, t) for t in pendientes]
+    errores = [f.exception() for f in futuros if f.exception()]
+    nombres = [f.result() for f in futuros if not f.exception()]
+    if errores:
+        _borrar(nombres)
+        raise errores[0]
+    return nombres
+
+
+def actualizar_tareas(tareas, campos):
+    """Un ``bulk_update`` y, para las fotos nuevas, una notificación en lote."""
+    if not tareas:
+        return
+    # bulk_update no dispara post_save: las fotos nuevas se detectan aquí (usuarios/seguimiento.py)
+    con_foto_nueva = [t.pk for t in tareas if t.imagen_evidencia and t.seguimiento.cambio('imagen_evidencia')]
+    TareaInspeccion.objects.bulk_update(tareas, campos)
+    for tarea in tareas:
+        tarea.seguimiento.tomar()
+    if con_foto_nueva:
+        programar_procesamiento_lote(con_foto_nueva)
+        notificar_evidencias(con_foto_nueva)
+
+
+@contextmanager
+def guardar_tareas(tareas, campos):
+    subidas = subir_fotos(tareas)
+    try:
+        with transaction.atomic():
+            actualizar_tareas(tareas, campos)
+            yield tareas
+    except BaseException:
+        _borrar(subidas)
+        raise
+
+
+def guardar_checklist(formset):
+    return guardar_tareas(*tareas_cambiadas(formset))
+
+
+def iniciar_inspeccion(inspeccion):
+    """El primer avance pasa la OT de ASIGNADA a EN_CURSO (igual que "Guardar Progreso")."""
+    if inspeccion.estado == EstadoInspeccion.ASIGNADA:
+        inspeccion.estado = EstadoInspeccion.EN_CURSO
+        inspeccion.save(update_fields=['estado'])
@@ -1,8 +1,15 @@
-from .models import Notificacion
+from django.conf import settings
+
+from .notificaciones import resumen_notificaciones
+from .tiempo_real import admite_conexiones_largas
 
 def notificaciones_usuario(request):
     if request.user.is_authenticated:
-        # Obtenemos las notificaciones NO leídas del usuario actual
-        notificaciones = Notificacion.objects.filter(usuario=request.user, leido=False).order_by('-fecha_creacion')
-        return {'mis_notificaciones': notificaciones}
+        # Resumen perezoso: contador cacheado + últimas N no leídas (solo si el template las usa)
+        return {
+            'mis_notificaciones': resumen_notificaciones(request.user),
+            # SSE/long-poll solo bajo ASGI; bajo WSGI el navegador consulta cada tanto
+            'tiempo_real_sse': admite_conexiones_largas(request),
+            'tiempo_real_intervalo': getattr(settings, 'TIEMPO_REAL_INTERVALO_WSGI', 30),
+        }
     return {}
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+Bandeja de salida (outbox) de correos.
+
+Las vistas y señales NO abren conexiones SMTP: llaman a ``encolar_correo``,
+que solo inserta una fila en ``CorreoPendiente`` dentro de la transacción en
+curso. El comando ``python manage.py enviar_correos`` despacha la cola en
+lotes usando UNA sola conexión SMTP por lote, con reintentos y backoff
+exponencial; tras ``CORREOS_MAX_INTENTOS`` fallos el correo queda FALLIDO.
+"""
+
+import datetime
+import logging
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import CorreoPendiente, EstadoCorreo
+
+logger = logging.getLogger(__name__)
+
+# Base de los enlaces que van en los correos
+URL_BASE_CORREOS = 'http://127.0.0.1:8000/usuarios/'
+
+
+def _nuevo_correo(asunto, cuerpo_texto, destinatarios, cuerpo_html=None,
+                  remitente=None, adjunto=None):
+    correo = CorreoPendiente(
+        asunto=asunto,
+        cuerpo_texto=cuerpo_texto,
+        cuerpo_html=cuerpo_html,
+        remitente=remitente or settings.DEFAULT_FROM_EMAIL,
+        destinatarios=list(destinatarios),
+    )
+    if adjunto:
+        correo.adjunto_nombre, correo.adjunto_contenido, correo.adjunto_tipo = adjunto
+    return correo
+
+
+def encolar_correo(asunto, cuerpo_texto, destinatarios, cuerpo_html=None,
+                   remitente=None, adjunto=None):
+    """
+    Registra un correo para envío diferido.
+    ``adjunto`` es una tupla opcional (nombre, contenido_bytes, mimetype).
+    """
+    correo = _nuevo_correo(asunto, cuerpo_texto, destinatarios, cuerpo_html, remitente, adjunto)
+    correo.save()
+    return correo
+
+
+def encolar_correos(correos):
+    """
+    Versión en lote: ``correos`` es una lista de dicts con los mismos
+    argumentos de ``encolar_correo``. Un solo INSERT para todos.
+    """
+    return CorreoPendiente.objects.bulk_create(
+        [_nuevo_correo(**datos) for datos in correos], batch_size=500
+    )
+
+
+def construir_mensaje(correo, conexion=None):
+    msg = EmailMultiAlternatives(
+        subject=correo.asunto,
+        body=correo.cuerpo_texto,
+        from_email=correo.remitente,
+        to=correo.destinatarios,
+        connection=conexion,
+    )
+    if correo.cuerpo_html:
+        msg.attach_alternative(correo.cuerpo_html, "text/html")
+    if correo.adjunto_nombre:
+        msg.attach(correo.adjunto_nombre, bytes(correo.adjunto_contenido), correo.adjunto_tipo)
+    return msg
+
+
+def calcular_backoff(intentos):
+    """Segundos de espera antes del siguiente intento: base * 2^(n-1), con tope."""
+    base = getattr(settings, 'CORREOS_BACKOFF_BASE', 60)
+    maximo = getattr(settings, 'CORREOS_BACKOFF_MAXIMO', 3600)
+    return min(base * (2 ** max(intentos - 1, 0)), maximo)
+
+
+def _tomar_lote(tamano, bloquear):
+    pendientes = CorreoPendiente.objects.filter(
+        estado=EstadoCorreo.PENDIENTE,
+        proximo_intento__lte=timezone.now(),
+    ).order_by('proximo_intento', 'id')
+    if bloquear:
+        pendientes = pendientes.select_for_update(skip_locked=True)
+    return list(pendientes[:tamano])
+
+
+def procesar_lote(tamano=None, max_intentos=None):
+    """
+    Envía hasta ``tamano`` correos vencidos reutilizando una sola conexión.
+    Retorna un dict con los contadores ``enviados``, ``reintentos`` y ``fallidos``.
+    """
+    tamano = tamano or getattr(settings, 'CORREOS_TAMANO_LOTE', 50)
+    max_intentos = max_intentos or getattr(settings, 'CORREOS_MAX_INTENTOS', 5)
+    resultado = {'enviados': 0, 'reintentos': 0, 'fallidos': 0}
+
+    # En motores con SKIP LOCKED (PostgreSQL/MySQL) el lote se bloquea dentro
+    # de una transacción y varios workers pueden drenar la cola sin pisarse.
+    # En SQLite NO se abre transacción: retendría el lock de escritura de toda
+    # la base mientras se habla con el servidor SMTP.
+    bloquear = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic() if bloquear else nullcontext():
+        lote = _tomar_lote(tamano, bloquear)
+        if not lote:
+            return resultado
+
+        conexion = get_connection(fail_silently=False)
+        try:
+            conexion.open()
+        except Exception as e:
+            # Sin servidor SMTP no tiene sentido intentar uno por uno
+            logger.warning("No se pudo conectar al servidor SMTP (%d correos en espera): %s", len(lote), e)
+            for correo in lote:
+                _registrar_fallo(correo, e, max_intentos, resultado)
+            return resultado
+
+        try:
+            for correo in lote:
+                try:
+                    construir_mensaje(correo, conexion).send()
+                except Exception as e:
+                    _registrar_fallo(correo, e, max_intentos, resultado)
+                else:
+                    correo.estado = EstadoCorreo.ENVIADO
+                    correo.intentos += 1
+                    correo.fecha_envio = timezone.now()
+                    correo.ultimo_error = None
+                    correo.save(update_fields=['estado', 'intentos', 'fecha_envio', 'ultimo_error'])
+                    resultado['enviados'] += 1
+        finally:
+            conexion.close()
+
+    return resultado
+
+
+def _registrar_fallo(correo, error, max_intentos, resultado):
+    correo.intentos += 1
+    correo.ultimo_error = str(error)
+    if correo.intentos >= max_intentos:
+        correo.estado = EstadoCorreo.FALLIDO
+        resultado['fallidos'] += 1
+        logger.error("Correo #%s FALLIDO tras %d intentos: %s", correo.pk, correo.intentos, error)
+    else:
+        correo.proximo_intento = timezone.now() + datetime.timedelta(seconds=calcular_backoff(correo.intentos))
+        resultado['reintentos'] += 1
+        logger.warning("Correo #%s falló (intento %d), se reintenta: %s", correo.pk, correo.intentos, error)
+    correo.save(update_fields=['estado', 'intentos', 'ultimo_error', 'proximo_intento'])
@@ -0,0 +1,124 @@
+"""
+Cotización de solicitudes PENDIENTES (individual y masiva).
+
+``cotizar_lote`` aplica la misma plantilla/monto (y opcionalmente técnico,
+fecha y nombre) a un conjunto de solicitudes en UNA transacción:
+
+* Un SELECT de las solicitudes (con su cliente) y otro para validar los
+  técnicos sugeridos de cada una.
+* Un solo ``bulk_update`` para todas las filas válidas.
+* ``bulk_update`` no dispara ``post_save``, así que lo que hacen las señales
+  al pasar a COTIZANDO se hace aquí en lote: resúmenes de estadísticas, UN
+  INSERT de notificaciones y UN INSERT de correos en la bandeja de salida.
+
+Las filas que no se pueden cotizar (no existen, ya no están PENDIENTES, sin
+técnico) se informan en ``ResultadoCotizacion.fallidas`` sin detener al resto.
+"""
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from .correos import URL_BASE_CORREOS, encolar_correos
+from .estadisticas import registrar_solicitudes
+from .models import EstadoSolicitud, Roles, SolicitudInspeccion
+from .notificaciones import notificar_lote
+
+DETALLE_COTIZACION = "Cotización generada por el administrador."
+
+CAMPOS_COTIZACION = [
+    'monto_cotizacion', 'detalle_cotizacion', 'tecnico_preasignado', 'plantilla_preasignada',
+    'nombre_inspeccion_preasignado', 'fecha_programada_preasignada', 'estado',
+]
+
+
+def aviso_cotizacion(solicitud):
+    """Notificación interna para el cliente: ``(destinatario, mensaje, enlace)``."""
+    return (
+        solicitud.cliente_id,
+        f"Tienes una cotización pendiente para la solicitud #{solicitud.pk}",
+        f"/usuarios/solicitud/aceptar-cotizacion/{solicitud.pk}/",
+    )
+
+
+def correo_cotizacion(solicitud, destinatario):
+    """Argumentos de ``encolar_correo`` para el aviso de cotización al cliente."""
+    context = {'solicitud': solicitud, 'base_url': URL_BASE_CORREOS}
+    return {
+        'asunto': f"Cotización disponible para su solicitud N°{solicitud.pk}",
+        'cuerpo_texto': render_to_string('email/solicitud_cotizando_text.txt', context),
+        'cuerpo_html': render_to_string('email/solicitud_cotizando.html', context),
+        'destinatarios': [destinatario],
+    }
+
+
+class ResultadoCotizacion:
+    def __init__(self):
+        self.cotizadas = []
+        self.fallidas = []  # (solicitud_id, motivo)
+
+    def fallar(self, solicitud_id, motivo):
+        self.fallidas.append((solicitud_id, motivo))
+
+
+def cotizar_lote(solicitud_ids, plantilla, monto, tecnico=None, fecha=None, nombre=None):
+    """
+    Sin ``tecnico`` se usa el preasignado de cada solicitud (p.ej. por
+    "Auto-asignar"); sin ``fecha``/``nombre`` se conservan los de la solicitud.
+    """
+    resultado = ResultadoCotizacion()
+    ids = list(dict.fromkeys(solicitud_ids))
+    if not ids:
+        return resultado
+
+    with transaction.atomic():
+        solicitudes = {
+            s.pk: s for s in
+            SolicitudInspeccion.objects.select_for_update(of=('self',))
+            .select_related('cliente').filter(pk__in=ids)
+        }
+        sugeridos = {s.tecnico_preasignado_id for s in solicitudes.values() if s.tecnico_preasignado_id}
+        tecnicos_validos = set(
+            User.objects.filter(pk__in=sugeridos, groups__name=Roles.TECNICO, is_active=True)
+            .values_list('pk', flat=True)
+        ) if sugeridos and tecnico is None else set()
+
+        for pk in ids:
+            solicitud = solicitudes.get(pk)
+            if solicitud is None:
+                resultado.fallar(pk, "La solicitud no existe.")
+                continue
+            if solicitud.estado != EstadoSolicitud.PENDIENTE:
+                resultado.fallar(pk, f"Ya fue procesada ({solicitud.get_estado_display()}).")
+                continue
+            if tecnico is not None:
+                solicitud.tecnico_preasignado = tecnico
+            elif not solicitud.tecnico_preasignado_id:
+                resultado.fallar(pk, "No tiene técnico: elija uno o use Auto-asignar.")
+                continue
+            elif solicitud.tecnico_preasignado_id not in tecnicos_validos:
+                resultado.fallar(pk, "El técnico sugerido ya no está activo.")
+                continue
+
+            solicitud.monto_cotizacion = monto
+            solicitud.detalle_cotizacion = DETALLE_COTIZACION
+            solicitud.plantilla_preasignada = plantilla
+            solicitud.nombre_inspeccion_preasignado = (
+                nombre or solicitud.nombre_inspeccion_preasignado or f"{plantilla.nombre} - Solicitud #{pk}"
+            )
+            solicitud.fecha_programada_preasignada = fecha or solicitud.fecha_programada_preasignada
+            solicitud.estado = EstadoSolicitud.COTIZANDO
+            resultado.cotizadas.append(solicitud)
+
+        cotizadas = resultado.cotizadas
+        if cotizadas:
+            SolicitudInspeccion.objects.bulk_update(cotizadas, CAMPOS_COTIZACION, batch_size=500)
+
+            # Lo que harían las señales de post_save, en lote
+            registrar_solicitudes(
+                (s.fecha_solicitud, EstadoSolicitud.PENDIENTE, EstadoSolicitud.COTIZANDO) for s in cotizadas
+            )
+            notificar_lote([aviso_cotizacion(s) for s in cotizadas])
+            encolar_correos([correo_cotizacion(s, s.cliente.email) for s in cotizadas if s.cliente.email])
+
+    return resultado
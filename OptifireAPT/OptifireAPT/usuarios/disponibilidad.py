@@ -0,0 +1,129 @@
+"""
+Disponibilidad de técnicos para el planificador del administrador.
+
+``ocupacion_tecnicos(ids, desde, hasta)`` devuelve, por técnico, cuántas
+inspecciones ASIGNADAS/EN CURSO tiene programadas cada día del rango, con una
+sola consulta agrupada. El resultado se guarda en el cache bajo una clave que
+incluye la *versión* de cada técnico; la versión sube (después del commit)
+cada vez que una inspección suya se crea, se reprograma, cambia de estado o
+de técnico, así que nunca se sirve un calendario viejo.
+
+La misma huella (ids + versiones + rango) se usa como ETag: si el navegador
+ya tiene la respuesta, la vista contesta 304 sin tocar la BD.
+
+Las versiones solo sirven si todos los workers ven el mismo cache
+(Redis/Memcached). Con un cache por proceso (locmem, el de por defecto) la
+invalidación llega solo al worker que escribió, así que versiones y
+ocupación duran ``TTL_DISPONIBILIDAD_LOCAL`` segundos.
+"""
+
+import datetime
+import hashlib
+import time
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import EstadoInspeccion, Inspeccion
+
+# Estados que ocupan al técnico ese día
+ESTADOS_OCUPADO = (EstadoInspeccion.ASIGNADA, EstadoInspeccion.EN_CURSO)
+
+DIAS_POR_DEFECTO = 180
+MAX_DIAS = 366
+MAX_TECNICOS = 100
+TTL_DISPONIBILIDAD = 60 * 60
+TTL_DISPONIBILIDAD_LOCAL = 5
+
+
+def cache_compartido():
+    """False si cada proceso tiene su propio cache (locmem/dummy)."""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def _ttl_version():
+    return None if cache_compartido() else TTL_DISPONIBILIDAD_LOCAL
+
+
+def _ttl_ocupacion():
+    return TTL_DISPONIBILIDAD if cache_compartido() else TTL_DISPONIBILIDAD_LOCAL
+
+
+def _clave_version(tecnico_id):
+    return f'disponibilidad:version:{tecnico_id}'
+
+
+def versiones(tecnico_ids):
+    """
+    Versión actual de cada técnico. Si el cache la perdió se inicia con la
+    hora actual (nunca vuelve a un número ya usado).
+    """
+    claves = {_clave_version(pk): pk for pk in tecnico_ids}
+    actuales = cache.get_many(claves)
+    faltantes = {clave: time.time_ns() for clave in claves if clave not in actuales}
+    if faltantes:
+        for clave, valor in faltantes.items():
+            cache.add(clave, valor, _ttl_version())
+        actuales.update(cache.get_many(faltantes))
+    return {claves[clave]: valor for clave, valor in actuales.items()}
+
+
+def invalidar_disponibilidad(tecnico_ids):
+    claves = [_clave_version(pk) for pk in set(tecnico_ids) if pk]
+
+    def _subir():
+        for clave in claves:
+            try:
+                cache.incr(clave)
+            except ValueError:
+                cache.set(clave, time.time_ns(), _ttl_version())
+
+    if claves:
+        transaction.on_commit(_subir)
+
+
+def huella(tecnico_ids, desde, hasta):
+    """Identifica el contenido de la respuesta sin consultarla (sirve de ETag)."""
+    actuales = versiones(tecnico_ids)
+    partes = [desde.isoformat(), hasta.isoformat()] + [f'{pk}:{actuales[pk]}' for pk in sorted(tecnico_ids)]
+    return hashlib.sha1('|'.join(partes).encode()).hexdigest()
+
+
+def _consultar(tecnico_ids, desde, hasta):
+    ocupacion = {pk: {} for pk in tecnico_ids}
+    filas = Inspeccion.objects.filter(
+        tecnico_id__in=tecnico_ids,
+        estado__in=ESTADOS_OCUPADO,
+        fecha_programada__range=(desde, hasta),
+    ).values('tecnico_id', 'fecha_programada').annotate(cantidad=Count('id')).order_by()
+    for fila in filas:
+        ocupacion[fila['tecnico_id']][fila['fecha_programada'].isoformat()] = fila['cantidad']
+    return ocupacion
+
+
+def ocupacion_tecnicos(tecnico_ids, desde, hasta, clave=None):
+    """
+    ``{tecnico_id: {'AAAA-MM-DD': cantidad}}`` (solo días ocupados).
+    ``clave`` es la huella ya calculada por la vista, si la tiene.
+    """
+    clave = 'disponibilidad:' + (clave or huella(tecnico_ids, desde, hasta))
+    ocupacion = cache.get(clave)
+    if ocupacion is None:
+        ocupacion = _consultar(tecnico_ids, desde, hasta)
+        cache.set(clave, ocupacion, _ttl_ocupacion())
+    return ocupacion
+
+
+def rango_consulta(desde, hasta):
+    """Normaliza el rango pedido: por defecto desde hoy y DIAS_POR_DEFECTO días, máximo MAX_DIAS."""
+    desde = desde or timezone.localdate()
+    hasta = hasta or desde + datetime.timedelta(days=DIAS_POR_DEFECTO)
+    if hasta < desde:
+        raise ValueError("El rango de fechas es inválido.")
+    if (hasta - desde).days > MAX_DIAS:
+        raise ValueError(f"El rango no puede superar {MAX_DIAS} días.")
+    return desde, hasta
@@ -0,0 +1,148 @@
+"""
+Resúmenes (rollups) que alimentan ``estadisticas_view``.
+
+* ``ResumenDiarioSolicitudes``: solicitudes por día de creación × estado actual.
+* ``ResumenTecnicoEstado``: inspecciones por técnico × estado actual.
+
+Las señales llaman a ``registrar_solicitud`` / ``registrar_inspeccion`` con
+el estado anterior y el nuevo, y aquí se aplican los +1/-1 con ``F()`` (sin
+leer la fila). Si la fila de un (día, estado) o (técnico, estado) no existe
+(datos anteriores al backfill, reconstrucción parcial), ese grupo se cuenta
+desde la tabla de origen en vez de crearlo con el delta (que podría ser -1).
+
+Las escrituras en lote que no pasan por ``save()`` (p.ej. ``bulk_update``)
+llaman a ``registrar_solicitudes``; si algún proceso no lo hace, los
+resúmenes se reconstruyen con ``python manage.py reconstruir_estadisticas``.
+"""
+
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Inspeccion, ResumenDiarioSolicitudes, ResumenTecnicoEstado, SolicitudInspeccion
+
+TAMANO_LOTE_RECONSTRUCCION = 5000
+
+
+# ==========================================================
+# 1. ACTUALIZACIÓN INCREMENTAL
+# ==========================================================
+
+def _recontar(modelo, claves):
+    """Total real de un grupo, contado en la tabla de origen (ya incluye el cambio)."""
+    if modelo is ResumenDiarioSolicitudes:
+        return SolicitudInspeccion.objects.filter(
+            fecha_solicitud__date=claves['fecha'], estado=claves['estado']
+        ).count()
+    return Inspeccion.objects.filter(tecnico_id=claves['tecnico_id'], estado=claves['estado']).count()
+
+
+def _sumar(modelo, delta, **claves):
+    if not delta:
+        return
+    if modelo.objects.filter(**claves).update(total=F('total') + delta):
+        return
+    try:
+        # Savepoint: si otro proceso creó la fila al mismo tiempo, reintentamos el UPDATE
+        with transaction.atomic():
+            modelo.objects.create(total=_recontar(modelo, claves), **claves)
+    except IntegrityError:
+        modelo.objects.filter(**claves).update(total=F('total') + delta)
+
+
+def registrar_solicitud(fecha_solicitud, estado_anterior, estado_nuevo):
+    """``estado_anterior`` None = solicitud nueva; ``estado_nuevo`` None = eliminada."""
+    if estado_anterior == estado_nuevo or fecha_solicitud is None:
+        return
+    dia = timezone.localdate(fecha_solicitud)
+    if estado_anterior is not None:
+        _sumar(ResumenDiarioSolicitudes, -1, fecha=dia, estado=estado_anterior)
+    if estado_nuevo is not None:
+        _sumar(ResumenDiarioSolicitudes, 1, fecha=dia, estado=estado_nuevo)
+
+
+def registrar_solicitudes(cambios):
+    """
+    Versión en lote de ``registrar_solicitud`` para escrituras que no pasan
+    por ``save()`` (p.ej. ``bulk_update``). ``cambios`` es una lista de
+    ``(fecha_solicitud, estado_anterior, estado_nuevo)``; se aplica un solo
+    +n/-n por (día, estado).
+    """
+    deltas = Counter()
+    for fecha_solicitud, estado_anterior, estado_nuevo in cambios:
+        if estado_anterior == estado_nuevo or fecha_solicitud is None:
+            continue
+        dia = timezone.localdate(fecha_solicitud)
+        if estado_anterior is not None:
+            deltas[(dia, estado_anterior)] -= 1
+        if estado_nuevo is not None:
+            deltas[(dia, estado_nuevo)] += 1
+    for (dia, estado), delta in sorted(deltas.items()):
+        _sumar(ResumenDiarioSolicitudes, delta, fecha=dia, estado=estado)
+
+
+def registrar_inspeccion(anterior, nuevo):
+    """``anterior`` y ``nuevo`` son tuplas ``(tecnico_id, estado)`` o None."""
+    if anterior == nuevo:
+        return
+    if anterior is not None:
+        _sumar(ResumenTecnicoEstado, -1, tecnico_id=anterior[0], estado=anterior[1])
+    if nuevo is not None:
+        _sumar(ResumenTecnicoEstado, 1, tecnico_id=nuevo[0], estado=nuevo[1])
+
+
+# ==========================================================
+# 2. RECONSTRUCCIÓN COMPLETA (BACKFILL)
+# ==========================================================
+
+def _acumular_por_lotes(queryset, campos, lote, acumulado, transformar=None):
+    """
+    Agrupa ``queryset`` por ``campos`` recorriéndolo en rangos de pk de
+    tamaño ``lote`` (cada rango es un GROUP BY acotado en la BD).
+    """
+    ultimo = queryset.aggregate(m=Max('pk'))['m'] or 0
+    inicio = 0
+    while inicio < ultimo:
+        filas = (
+            queryset.filter(pk__gt=inicio, pk__lte=inicio + lote)
+            .values(*campos).annotate(cantidad=Count('pk')).order_by()
+        )
+        for fila in filas:
+            clave = tuple(fila[c] for c in campos)
+            acumulado[clave] = acumulado.get(clave, 0) + fila['cantidad']
+        inicio += lote
+        yield inicio
+
+
+def reconstruir_resumenes(lote=TAMANO_LOTE_RECONSTRUCCION, progreso=None):
+    """
+    Recalcula ambos resúmenes desde cero leyendo el historial en lotes y los
+    reemplaza en una sola transacción corta.
+    """
+    por_dia = {}
+    solicitudes = SolicitudInspeccion.objects.annotate(dia=TruncDate('fecha_solicitud'))
+    for avance in _acumular_por_lotes(solicitudes, ('dia', 'estado'), lote, por_dia):
+        if progreso:
+            progreso('solicitudes', avance)
+
+    por_tecnico = {}
+    for avance in _acumular_por_lotes(Inspeccion.objects.all(), ('tecnico_id', 'estado'), lote, por_tecnico):
+        if progreso:
+            progreso('inspecciones', avance)
+
+    with transaction.atomic():
+        ResumenDiarioSolicitudes.objects.all().delete()
+        ResumenDiarioSolicitudes.objects.bulk_create([
+            ResumenDiarioSolicitudes(fecha=dia, estado=estado, total=total)
+            for (dia, estado), total in por_dia.items() if dia is not None
+        ], batch_size=1000)
+        ResumenTecnicoEstado.objects.all().delete()
+        ResumenTecnicoEstado.objects.bulk_create([
+            ResumenTecnicoEstado(tecnico_id=tecnico_id, estado=estado, total=total)
+            for (tecnico_id, estado), total in por_tecnico.items()
+        ], batch_size=1000)
+
+    return len(por_dia), len(por_tecnico)
@@ -6,7 +6,9 @@ from .models import (
     SolicitudInspeccion, 
     Perfil, 
     Roles, 
-    EstadoSolicitud
+    EstadoSolicitud,
+    PlantillaInspeccion,
+    TareaInspeccion,
 )
 
 # ==========================================================
@@ -225,4 +227,85 @@ class ClientePerfilForm(forms.ModelForm):
 class AprobacionInspeccionForm(forms.Form):
     # Este formulario es manejado principalmente en el HTML manualmente,
     # pero lo dejamos aquí para que la importación en views.py no falle.
-    pass
\ No newline at end of file
+    pass
+
+# ==========================================================
+# 5. FILTROS DE LISTADOS (Historial, Dashboards, Usuarios)
+# ==========================================================
+class FiltroListadoForm(forms.Form):
+    """
+    Filtros por GET comunes a todos los listados paginados.
+    Cada vista indica con ``campos`` cuáles muestra.
+    """
+    estado = forms.ChoiceField(required=False, label="Estado")
+    desde = forms.DateField(required=False, label="Desde", widget=forms.DateInput(attrs={'type': 'date'}))
+    hasta = forms.DateField(required=False, label="Hasta", widget=forms.DateInput(attrs={'type': 'date'}))
+    tecnico = forms.ModelChoiceField(queryset=User.objects.none(), required=False, label="Técnico", empty_label="Todos")
+    cliente = forms.CharField(required=False, label="Cliente", widget=forms.TextInput(attrs={'placeholder': 'Nombre o usuario'}))
+    rol = forms.ChoiceField(required=False, label="Rol", choices=[('', 'Todos')] + Roles.choices)
+    buscar = forms.CharField(required=False, label="Buscar", widget=forms.TextInput(attrs={'placeholder': 'Usuario, nombre o email'}))
+
+    def __init__(self, *args, campos=(), estados=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        for nombre in list(self.fields):
+            if nombre not in campos:
+                del self.fields[nombre]
+
+        if 'estado' in self.fields:
+            self.fields['estado'].choices = [('', 'Todos')] + list(estados if estados is not None else EstadoSolicitud.choices)
+        if 'tecnico' in self.fields:
+            self.fields['tecnico'].queryset = User.objects.filter(groups__name=Roles.TECNICO).order_by('username')
+
+        for campo in self.fields.values():
+            es_select = isinstance(campo.widget, forms.Select)
+            campo.widget.attrs['class'] = 'form-select form-select-sm' if es_select else 'form-control form-control-sm'
+
+# ==========================================================
+# 6. COTIZACIÓN MASIVA (Admin)
+# ==========================================================
+class CotizacionLoteForm(forms.Form):
+    """Valores comunes que se aplican a todas las solicitudes marcadas."""
+    tecnico = forms.ModelChoiceField(
+        queryset=User.objects.none(), required=False, label="Técnico",
+        empty_label="Sugerido de cada solicitud"
+    )
+    plantilla = forms.ModelChoiceField(queryset=PlantillaInspeccion.objects.all(), label="Plantilla")
+    monto_cotizacion = forms.DecimalField(max_digits=10, decimal_places=0, min_value=0, label="Monto ($)")
+    fecha_programada = forms.DateField(required=False, label="Fecha", widget=forms.DateInput(attrs={'type': 'date'}))
+    nombre_inspeccion = forms.CharField(required=False, max_length=200, label="Nombre OT")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['tecnico'].queryset = User.objects.filter(
+            groups__name=Roles.TECNICO, is_active=True
+        ).order_by('username')
+        for campo in self.fields.values():
+            es_select = isinstance(campo.widget, forms.Select)
+            campo.widget.attrs['class'] = 'form-select form-select-sm' if es_select else 'form-control form-control-sm'
+
+# ==========================================================
+# 7. AUTOGUARDADO DEL CHECKLIST (Técnico)
+# ==========================================================
+class TareaAutoguardadoForm(forms.ModelForm):
+    """PATCH de una tarea: los campos que no vienen conservan su valor actual."""
+    class Meta:
+        model = TareaInspeccion
+        fields = ['estado', 'observacion']
+
+    def __init__(self, cambios, instance, **kwargs):
+        datos = forms.model_to_dict(instance, fields=self._meta.fields)
+        datos.update(cambios)
+        super().__init__(datos, instance=instance, **kwargs)
+
+
+class EvidenciaTareaForm(forms.ModelForm):
+    """Subida de UNA foto de evidencia, sin el resto del formset."""
+    class Meta:
+        model = TareaInspeccion
+        fields = ['imagen_evidencia']
+
+    def clean_imagen_evidencia(self):
+        # "required" no basta: la foto que ya tenía la tarea cuenta como valor
+        if not self.files.get(self.add_prefix('imagen_evidencia')):
+            raise ValidationError("Adjunte una foto.")
+        return self.cleaned_data['imagen_evidencia']
@@ -0,0 +1,157 @@
+"""
+Procesamiento de las fotos de evidencia (TareaInspeccion.imagen_evidencia).
+
+Al subirse una foto nueva se procesa FUERA del request (hilo en segundo plano,
+después del commit):
+
+1. Se endereza según la orientación EXIF (fotos de celular giradas).
+2. Se re-codifica sin metadatos EXIF (GPS, modelo del teléfono, etc.),
+   limitada a EVIDENCIA_LADO_MAXIMO px y EVIDENCIA_CALIDAD.
+3. Se genera una miniatura de EVIDENCIA_LADO_MINIATURA px para los listados.
+
+El original se reemplaza por la versión optimizada. Las fotos antiguas se
+pueden procesar con ``python manage.py procesar_evidencias``.
+"""
+
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+_ejecutor = None
+
+FORMATOS = {
+    'JPEG': ('.jpg', {'optimize': True, 'progressive': True}),
+    'WEBP': ('.webp', {'method': 4}),
+}
+
+
+def _config(nombre, por_defecto):
+    return getattr(settings, nombre, por_defecto)
+
+
+def _codificar(imagen, formato, calidad):
+    extension, opciones = FORMATOS[formato]
+    if imagen.mode not in ('RGB', 'L'):
+        # JPEG no soporta transparencia: la aplanamos sobre fondo blanco
+        fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+        if imagen.mode in ('RGBA', 'LA') or 'transparency' in imagen.info:
+            imagen = imagen.convert('RGBA')
+            fondo.paste(imagen, mask=imagen.split()[-1])
+        else:
+            fondo.paste(imagen.convert('RGB'))
+        imagen = fondo
+    salida = io.BytesIO()
+    # Al no pasar exif=..., Pillow no copia los metadatos del original
+    imagen.save(salida, formato, quality=calidad, **opciones)
+    return salida.getvalue(), extension
+
+
+def optimizar_imagen(contenido):
+    """
+    Recibe los bytes de la foto original y devuelve
+    ``(bytes_optimizada, bytes_miniatura, extension)``.
+    """
+    formato = _config('EVIDENCIA_FORMATO', 'JPEG')
+    lado_maximo = _config('EVIDENCIA_LADO_MAXIMO', 1600)
+    lado_miniatura = _config('EVIDENCIA_LADO_MINIATURA', 200)
+
+    with Image.open(io.BytesIO(contenido)) as original:
+        imagen = ImageOps.exif_transpose(original)
+        imagen.thumbnail((lado_maximo, lado_maximo), Image.LANCZOS)
+        optimizada, extension = _codificar(imagen, formato, _config('EVIDENCIA_CALIDAD', 82))
+
+        miniatura = ImageOps.fit(imagen, (lado_miniatura, lado_miniatura), Image.LANCZOS)
+        miniatura, _ = _codificar(miniatura, formato, _config('EVIDENCIA_CALIDAD_MINIATURA', 75))
+
+    return optimizada, miniatura, extension
+
+
+def procesar_evidencia(tarea_id):
+    """
+    Optimiza la foto de una tarea y genera su miniatura. Si la foto cambió
+    mientras se procesaba, se descarta el resultado (la nueva se procesará
+    en su propio turno).
+    """
+    from .models import TareaInspeccion
+
+    tarea = TareaInspeccion.objects.only('imagen_evidencia', 'miniatura_evidencia').get(pk=tarea_id)
+    if not tarea.imagen_evidencia:
+        return False
+
+    nombre_original = tarea.imagen_evidencia.name
+    with tarea.imagen_evidencia.open('rb') as f:
+        optimizada, miniatura, extension = optimizar_imagen(f.read())
+
+    base = os.path.splitext(os.path.basename(nombre_original))[0]
+    campo_imagen = TareaInspeccion._meta.get_field('imagen_evidencia')
+    campo_miniatura = TareaInspeccion._meta.get_field('miniatura_evidencia')
+    nuevo_nombre = default_storage.save(campo_imagen.generate_filename(tarea, base + extension), ContentFile(optimizada))
+    nombre_miniatura = default_storage.save(campo_miniatura.generate_filename(tarea, base + extension), ContentFile(miniatura))
+
+    # UPDATE condicionado al nombre original: no dispara señales (no genera una
+    # notificación nueva) y no pisa una foto subida mientras procesábamos.
+    actualizadas = TareaInspeccion.objects.filter(
+        pk=tarea_id, imagen_evidencia=nombre_original
+    ).update(imagen_evidencia=nuevo_nombre, miniatura_evidencia=nombre_miniatura)
+
+    if not actualizadas:
+        default_storage.delete(nuevo_nombre)
+        default_storage.delete(nombre_miniatura)
+        return False
+
+    for anterior in (nombre_original, tarea.miniatura_evidencia.name):
+        if anterior and anterior != nuevo_nombre:
+            default_storage.delete(anterior)
+    return True
+
+
+def _procesar_seguro(tarea_id):
+    try:
+        procesar_evidencia(tarea_id)
+    except Exception:
+        logger.exception("Error al procesar la evidencia de la tarea #%s", tarea_id)
+    finally:
+        # Cada hilo abre su propia conexión a la BD: la cerramos al terminar
+        if _config('EVIDENCIA_EN_SEGUNDO_PLANO', True):
+            connection.close()
+
+
+def _obtener_ejecutor():
+    global _ejecutor
+    if _ejecutor is None:
+        _ejecutor = ThreadPoolExecutor(
+            max_workers=_config('EVIDENCIA_HILOS', 2),
+            thread_name_prefix='evidencias',
+        )
+    return _ejecutor
+
+
+def programar_procesamiento(tarea_id):
+    """
+    Agenda el procesamiento para DESPUÉS del commit (el archivo y la fila ya
+    existen). Con EVIDENCIA_EN_SEGUNDO_PLANO = False se procesa en el mismo hilo.
+    """
+    programar_procesamiento_lote([tarea_id])
+
+
+def programar_procesamiento_lote(tarea_ids):
+    """Como ``programar_procesamiento``, con un solo callback de commit para todas las fotos."""
+    tarea_ids = list(tarea_ids)
+
+    def _lanzar():
+        for tarea_id in tarea_ids:
+            if _config('EVIDENCIA_EN_SEGUNDO_PLANO', True):
+                _obtener_ejecutor().submit(_procesar_seguro, tarea_id)
+            else:
+                _procesar_seguro(tarea_id)
+
+    transaction.on_commit(_lanzar)
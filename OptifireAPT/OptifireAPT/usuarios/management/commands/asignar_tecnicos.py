@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from usuarios.asignacion import asignar_pendientes
+
+
+class Command(BaseCommand):
+    help = "Preasigna automáticamente el mejor técnico a las solicitudes PENDIENTES."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=None, help="Máximo de solicitudes a asignar.")
+        parser.add_argument('--reasignar', action='store_true', help="Recalcula también las que ya tienen técnico.")
+        parser.add_argument('--simular', action='store_true', help="Muestra el resultado sin guardar.")
+
+    def handle(self, *args, **options):
+        asignaciones = asignar_pendientes(options['limite'], options['reasignar'], options['simular'])
+        if options['verbosity'] > 1 or options['simular']:
+            for solicitud, puntaje, tecnico in asignaciones:
+                self.stdout.write(f"  Solicitud #{solicitud.pk} -> {tecnico.username} (puntaje {puntaje})")
+
+        prefijo = "[SIMULACIÓN] " if options['simular'] else ""
+        self.stdout.write(self.style.SUCCESS(f"{prefijo}👷 Solicitudes asignadas: {len(asignaciones)}"))
@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from usuarios.sqlite import MODOS_BENCHMARK, medir_escrituras
+
+
+class Command(BaseCommand):
+    help = ("Mide escrituras concurrentes en SQLite con la configuración por defecto de Django "
+            "y con SQLITE_AJUSTES (WAL + BEGIN IMMEDIATE), sobre una BD temporal.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trabajadores', type=int, nargs='+', default=[1, 4, 8, 16], help="Hilos escritores a probar.")
+        parser.add_argument('--segundos', type=float, default=5.0, help="Duración de cada medición.")
+        parser.add_argument('--lectores', type=int, default=2, help="Hilos de solo lectura en paralelo.")
+        parser.add_argument('--directorio', default=None, help="Dónde crear la BD temporal (mismo disco que la real).")
+        parser.add_argument('--json', dest='salida_json', help="Guardar los resultados en este archivo JSON.")
+
+    def handle(self, *args, **options):
+        resultados = []
+        self.stdout.write(f"{'modo':<10}{'hilos':>6}{'escr/s':>10}{'errores':>9}{'lect/s':>10}{'p50':>9}{'p95':>9}{'p99':>9}")
+        for trabajadores in options['trabajadores']:
+            for modo in MODOS_BENCHMARK:
+                r = medir_escrituras(
+                    modo, trabajadores=trabajadores, segundos=options['segundos'],
+                    lectores=options['lectores'], directorio=options['directorio'],
+                )
+                resultados.append(r)
+                self.stdout.write(
+                    f"{modo:<10}{trabajadores:>6}{r['escrituras_por_segundo']:>10}{r['errores']:>9}"
+                    f"{r['lecturas_por_segundo']:>10}{str(r['p50_ms']):>9}{str(r['p95_ms']):>9}{str(r['p99_ms']):>9}"
+                )
+
+        if options['salida_json']:
+            with open(options['salida_json'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2)
+            self.stdout.write(f"Resultados guardados en {options['salida_json']}")
+        self.stdout.write(self.style.SUCCESS("⏱️ 'errores' = transacciones que fallaron con \"database is locked\"."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from usuarios.notificaciones import TAMANO_LOTE_COMPACTACION, compactar_leidas
+
+
+class Command(BaseCommand):
+    help = "Archiva (o elimina) las notificaciones leídas antiguas en lotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=30, help="Antigüedad mínima en días de las notificaciones leídas.")
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE_COMPACTACION, help="Filas por transacción.")
+        parser.add_argument('--eliminar', action='store_true', help="Eliminar en vez de archivar en NotificacionArchivada.")
+
+    def handle(self, *args, **options):
+        total = 0
+        for cantidad in compactar_leidas(options['dias'], options['lote'], archivar=not options['eliminar']):
+            total += cantidad
+            self.stdout.write(f"🗄️ Lote procesado: {cantidad} (acumulado {total})")
+
+        accion = "eliminadas" if options['eliminar'] else "archivadas"
+        self.stdout.write(self.style.SUCCESS(f"Notificaciones {accion}: {total}"))
@@ -0,0 +1,35 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from usuarios.correos import procesar_lote
+
+logger = logging.getLogger('usuarios.correos')
+
+
+class Command(BaseCommand):
+    help = "Despacha la bandeja de salida de correos (CorreoPendiente) en lotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=None, help="Correos por lote (por defecto CORREOS_TAMANO_LOTE).")
+        parser.add_argument('--max-intentos', type=int, default=None, help="Intentos antes de marcar el correo como FALLIDO.")
+        parser.add_argument('--intervalo', type=float, default=5.0, help="Segundos de espera cuando la cola está vacía.")
+        parser.add_argument('--una-vez', action='store_true', help="Drena la cola una vez y termina (útil en cron).")
+
+    def handle(self, *args, **options):
+        while True:
+            resultado = procesar_lote(options['lote'], options['max_intentos'])
+            procesados = sum(resultado.values())
+
+            if procesados:
+                logger.info(
+                    "Lote de correos: %d enviados, %d reintentos, %d fallidos",
+                    resultado['enviados'], resultado['reintentos'], resultado['fallidos'],
+                )
+                # Lote lleno o parcial: seguimos drenando sin esperar
+                continue
+
+            if options['una_vez']:
+                break
+            time.sleep(options['intervalo'])
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from usuarios.imagenes import procesar_evidencia
+from usuarios.models import TareaInspeccion
+
+
+class Command(BaseCommand):
+    help = "Optimiza las fotos de evidencia existentes y genera sus miniaturas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=None, help="Máximo de fotos a procesar en esta ejecución.")
+
+    def handle(self, *args, **options):
+        pendientes = TareaInspeccion.objects.exclude(
+            Q(imagen_evidencia__isnull=True) | Q(imagen_evidencia='')
+        ).filter(
+            Q(miniatura_evidencia__isnull=True) | Q(miniatura_evidencia='')
+        ).order_by('id').values_list('id', flat=True)
+
+        if options['limite']:
+            pendientes = pendientes[:options['limite']]
+
+        procesadas = errores = 0
+        for tarea_id in pendientes.iterator(chunk_size=200):
+            try:
+                if procesar_evidencia(tarea_id):
+                    procesadas += 1
+            except Exception as e:
+                errores += 1
+                self.stderr.write(f"Tarea #{tarea_id}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"📸 Evidencias procesadas: {procesadas} | Errores: {errores}"))
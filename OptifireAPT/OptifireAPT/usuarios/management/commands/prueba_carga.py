@@ -0,0 +1,43 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from usuarios.carga import CLAVE_POR_DEFECTO, ejecutar, formatear
+
+
+class Command(BaseCommand):
+    help = ("Prueba de carga del flujo solicitud -> cotización -> aceptación -> checklist -> acta "
+            "contra un servidor en marcha, con N usuarios virtuales concurrentes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Servidor a probar.")
+        parser.add_argument('--usuarios', type=int, default=5, help="Usuarios virtuales concurrentes.")
+        parser.add_argument('--iteraciones', type=int, default=3, help="Flujos por usuario virtual.")
+        parser.add_argument('--duracion', type=float, default=None, help="Segundos de prueba (ignora --iteraciones).")
+        parser.add_argument('--tecnicos', type=int, default=3, help="Técnicos sembrados disponibles (sintetico_tecnicoN).")
+        parser.add_argument('--administradores', type=int, default=1, help="Administradores sembrados (sintetico_adminN).")
+        parser.add_argument('--clave', default=CLAVE_POR_DEFECTO, help="Contraseña de las cuentas de seed_optifire.")
+        parser.add_argument('--json', dest='salida_json', help="Guardar el resumen en este archivo JSON.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"🚀 {options['usuarios']} usuarios virtuales contra {options['url']} "
+            "(cuentas de `manage.py seed_optifire`)..."
+        )
+        errores = []
+        resumen = ejecutar(
+            options['url'], usuarios=options['usuarios'], iteraciones=options['iteraciones'],
+            duracion=options['duracion'], clave=options['clave'], tecnicos=options['tecnicos'],
+            administradores=options['administradores'], errores=errores,
+        )
+        self.stdout.write(formatear(resumen))
+        for error in errores[:10]:
+            self.stderr.write(f"  ⚠️ {error}")
+
+        if options['salida_json']:
+            with open(options['salida_json'], 'w', encoding='utf-8') as archivo:
+                json.dump(resumen, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resumen guardado en {options['salida_json']}")
+
+        if not resumen['flujos']:
+            raise CommandError("Ningún flujo terminó correctamente.")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from usuarios.estadisticas import TAMANO_LOTE_RECONSTRUCCION, reconstruir_resumenes
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero los resúmenes de estadísticas (rollups) leyendo el historial en lotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE_RECONSTRUCCION, help="Rango de ids por consulta.")
+
+    def handle(self, *args, **options):
+        def progreso(tabla, avance):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  {tabla}: hasta id {avance}")
+
+        dias, tecnicos = reconstruir_resumenes(options['lote'], progreso)
+        self.stdout.write(self.style.SUCCESS(
+            f"📊 Resúmenes reconstruidos: {dias} filas día×estado, {tecnicos} filas técnico×estado"
+        ))
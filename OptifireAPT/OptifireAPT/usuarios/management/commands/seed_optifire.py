@@ -0,0 +1,47 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from usuarios.sintetico import CLAVE_USUARIOS, TAMANO_LOTE_SEMILLA, TAMANOS, GeneradorSintetico
+
+
+class Command(BaseCommand):
+    help = "Genera datos sintéticos realistas (usuarios, plantillas, solicitudes, OTs, tareas, avisos) a escala."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamano', choices=list(TAMANOS), default='chico', help="Preset de volumen.")
+        parser.add_argument('--semilla', type=int, default=1, help="Misma semilla = mismos datos.")
+        parser.add_argument('--hasta', type=datetime.date.fromisoformat, default=None,
+                            help="Fecha más reciente (AAAA-MM-DD). Por defecto hoy; fíjela para datos idénticos entre días.")
+        parser.add_argument('--dias', type=int, default=730, help="Días de historial hacia atrás.")
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE_SEMILLA, help="Filas por INSERT/transacción.")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        ultimo = {}
+
+        def progreso(tabla, total):
+            # Un aviso cada ~10 lotes para no inundar la consola
+            if options['verbosity'] > 1 or total - ultimo.get(tabla, 0) >= options['lote'] * 10:
+                ultimo[tabla] = total
+                self.stdout.write(f"  {tabla}: {total:,}")
+
+        generador = GeneradorSintetico(
+            options['tamano'], semilla=options['semilla'], hasta=options['hasta'],
+            dias=options['dias'], lote=options['lote'], progreso=progreso,
+        )
+        self.stdout.write(f"🌱 Sembrando preset '{options['tamano']}' (semilla {options['semilla']})...")
+        try:
+            totales = generador.generar()
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        filas = sum(totales.values())
+        segundos = time.perf_counter() - inicio
+        for tabla, total in totales.items():
+            self.stdout.write(f"  {tabla}: {total:,}")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {filas:,} filas en {segundos:.1f}s ({filas / segundos:,.0f} filas/s). "
+            f"Contraseña de todos los usuarios: {CLAVE_USUARIOS}"
+        ))
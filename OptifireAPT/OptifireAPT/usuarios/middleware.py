@@ -0,0 +1,21 @@
+from django.conf import settings
+
+from .roles import cargar_roles_desde_sesion
+
+
+class RolesUsuarioMiddleware:
+    """
+    Prepara la resolución de roles del request: si ROLES_CACHE_SESION está
+    activo, los toma de la sesión; si no, se consultarán (una sola vez) la
+    primera vez que una vista los necesite. Ver usuarios/roles.py.
+
+    Debe ir DESPUÉS de AuthenticationMiddleware en settings.MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if getattr(settings, 'ROLES_CACHE_SESION', False) and request.user.is_authenticated:
+            cargar_roles_desde_sesion(request.user, request.session)
+        return self.get_response(request)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 10:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0012_correopendiente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tareainspeccion',
+            name='miniatura_evidencia',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='inspecciones/evidencias/miniaturas/', verbose_name='Miniatura de Evidencia'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 10:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0013_tareainspeccion_miniatura_evidencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario', 'leido', 'fecha_creacion'], name='notif_usuario_leido_fecha'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.8 on 2026-10-17 10:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def poblar_resumenes(apps, schema_editor):
+    """Carga inicial de los resúmenes con el historial existente."""
+    SolicitudInspeccion = apps.get_model('usuarios', 'SolicitudInspeccion')
+    Inspeccion = apps.get_model('usuarios', 'Inspeccion')
+    ResumenDiarioSolicitudes = apps.get_model('usuarios', 'ResumenDiarioSolicitudes')
+    ResumenTecnicoEstado = apps.get_model('usuarios', 'ResumenTecnicoEstado')
+
+    por_dia = (
+        SolicitudInspeccion.objects.annotate(dia=TruncDate('fecha_solicitud'))
+        .values('dia', 'estado').annotate(cantidad=Count('pk')).order_by()
+    )
+    ResumenDiarioSolicitudes.objects.bulk_create([
+        ResumenDiarioSolicitudes(fecha=f['dia'], estado=f['estado'], total=f['cantidad'])
+        for f in por_dia if f['dia'] is not None
+    ], batch_size=1000)
+
+    por_tecnico = Inspeccion.objects.values('tecnico_id', 'estado').annotate(cantidad=Count('pk')).order_by()
+    ResumenTecnicoEstado.objects.bulk_create([
+        ResumenTecnicoEstado(tecnico_id=f['tecnico_id'], estado=f['estado'], total=f['cantidad'])
+        for f in por_tecnico
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0015_notificacionarchivada'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioSolicitudes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente de Revisión (Admin)'), ('COTIZANDO', 'Pendiente de Aprobación (Cliente)'), ('APROBADA', 'Aprobada (Orden Creada)'), ('COMPLETADA', 'Finalizada'), ('RECHAZADA', 'Rechazada'), ('ANULADA', 'Anulada por Cliente')], max_length=20)),
+                ('total', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'estado'), name='resumen_diario_fecha_estado')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenTecnicoEstado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('ASIGNADA', 'Asignada a Técnico'), ('EN_CURSO', 'En Curso'), ('COMPLETADA', 'Terminada')], max_length=20)),
+                ('total', models.IntegerField(default=0)),
+                ('tecnico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumen_inspecciones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('tecnico', 'estado'), name='resumen_tecnico_estado')],
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
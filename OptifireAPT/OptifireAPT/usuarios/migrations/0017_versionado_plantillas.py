@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0016_resumenes_estadisticas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspeccion',
+            name='version_plantilla',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='plantillainspeccion',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-17 11:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0017_versionado_plantillas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='notificacion',
+            name='notif_usuario_leido_fecha',
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(condition=models.Q(('leido', False)), fields=['usuario', 'fecha_creacion'], name='notif_no_leidas_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario', 'fecha_creacion'], name='notif_usuario_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitudinspeccion',
+            index=models.Index(fields=['estado', 'fecha_solicitud'], name='solicitud_estado_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitudinspeccion',
+            index=models.Index(fields=['cliente', 'fecha_solicitud'], name='solicitud_cliente_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitudinspeccion',
+            index=models.Index(fields=['fecha_solicitud'], name='solicitud_fecha'),
+        ),
+        # login_view busca al usuario por email; auth_user no trae ese índice
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS "usuarios_auth_user_email_idx" ON "auth_user" ("email");',
+            reverse_sql='DROP INDEX IF EXISTS "usuarios_auth_user_email_idx";',
+        ),
+    ]
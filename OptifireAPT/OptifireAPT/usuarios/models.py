@@ -5,6 +5,9 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
+from .roles import obtener_roles
+from .seguimiento import ModeloConSeguimiento
+
 User = get_user_model()
 
 # ==========================================================
@@ -35,6 +38,11 @@ class EstadoTarea(models.TextChoices):
     NO_APLICA = 'N/A', _('No Aplica')
     PENDIENTE = 'PENDIENTE', _('Pendiente')
 
+class EstadoCorreo(models.TextChoices):
+    PENDIENTE = 'PENDIENTE', _('Pendiente de Envío')
+    ENVIADO = 'ENVIADO', _('Enviado')
+    FALLIDO = 'FALLIDO', _('Fallido (Sin más reintentos)')
+
 # ==========================================================
 # 2. PERFIL DE USUARIO
 # ==========================================================
@@ -71,11 +79,12 @@ class Perfil(models.Model):
         return f"Perfil de {self.usuario.username}"
 
     def get_role(self):
-        # (Tu lógica de roles se mantiene igual)
+        # Usa los roles ya resueltos del usuario (una sola consulta por request)
         if self.usuario.is_superuser: return Roles.ADMINISTRADOR
-        if self.usuario.groups.filter(name=Roles.ADMINISTRADOR).exists(): return Roles.ADMINISTRADOR
-        if self.usuario.groups.filter(name=Roles.TECNICO).exists(): return Roles.TECNICO
-        if self.usuario.groups.filter(name=Roles.CLIENTE).exists(): return Roles.CLIENTE
+        roles = obtener_roles(self.usuario)
+        if Roles.ADMINISTRADOR in roles: return Roles.ADMINISTRADOR
+        if Roles.TECNICO in roles: return Roles.TECNICO
+        if Roles.CLIENTE in roles: return Roles.CLIENTE
         return 'Sin Rol'
 
 @receiver(post_save, sender=User)
@@ -94,6 +103,18 @@ class PlantillaInspeccion(models.Model):
     nombre = models.CharField(max_length=200, unique=True)
     descripcion = models.TextField(blank=True, null=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Sube con cada cambio de sus tareas (señales): identifica la lista de tareas
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    def save(self, *args, **kwargs):
+        # La versión solo la sube subir_version() con F(): un save() de una
+        # instancia cargada antes no debe devolverle su valor viejo
+        if not self._state.adding and self.pk is not None:
+            campos = kwargs.get('update_fields')
+            if campos is None:
+                campos = [f.name for f in self._meta.concrete_fields if not f.primary_key]
+            kwargs['update_fields'] = [c for c in campos if c != 'version']
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.nombre
@@ -114,7 +135,10 @@ class TareaPlantilla(models.Model):
 # ==========================================================
 
 
-class SolicitudInspeccion(models.Model):
+class SolicitudInspeccion(ModeloConSeguimiento):
+    # Correos y resúmenes reaccionan a los cambios de estado (signals.py)
+    campos_seguidos = ('estado',)
+
     cliente = models.ForeignKey(User, on_delete=models.CASCADE, related_name='solicitudes_enviadas')
 
     # Datos de Contacto
@@ -147,6 +171,14 @@ class SolicitudInspeccion(models.Model):
     )
     motivo_rechazo = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Listados paginados por fecha: filtrados por estado, por cliente o sin filtro
+            models.Index(fields=['estado', 'fecha_solicitud'], name='solicitud_estado_fecha'),
+            models.Index(fields=['cliente', 'fecha_solicitud'], name='solicitud_cliente_fecha'),
+            models.Index(fields=['fecha_solicitud'], name='solicitud_fecha'),
+        ]
+
     def __str__(self):
         return f"Solicitud #{self.id} - {self.get_estado_display()}"
 
@@ -154,7 +186,10 @@ class SolicitudInspeccion(models.Model):
 # 5. INSPECCIÓN (Orden de Trabajo)
 # ==========================================================
 
-class Inspeccion(models.Model):
+class Inspeccion(ModeloConSeguimiento):
+    # Resúmenes por técnico y disponibilidad (signals.py)
+    campos_seguidos = ('tecnico', 'estado', 'fecha_programada')
+
     solicitud = models.OneToOneField(
         SolicitudInspeccion,
         on_delete=models.CASCADE,
@@ -170,6 +205,8 @@ class Inspeccion(models.Model):
     )
     
     plantilla_base = models.ForeignKey(PlantillaInspeccion, on_delete=models.SET_NULL, null=True, blank=True)
+    # Versión de la plantilla de la que se copiaron las tareas
+    version_plantilla = models.PositiveIntegerField(null=True, blank=True, editable=False)
     
     nombre_inspeccion = models.CharField(max_length=200)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
@@ -193,7 +230,10 @@ class Inspeccion(models.Model):
     def __str__(self):
         return f"OT #{self.id} - {self.nombre_inspeccion}"
 
-class TareaInspeccion(models.Model):
+class TareaInspeccion(ModeloConSeguimiento):
+    # Foto nueva -> notificación y procesamiento (signals.py)
+    campos_seguidos = ('imagen_evidencia',)
+
     inspeccion = models.ForeignKey(Inspeccion, on_delete=models.CASCADE, related_name='tareas')
     plantilla_tarea = models.ForeignKey(TareaPlantilla, on_delete=models.SET_NULL, null=True, blank=True)
     
@@ -219,6 +259,15 @@ class TareaInspeccion(models.Model):
         verbose_name="Imagen de Evidencia"
     )
 
+    # Miniatura generada por usuarios/imagenes.py (para listados y modales)
+    miniatura_evidencia = models.ImageField(
+        upload_to='inspecciones/evidencias/miniaturas/',
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Miniatura de Evidencia"
+    )
+
     estado = models.CharField(
         max_length=50, 
         choices=EstadoTarea.choices, 
@@ -227,11 +276,124 @@ class TareaInspeccion(models.Model):
     )
 
 class Notificacion(models.Model):
-    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notificaciones')
+    # Sin FK en la BD: las notificaciones pueden ir en otra base (usuarios/routers.py).
+    # Al borrar un usuario, sus notificaciones las borra la señal borrar_notificaciones_usuario.
+    usuario = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='notificaciones'
+    )
     mensaje = models.CharField(max_length=255)
     enlace = models.CharField(max_length=255, blank=True, null=True) # Para ir a ver la foto
     leido = models.BooleanField(default=False)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Contador y lista de no leídas del context processor (parcial: solo las no leídas)
+            models.Index(
+                fields=['usuario', 'fecha_creacion'], condition=models.Q(leido=False),
+                name='notif_no_leidas_fecha',
+            ),
+            # Bandeja completa del usuario, más recientes primero
+            models.Index(fields=['usuario', 'fecha_creacion'], name='notif_usuario_fecha'),
+        ]
+
+    def __str__(self):
+        return f"Notificación para {self.usuario.username}: {self.mensaje}"
+
+
+class NotificacionArchivada(models.Model):
+    """
+    Notificaciones leídas antiguas, movidas fuera de la tabla ``Notificacion``
+    por ``python manage.py compactar_notificaciones`` para que la tabla que se
+    consulta en cada página se mantenga chica.
+    """
+    usuario = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='notificaciones_archivadas'
+    )
+    mensaje = models.CharField(max_length=255)
+    enlace = models.CharField(max_length=255, blank=True, null=True)
+    fecha_creacion = models.DateTimeField()
+    fecha_archivado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['usuario', 'fecha_creacion'], name='notif_arch_usuario_fecha'),
+        ]
+
+    def __str__(self):
+        return f"Notificación archivada de {self.usuario.username}: {self.mensaje}"
+
+# ==========================================================
+# 6. BANDEJA DE SALIDA DE CORREOS (OUTBOX)
+# ==========================================================
+
+class CorreoPendiente(models.Model):
+    """
+    Correo encolado dentro de la misma transacción que el cambio de estado.
+    Lo despacha el comando ``python manage.py enviar_correos``.
+    """
+    asunto = models.CharField(max_length=255)
+    cuerpo_texto = models.TextField()
+    cuerpo_html = models.TextField(blank=True, null=True)
+    remitente = models.CharField(max_length=255)
+    destinatarios = models.JSONField(default=list)
+
+    # Adjunto opcional (p.ej. la orden de facturación en PDF)
+    adjunto_nombre = models.CharField(max_length=255, blank=True, null=True)
+    adjunto_contenido = models.BinaryField(blank=True, null=True)
+    adjunto_tipo = models.CharField(max_length=100, blank=True, null=True)
+
+    estado = models.CharField(
+        max_length=20,
+        choices=EstadoCorreo.choices,
+        default=EstadoCorreo.PENDIENTE
+    )
+    intentos = models.PositiveIntegerField(default=0)
+    ultimo_error = models.TextField(blank=True, null=True)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # El worker busca siempre: estado PENDIENTE y proximo_intento vencido
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento']),
+        ]
+
+    def __str__(self):
+        return f"Correo #{self.id} a {', '.join(self.destinatarios)} ({self.get_estado_display()})"
+
+# ==========================================================
+# 7. RESÚMENES PARA ESTADÍSTICAS (ROLLUPS)
+# ==========================================================
+# Se mantienen desde las señales (usuarios/estadisticas.py) y se
+# reconstruyen con ``python manage.py reconstruir_estadisticas``.
+
+class ResumenDiarioSolicitudes(models.Model):
+    """Solicitudes creadas el día ``fecha`` que hoy están en ``estado``."""
+    fecha = models.DateField()
+    estado = models.CharField(max_length=20, choices=EstadoSolicitud.choices)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'estado'], name='resumen_diario_fecha_estado'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.estado}: {self.total}"
+
+
+class ResumenTecnicoEstado(models.Model):
+    """Inspecciones del técnico que hoy están en ``estado``."""
+    tecnico = models.ForeignKey(User, on_delete=models.CASCADE, related_name='resumen_inspecciones')
+    estado = models.CharField(max_length=20, choices=EstadoInspeccion.choices)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tecnico', 'estado'], name='resumen_tecnico_estado'),
+        ]
+
     def __str__(self):
-        return f"Notificación para {self.usuario.username}: {self.mensaje}"
\ No newline at end of file
+        return f"{self.tecnico_id} {self.estado}: {self.total}"
@@ -0,0 +1,246 @@
+"""
+Servicio de notificaciones internas (Pop-ups de ``Notificacion``).
+
+Todas las notificaciones se crean por aquí con UN solo ``bulk_create``,
+sin importar cuántos destinatarios o mensajes haya:
+
+    notificar(usuario_o_lista_o_queryset, "mensaje", enlace)
+    notificar_rol(Roles.ADMINISTRADOR, "mensaje", enlace)
+    notificar_lote([
+        (usuarios_con_rol(Roles.ADMINISTRADOR), "mensaje admins", enlace),
+        (tecnico, "mensaje técnico", otro_enlace),
+    ])
+
+Los destinatarios pueden ser un ``User``, un id, una lista de ellos o un
+QuerySet de usuarios (se resuelve con una sola consulta de ids).
+
+El contador de no leídas de cada usuario vive en el cache
+(``contar_no_leidas``) y se invalida al crear o marcar notificaciones.
+
+Las leídas antiguas se archivan en ``NotificacionArchivada`` con
+``python manage.py compactar_notificaciones``.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+from .models import Notificacion, NotificacionArchivada, TareaInspeccion
+from .routers import bd_notificaciones
+from .tiempo_real import publicar_notificaciones
+
+TAMANO_LOTE_INSERT = 500
+
+TAMANO_LOTE_COMPACTACION = 1000
+
+# Respaldo por si alguna ruta modifica notificaciones sin invalidar
+TTL_CONTADOR = 300
+
+
+# ==========================================================
+# 1. CONTADOR DE NO LEÍDAS (CACHE)
+# ==========================================================
+
+def _clave_no_leidas(usuario_id):
+    return f'notificaciones:no_leidas:{usuario_id}'
+
+
+def contar_no_leidas(usuario_id):
+    clave = _clave_no_leidas(usuario_id)
+    total = cache.get(clave)
+    if total is None:
+        total = Notificacion.objects.filter(usuario_id=usuario_id, leido=False).count()
+        cache.set(clave, total, TTL_CONTADOR)
+    return total
+
+
+def invalidar_no_leidas(usuario_ids):
+    """
+    Borra el contador DESPUÉS del commit: si se borrara antes, otro request
+    podría volver a cachear el valor viejo mientras la transacción sigue abierta.
+    """
+    claves = [_clave_no_leidas(pk) for pk in set(usuario_ids)]
+    if claves:
+        transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+class ResumenNotificaciones:
+    """
+    Lo que ve el template: no hace consultas hasta que se usa, y si el
+    contador (cacheado) es 0 tampoco consulta la lista.
+    """
+
+    def __init__(self, usuario_id, limite):
+        self.usuario_id = usuario_id
+        self.limite = limite
+
+    @cached_property
+    def no_leidas(self):
+        return contar_no_leidas(self.usuario_id)
+
+    @cached_property
+    def ultimas(self):
+        if not self.no_leidas:
+            return []
+        return list(
+            Notificacion.objects.filter(usuario_id=self.usuario_id, leido=False)
+            .only('id', 'mensaje', 'enlace', 'fecha_creacion')
+            .order_by('-fecha_creacion', '-id')[:self.limite]
+        )
+
+    @property
+    def ultimo_id(self):
+        """Id más reciente mostrado: desde ahí sigue el stream en tiempo real."""
+        return max((n.pk for n in self.ultimas), default=0)
+
+    @property
+    def ocultas(self):
+        return max(self.no_leidas - self.limite, 0)
+
+    def __iter__(self):
+        return iter(self.ultimas)
+
+    def __len__(self):
+        return len(self.ultimas)
+
+    def __bool__(self):
+        return self.no_leidas > 0
+
+
+def resumen_notificaciones(usuario):
+    return ResumenNotificaciones(usuario.pk, getattr(settings, 'NOTIFICACIONES_MAX_VISIBLES', 5))
+
+
+# ==========================================================
+# 2. CREACIÓN EN LOTE
+# ==========================================================
+
+def usuarios_con_rol(*roles):
+    """QuerySet (perezoso) de los usuarios que pertenecen a alguno de los roles."""
+    return User.objects.filter(groups__name__in=roles)
+
+
+def _ids_destinatarios(destinatarios):
+    if destinatarios is None:
+        return []
+    if isinstance(destinatarios, QuerySet):
+        return list(destinatarios.order_by().values_list('pk', flat=True).distinct())
+    if isinstance(destinatarios, (User, int)):
+        destinatarios = [destinatarios]
+    ids = []
+    for destinatario in destinatarios:
+        pk = destinatario if isinstance(destinatario, int) else getattr(destinatario, 'pk', None)
+        if pk is not None and pk not in ids:
+            ids.append(pk)
+    return ids
+
+
+def _crear(notificaciones):
+    creadas = Notificacion.objects.bulk_create(notificaciones, batch_size=TAMANO_LOTE_INSERT)
+    # bulk_create no dispara post_save: invalidamos y publicamos aquí
+    invalidar_no_leidas(n.usuario_id for n in creadas)
+    transaction.on_commit(lambda: publicar_notificaciones(creadas))
+    return creadas
+
+
+def notificar_lote(avisos):
+    """
+    ``avisos`` es una lista de tuplas ``(destinatarios, mensaje, enlace)``.
+    Crea todas las notificaciones en un solo INSERT y las retorna.
+
+    Con base propia para las notificaciones (usuarios/routers.py) el INSERT
+    no entraría en la transacción de ``default`` que hizo el cambio de
+    estado: se hace recién cuando esa transacción se confirma (si se
+    revierte, no queda el aviso). En ese caso las notificaciones retornadas
+    reciben su id al confirmarse.
+    """
+    notificaciones = [
+        Notificacion(usuario_id=usuario_id, mensaje=mensaje, enlace=enlace)
+        for destinatarios, mensaje, enlace in avisos
+        for usuario_id in _ids_destinatarios(destinatarios)
+    ]
+    if not notificaciones:
+        return []
+    if bd_notificaciones() != DEFAULT_DB_ALIAS:
+        # Fuera de una transacción, on_commit ejecuta de inmediato
+        transaction.on_commit(lambda: _crear(notificaciones), using=DEFAULT_DB_ALIAS, robust=True)
+        return notificaciones
+    return _crear(notificaciones)
+
+
+def notificar(destinatarios, mensaje, enlace=None):
+    return notificar_lote([(destinatarios, mensaje, enlace)])
+
+
+def notificar_rol(rol, mensaje, enlace=None):
+    return notificar(usuarios_con_rol(rol), mensaje, enlace)
+
+
+def notificar_evidencias(tarea_ids):
+    """
+    Avisa al cliente de cada tarea que tiene una foto de evidencia nueva.
+    Una consulta para resolver los clientes y un INSERT para todas las fotos.
+    """
+    filas = TareaInspeccion.objects.filter(
+        pk__in=tarea_ids, inspeccion__solicitud__isnull=False
+    ).values_list('descripcion', 'inspeccion__solicitud_id', 'inspeccion__solicitud__cliente_id')
+
+    return notificar_lote([
+        (
+            cliente_id,
+            f"📸 Nueva evidencia cargada: {descripcion}",
+            f"/usuarios/solicitud/detalle/{solicitud_id}/",
+        )
+        for descripcion, solicitud_id, cliente_id in filas
+    ])
+
+
+# ==========================================================
+# 3. BANDEJA: MARCAR LEÍDAS Y COMPACTAR
+# ==========================================================
+
+def marcar_leidas(usuario_id, ids=None):
+    """
+    Marca como leídas las notificaciones ``ids`` del usuario (todas si
+    ``ids`` es None) con un único UPDATE. Retorna cuántas filas cambió.
+    """
+    pendientes = Notificacion.objects.filter(usuario_id=usuario_id, leido=False)
+    if ids is not None:
+        pendientes = pendientes.filter(pk__in=ids)
+    actualizadas = pendientes.update(leido=True)
+    if actualizadas:
+        # update() no dispara post_save
+        invalidar_no_leidas([usuario_id])
+    return actualizadas
+
+
+def compactar_leidas(dias, lote=TAMANO_LOTE_COMPACTACION, archivar=True):
+    """
+    Mueve (o borra, con ``archivar=False``) las notificaciones leídas con más
+    de ``dias`` días, de a ``lote`` filas por transacción para no bloquear la
+    tabla. Genera la cantidad procesada en cada lote.
+    """
+    limite = timezone.now() - datetime.timedelta(days=dias)
+    antiguas = Notificacion.objects.filter(leido=True, fecha_creacion__lt=limite).order_by('pk')
+
+    while True:
+        with transaction.atomic(using=bd_notificaciones()):
+            filas = list(antiguas.values('pk', 'usuario_id', 'mensaje', 'enlace', 'fecha_creacion')[:lote])
+            if not filas:
+                return
+            if archivar:
+                NotificacionArchivada.objects.bulk_create([
+                    NotificacionArchivada(
+                        usuario_id=f['usuario_id'], mensaje=f['mensaje'],
+                        enlace=f['enlace'], fecha_creacion=f['fecha_creacion'],
+                    ) for f in filas
+                ])
+            Notificacion.objects.filter(pk__in=[f['pk'] for f in filas]).delete()
+        yield len(filas)
+
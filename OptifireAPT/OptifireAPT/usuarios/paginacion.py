@@ -0,0 +1,183 @@
+"""
+Paginación por cursor (keyset) para los listados.
+
+A diferencia de OFFSET, cada página se obtiene con un WHERE sobre la última
+fila vista, p.ej. ``(fecha_solicitud, id) < (:fecha, :id)``, así que el costo
+de la página 1 y de la página 500 es el mismo. El cursor viaja en la URL como
+``?despues=<cursor>`` o ``?antes=<cursor>`` y conserva los filtros activos.
+
+El total tampoco recorre la tabla completa: se cuenta con un tope
+(``LIMITE_CONTEO``) y sobre ese número se muestra "más de N".
+"""
+
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+TAMANO_PAGINA = 25
+
+# Filas que se cuentan como máximo para el total de un listado
+LIMITE_CONTEO = 1000
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def codificar_cursor(valores):
+    datos = json.dumps([_serializar(v) for v in valores], separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, campos):
+    """
+    Devuelve la lista de valores, convertidos con ``to_python`` de cada campo
+    de ``campos``, o None si el cursor no es válido (p.ej. fue editado a mano).
+    """
+    if not cursor:
+        return None
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if not isinstance(valores, list) or len(valores) != len(campos):
+            return None
+        valores = [campo.to_python(valor) for campo, valor in zip(campos, valores)]
+    except (ValueError, TypeError, ValidationError):
+        return None
+    if any(valor is None for valor in valores):
+        return None
+    return valores
+
+
+def campos_orden(queryset, nombres):
+    """Campo de modelo (o ``output_field`` de la anotación) de cada nombre de ``nombres``."""
+    anotaciones = queryset.query.annotations
+    return [
+        anotaciones[nombre].output_field if nombre in anotaciones else queryset.model._meta.get_field(nombre)
+        for nombre in nombres
+    ]
+
+
+def condicion_keyset(campos, valores, descendente):
+    """
+    Construye ``(c1, c2, ...) < (v1, v2, ...)`` (o ``>``) como combinación de Q:
+    c1 < v1  OR  (c1 = v1 AND c2 < v2)  OR ...
+    """
+    operador = 'lt' if descendente else 'gt'
+    condicion = Q()
+    iguales = {}
+    for campo, valor in zip(campos, valores):
+        condicion |= Q(**iguales, **{f'{campo}__{operador}': valor})
+        iguales[campo] = valor
+    return condicion
+
+
+def contar_acotado(queryset, limite=LIMITE_CONTEO):
+    """
+    ``SELECT COUNT(*) FROM (... LIMIT limite + 1)``: lee como máximo
+    ``limite + 1`` filas. Un resultado mayor que ``limite`` significa "más de
+    ``limite``".
+    """
+    return queryset.order_by()[:limite + 1].count()
+
+
+class PaginaKeyset:
+    def __init__(self, objetos, parametros, cursor_siguiente=None, cursor_anterior=None, total=None,
+                 limite_conteo=LIMITE_CONTEO):
+        self.objetos = objetos
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+        # Con más de ``limite_conteo`` filas, total queda en el tope
+        self.total_excede = total is not None and total > limite_conteo
+        self.total = min(total, limite_conteo) if total is not None else None
+        self._parametros = parametros
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+    def __bool__(self):
+        return bool(self.objetos)
+
+    @property
+    def total_texto(self):
+        if self.total is None:
+            return ''
+        return f'más de {self.total}' if self.total_excede else str(self.total)
+
+    @property
+    def hay_siguiente(self):
+        return self.cursor_siguiente is not None
+
+    @property
+    def hay_anterior(self):
+        return self.cursor_anterior is not None
+
+    def _url(self, **cursor):
+        parametros = self._parametros.copy()
+        for clave, valor in cursor.items():
+            parametros[clave] = valor
+        consulta = parametros.urlencode()
+        return f'?{consulta}' if consulta else '?'
+
+    @property
+    def url_primera(self):
+        return self._url()
+
+    @property
+    def url_siguiente(self):
+        return self._url(despues=self.cursor_siguiente) if self.hay_siguiente else None
+
+    @property
+    def url_anterior(self):
+        return self._url(antes=self.cursor_anterior) if self.hay_anterior else None
+
+
+def paginar_keyset(request, queryset, campos, descendente=True, tamano=TAMANO_PAGINA, contar=True):
+    """
+    Pagina ``queryset`` ordenado por ``campos`` (el último debe ser único,
+    normalmente ``id``). Retorna una ``PaginaKeyset``.
+    """
+    parametros = request.GET.copy()
+    parametros.pop('despues', None)
+    parametros.pop('antes', None)
+
+    campos_modelo = campos_orden(queryset, campos)
+    despues = decodificar_cursor(request.GET.get('despues'), campos_modelo)
+    antes = None if despues else decodificar_cursor(request.GET.get('antes'), campos_modelo)
+
+    orden = [f'-{c}' if descendente else c for c in campos]
+    orden_inverso = [c if descendente else f'-{c}' for c in campos]
+
+    if antes:
+        # Página anterior: recorremos en sentido contrario y damos vuelta el resultado
+        filas = list(queryset.filter(condicion_keyset(campos, antes, not descendente)).order_by(*orden_inverso)[:tamano + 1])
+        hay_mas_atras = len(filas) > tamano
+        filas = filas[:tamano][::-1]
+        hay_mas_adelante = True
+    else:
+        consulta = queryset
+        if despues:
+            consulta = consulta.filter(condicion_keyset(campos, despues, descendente))
+        filas = list(consulta.order_by(*orden)[:tamano + 1])
+        hay_mas_adelante = len(filas) > tamano
+        filas = filas[:tamano]
+        hay_mas_atras = despues is not None
+
+    def _cursor(fila):
+        return codificar_cursor([getattr(fila, campo) for campo in campos])
+
+    return PaginaKeyset(
+        filas,
+        parametros,
+        cursor_siguiente=_cursor(filas[-1]) if filas and hay_mas_adelante else None,
+        cursor_anterior=_cursor(filas[0]) if filas and hay_mas_atras else None,
+        total=contar_acotado(queryset) if contar else None,
+    )
@@ -0,0 +1,260 @@
+"""
+Servicio de renderizado de PDF (WeasyPrint) en un pool de procesos.
+
+Las vistas renderizan el template Django a HTML (rápido) y delegan la
+conversión HTML -> PDF (lenta, CPU) a procesos "calientes" que ya cargaron
+WeasyPrint, Pango, la configuración de fuentes y las hojas de estilo de los
+PDF (``HOJAS_PDF``) al arrancar. Así varias actas se generan en paralelo
+usando varios núcleos y el hilo web solo espera.
+
+API:
+    futuro = enviar_render(html, hoja)   # no bloquea; devuelve un Future
+    pdf = renderizar_pdf(html, hoja)     # enviar + esperar el resultado
+    precalentar_pool()                   # levanta los workers sin esperar un render
+    metricas_pdf()                       # tiempos de render acumulados
+
+Si un worker muere (crash, OOM, error en el arranque), el pool queda roto:
+se descarta y el render se reintenta una vez en un pool nuevo.
+
+Configuración (settings.py):
+    PDF_WORKERS          Procesos del pool. 0 = renderizar en el mismo hilo.
+    PDF_MAX_CONCURRENCIA Trabajos en vuelo permitidos por proceso web.
+    PDF_TIMEOUT          Segundos máximos de espera (cola + render).
+    PDF_PRECALENTAR      Levantar el pool al arrancar el servidor (wsgi/asgi).
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+# Hojas de estilo de los templates pdf/*.html. Cada worker las parsea una vez.
+HOJAS_PDF = {
+    'acta_inspeccion': 'pdf/acta_inspeccion.css',
+    'orden_facturacion': 'pdf/orden_facturacion.css',
+}
+
+# ==========================================================
+# 1. LADO WORKER (se ejecuta dentro de cada proceso del pool)
+# ==========================================================
+
+_config_fuentes = None
+_hojas = {}
+
+
+def _inicializar_worker(rutas_hojas):
+    """Carga WeasyPrint, las fuentes y las hojas de estilo una sola vez por proceso."""
+    global _config_fuentes
+    from weasyprint import CSS, HTML
+    from weasyprint.text.fonts import FontConfiguration
+
+    _config_fuentes = FontConfiguration()
+    for nombre, ruta in rutas_hojas.items():
+        _hojas[nombre] = CSS(filename=ruta, font_config=_config_fuentes)
+    # Render de calentamiento: obliga a cargar Pango/fontconfig y las fuentes
+    HTML(string='<p style="font-family: Helvetica, Arial, sans-serif">.</p>').write_pdf(
+        font_config=_config_fuentes
+    )
+
+
+def _renderizar_en_worker(html_string, hoja=None):
+    """Devuelve (pdf_bytes, segundos_de_render)."""
+    from weasyprint import HTML
+
+    inicio = time.perf_counter()
+    hojas = [_hojas[hoja]] if hoja else []
+    pdf = HTML(string=html_string).write_pdf(stylesheets=hojas, font_config=_config_fuentes)
+    return pdf, time.perf_counter() - inicio
+
+
+def _esperar():
+    """Tarea vacía: sirve para que el pool levante sus procesos."""
+    return os.getpid()
+
+
+# ==========================================================
+# 2. LADO WEB (proceso de Django)
+# ==========================================================
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_semaforo = None
+_local_lock = threading.Lock()
+
+_metricas_lock = threading.Lock()
+_metricas = {
+    'renders': 0,
+    'errores': 0,
+    'en_vuelo': 0,
+    'segundos_render_total': 0.0,
+    'segundos_render_max': 0.0,
+    'segundos_espera_total': 0.0,
+}
+
+
+def _rutas_hojas():
+    carpeta = settings.BASE_DIR / 'templates'
+    return {nombre: str(carpeta / ruta) for nombre, ruta in HOJAS_PDF.items()}
+
+
+def _obtener_pool():
+    global _pool, _pool_pid, _semaforo
+    with _pool_lock:
+        if _semaforo is None:
+            _semaforo = threading.BoundedSemaphore(getattr(settings, 'PDF_MAX_CONCURRENCIA', 4))
+        if _pool is not None and _pool_pid != os.getpid():
+            # Proceso hijo de un fork (p.ej. gunicorn --preload): el pool del padre no sirve aquí
+            _pool = None
+        if _pool is None and getattr(settings, 'PDF_WORKERS', 0) > 0:
+            # 'spawn': no heredamos hilos ni conexiones a la BD del servidor web
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_inicializar_worker,
+                initargs=(_rutas_hojas(),),
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _descartar_pool(roto):
+    """Saca del servicio un pool roto; el próximo render crea uno nuevo."""
+    global _pool
+    with _pool_lock:
+        if _pool is roto:
+            _pool = None
+    roto.shutdown(wait=False, cancel_futures=True)
+
+
+def precalentar_pool():
+    """
+    Levanta todos los workers (y corre su inicializador) sin esperar el
+    primer render. No bloquea.
+    """
+    pool = _obtener_pool()
+    if pool is not None:
+        for _ in range(settings.PDF_WORKERS):
+            pool.submit(_esperar)
+    return pool
+
+
+def _renderizar_local(html_string, hoja):
+    # Sin pool: el hilo web hace de worker (inicializado una vez por proceso)
+    with _local_lock:
+        if _config_fuentes is None:
+            _inicializar_worker(_rutas_hojas())
+    return _renderizar_en_worker(html_string, hoja)
+
+
+def _registrar(segundos_render, segundos_total, error=False):
+    with _metricas_lock:
+        _metricas['en_vuelo'] -= 1
+        if error:
+            _metricas['errores'] += 1
+            return
+        _metricas['renders'] += 1
+        _metricas['segundos_render_total'] += segundos_render
+        _metricas['segundos_render_max'] = max(_metricas['segundos_render_max'], segundos_render)
+        _metricas['segundos_espera_total'] += segundos_total
+
+
+def _someter(html_string, hoja, al_terminar, reintentar=True):
+    """Envía el render al pool; si el pool está roto, lo reemplaza y reintenta una vez."""
+    pool = _obtener_pool()
+    try:
+        futuro_worker = pool.submit(_renderizar_en_worker, html_string, hoja)
+    except BrokenProcessPool:
+        _descartar_pool(pool)
+        if not reintentar:
+            raise
+        return _someter(html_string, hoja, al_terminar, reintentar=False)
+
+    def _revisar(futuro):
+        if reintentar and isinstance(futuro.exception(), BrokenProcessPool):
+            # El worker murió con este trabajo en curso
+            _descartar_pool(pool)
+            try:
+                _someter(html_string, hoja, al_terminar, reintentar=False)
+                return
+            except BaseException:
+                pass  # Tampoco hay pool nuevo: se informa el error original
+        al_terminar(futuro)
+
+    futuro_worker.add_done_callback(_revisar)
+
+
+def enviar_render(html_string, hoja=None, timeout=None):
+    """
+    Encola la conversión HTML -> PDF y devuelve un ``Future`` cuyo resultado
+    son los bytes del PDF. ``hoja`` es una clave de ``HOJAS_PDF``. Si ya hay
+    PDF_MAX_CONCURRENCIA trabajos en vuelo, espera un cupo hasta ``timeout``
+    segundos (TimeoutError si no lo obtiene).
+    """
+    timeout = timeout if timeout is not None else getattr(settings, 'PDF_TIMEOUT', 60)
+    pool = _obtener_pool()
+    if not _semaforo.acquire(timeout=timeout):
+        raise TimeoutError("Servicio de PDF saturado: no hay cupo para renderizar.")
+
+    with _metricas_lock:
+        _metricas['en_vuelo'] += 1
+    inicio = time.perf_counter()
+    resultado = Future()
+
+    def _terminar(futuro_worker):
+        _semaforo.release()
+        try:
+            pdf, segundos_render = futuro_worker.result()
+        except BaseException as e:
+            _registrar(0, 0, error=True)
+            resultado.set_exception(e)
+        else:
+            _registrar(segundos_render, time.perf_counter() - inicio)
+            resultado.set_result(pdf)
+
+    if pool is None:
+        # Sin pool (PDF_WORKERS = 0): render en el hilo actual
+        futuro_local = Future()
+        try:
+            futuro_local.set_result(_renderizar_local(html_string, hoja))
+        except Exception as e:
+            futuro_local.set_exception(e)
+        _terminar(futuro_local)
+    else:
+        try:
+            _someter(html_string, hoja, _terminar)
+        except Exception:
+            # Tampoco arrancó un pool nuevo: liberamos el cupo y propagamos
+            _semaforo.release()
+            _registrar(0, 0, error=True)
+            raise
+
+    return resultado
+
+
+def renderizar_pdf(html_string, hoja=None, timeout=None):
+    """Renderiza y espera el PDF (bytes)."""
+    timeout = timeout if timeout is not None else getattr(settings, 'PDF_TIMEOUT', 60)
+    return enviar_render(html_string, hoja, timeout).result(timeout=timeout)
+
+
+def metricas_pdf():
+    """Copia de las métricas de render de este proceso web."""
+    with _metricas_lock:
+        datos = dict(_metricas)
+    datos['segundos_render_promedio'] = (
+        datos['segundos_render_total'] / datos['renders'] if datos['renders'] else 0.0
+    )
+    return datos
+
+
+def cerrar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
@@ -0,0 +1,11 @@
+"""Percentiles para las mediciones (prueba de carga y benchmark de SQLite)."""
+
+import math
+
+
+def percentil(valores_ordenados, p):
+    """Percentil por rango más cercano (``valores_ordenados`` ya ordenados)."""
+    if not valores_ordenados:
+        return None
+    indice = max(0, math.ceil(p / 100 * len(valores_ordenados)) - 1)
+    return valores_ordenados[indice]
@@ -0,0 +1,136 @@
+"""
+Registro de plantillas de inspección.
+
+* ``tareas_plantilla(plantilla)``: lista ordenada de tareas de una plantilla
+  en una versión concreta. Se busca primero en memoria del proceso, luego en
+  el cache compartido y solo al final en la BD. La clave incluye
+  ``PlantillaInspeccion.version``, que las señales suben con cada cambio de
+  ``TareaPlantilla``: una versión cacheada nunca queda vieja, simplemente
+  deja de pedirse.
+* ``clonar_tareas(inspeccion, foto)``: copia esa lista a ``TareaInspeccion``
+  con un solo ``bulk_create``; la inspección anota la versión en
+  ``version_plantilla``. Las tareas copiadas son la *foto* de la OT: editar
+  la plantilla después no cambia las inspecciones en curso.
+* ``catalogo_plantillas()``: ``(id, nombre)`` de todas las plantillas para
+  los selectores, cacheado hasta que se crea/edita/borra una.
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import EstadoTarea, PlantillaInspeccion, TareaInspeccion, TareaPlantilla
+
+TareaBase = namedtuple('TareaBase', 'id descripcion orden')
+FotoPlantilla = namedtuple('FotoPlantilla', 'plantilla_id version tareas')
+OpcionPlantilla = namedtuple('OpcionPlantilla', 'id nombre')
+
+# Versiones recientes que guarda cada proceso
+MAX_EN_MEMORIA = 256
+
+TTL_TAREAS = 24 * 60 * 60
+
+CLAVE_CATALOGO = 'plantillas:catalogo'
+
+_memoria = OrderedDict()
+_memoria_lock = threading.Lock()
+
+
+# ==========================================================
+# 1. TAREAS POR VERSIÓN
+# ==========================================================
+
+def _clave_tareas(plantilla_id, version):
+    return f'plantillas:tareas:{plantilla_id}:{version}'
+
+
+def _recordar(foto):
+    with _memoria_lock:
+        _memoria[(foto.plantilla_id, foto.version)] = foto
+        _memoria.move_to_end((foto.plantilla_id, foto.version))
+        while len(_memoria) > MAX_EN_MEMORIA:
+            _memoria.popitem(last=False)
+
+
+def _consultar(plantilla_id):
+    """
+    Tareas y versión en la MISMA consulta: si la plantilla cambió después de
+    leerla, se obtiene la versión nueva junto a sus tareas (nunca una mezcla).
+    """
+    filas = list(
+        TareaPlantilla.objects.filter(plantilla_id=plantilla_id)
+        .order_by('orden', 'id')
+        .values_list('id', 'descripcion', 'orden', 'plantilla__version')
+    )
+    if filas:
+        version = filas[0][3]
+    else:
+        version = PlantillaInspeccion.objects.filter(pk=plantilla_id).values_list('version', flat=True).first()
+    return FotoPlantilla(plantilla_id, version, tuple(TareaBase(*fila[:3]) for fila in filas))
+
+
+def tareas_plantilla(plantilla):
+    """``FotoPlantilla`` con la versión vigente de ``plantilla`` (ya cargada)."""
+    clave = (plantilla.pk, plantilla.version)
+    with _memoria_lock:
+        foto = _memoria.get(clave)
+    if foto is not None:
+        return foto
+
+    foto = cache.get(_clave_tareas(*clave))
+    if foto is None:
+        foto = _consultar(plantilla.pk)
+        if foto.version is not None:
+            cache.set(_clave_tareas(foto.plantilla_id, foto.version), foto, TTL_TAREAS)
+    if foto.version is not None:
+        _recordar(foto)
+    return foto
+
+
+def clonar_tareas(inspeccion, foto):
+    """
+    Crea las tareas de ``inspeccion`` desde ``foto`` (de ``tareas_plantilla``)
+    con un solo INSERT. La inspección debería guardar ``foto.version`` en
+    ``version_plantilla``.
+    """
+    return TareaInspeccion.objects.bulk_create([
+        TareaInspeccion(
+            inspeccion=inspeccion,
+            plantilla_tarea_id=tarea.id,
+            descripcion=tarea.descripcion,
+            estado=EstadoTarea.PENDIENTE,
+        ) for tarea in foto.tareas
+    ])
+
+
+def limpiar_registro():
+    """Vacía la memoria del proceso (el cache compartido expira solo)."""
+    with _memoria_lock:
+        _memoria.clear()
+
+
+def subir_version(plantilla_id):
+    """Lo llaman las señales de ``TareaPlantilla`` (dentro de la misma transacción)."""
+    PlantillaInspeccion.objects.filter(pk=plantilla_id).update(version=F('version') + 1)
+
+
+# ==========================================================
+# 2. CATÁLOGO PARA SELECTORES
+# ==========================================================
+
+def catalogo_plantillas():
+    catalogo = cache.get(CLAVE_CATALOGO)
+    if catalogo is None:
+        catalogo = [
+            OpcionPlantilla(*fila)
+            for fila in PlantillaInspeccion.objects.order_by('nombre').values_list('id', 'nombre')
+        ]
+        cache.set(CLAVE_CATALOGO, catalogo, TTL_TAREAS)
+    return catalogo
+
+
+def invalidar_catalogo():
+    transaction.on_commit(lambda: cache.delete(CLAVE_CATALOGO))
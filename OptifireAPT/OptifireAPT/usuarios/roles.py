@@ -0,0 +1,80 @@
+"""
+Resolución de roles del usuario (Administrador / Técnico / Cliente).
+
+Los roles se leen UNA sola vez por request y quedan memorizados en el propio
+objeto ``request.user``; así los decoradores ``user_passes_test``,
+``check_role`` y ``Perfil.get_role`` no vuelven a consultar ``auth_group``.
+
+Opcionalmente (``ROLES_CACHE_SESION = True``) el conjunto de roles también se
+guarda en la sesión, validado contra un número de versión por usuario que vive
+en el cache de Django y que se incrementa cada vez que cambian sus grupos.
+"""
+
+from django.core.cache import cache
+
+# Clave de la sesión donde se guardan los roles (solo si ROLES_CACHE_SESION)
+CLAVE_SESION_ROLES = '_roles_usuario'
+
+# Atributo del objeto User donde se memorizan los roles durante el request
+ATRIBUTO_ROLES = '_roles_cache'
+
+
+def _clave_version(user_id):
+    return f'usuarios:roles_version:{user_id}'
+
+
+def version_roles(user_id):
+    """Versión actual de los roles de un usuario (0 si nunca cambiaron)."""
+    return cache.get(_clave_version(user_id), 0)
+
+
+def invalidar_roles(user):
+    """
+    Descarta los roles memorizados del usuario y sube su versión, de modo que
+    cualquier sesión que los tenga guardados los vuelva a consultar.
+    """
+    if hasattr(user, ATRIBUTO_ROLES):
+        delattr(user, ATRIBUTO_ROLES)
+    clave = _clave_version(user.pk)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 1, None)
+
+
+def obtener_roles(user):
+    """
+    Devuelve un ``frozenset`` con los nombres de grupo del usuario.
+    La primera llamada hace una única consulta; las siguientes usan la memoria.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, ATRIBUTO_ROLES, None)
+    if roles is None:
+        roles = frozenset(user.groups.values_list('name', flat=True))
+        setattr(user, ATRIBUTO_ROLES, roles)
+    return roles
+
+
+def tiene_rol(user, role_name):
+    return role_name in obtener_roles(user)
+
+
+def cargar_roles_desde_sesion(user, session):
+    """
+    Usa los roles guardados en la sesión si su versión sigue vigente; si no,
+    los consulta una vez y los deja guardados para los próximos requests.
+    """
+    version = version_roles(user.pk)
+    datos = session.get(CLAVE_SESION_ROLES)
+
+    if datos and datos.get('usuario') == user.pk and datos.get('version') == version:
+        setattr(user, ATRIBUTO_ROLES, frozenset(datos['roles']))
+        return
+
+    session[CLAVE_SESION_ROLES] = {
+        'usuario': user.pk,
+        'version': version,
+        'roles': sorted(obtener_roles(user)),
+    }
@@ -0,0 +1,101 @@
+"""
+Ruteo de bases de datos (``DATABASE_ROUTERS``).
+
+Hay dos alias opcionales, además de ``default``. Se agregan en settings.py a
+partir de variables de entorno:
+
+* ``replica``: copia de solo lectura de ``default``. La llena la replicación
+  (Postgres/MySQL, o Litestream / ``sqlite3 .backup`` con SQLite); Django
+  nunca migra ni escribe en ella. Solo la usan las vistas de reportes
+  decoradas con ``@leer_de_replica`` (historial, estadísticas, registro de
+  trabajos), que toleran unos segundos de atraso. El resto de la app, y en
+  particular todo lo que lee-y-luego-escribe, sigue leyendo de ``default``.
+* ``notificaciones``: base propia para ``Notificacion`` y
+  ``NotificacionArchivada``. Es la tabla con más escrituras (un INSERT por
+  cada evento y un UPDATE por cada "marcar como leída") y así no compite por
+  el lock de escritura con las solicitudes e inspecciones.
+
+Sin esas variables, todo va a ``default``, igual que sin router.
+
+Las notificaciones guardan ``usuario_id`` sin FK real (``db_constraint=False``):
+la tabla de usuarios puede estar en otra base. Por lo mismo, nunca se hacen
+JOIN entre notificaciones y usuarios, y el borrado en cascada lo hace la
+señal ``borrar_notificaciones_usuario``.
+"""
+
+import contextvars
+from functools import wraps
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+BD_REPLICA = 'replica'
+BD_NOTIFICACIONES = 'notificaciones'
+
+MODELOS_NOTIFICACIONES = {'notificacion', 'notificacionarchivada'}
+
+_en_replica = contextvars.ContextVar('optifire_leer_de_replica', default=False)
+
+
+def _configurada(alias):
+    return alias in connections.settings
+
+
+def bd_notificaciones():
+    """Alias donde viven las notificaciones (``default`` si no hay base propia)."""
+    return BD_NOTIFICACIONES if _configurada(BD_NOTIFICACIONES) else DEFAULT_DB_ALIAS
+
+
+def _es_notificacion(model):
+    return model._meta.app_label == 'usuarios' and model._meta.model_name in MODELOS_NOTIFICACIONES
+
+
+def leer_de_replica(vista):
+    """
+    Las lecturas hechas dentro de la vista van a la réplica (si está
+    configurada). Las escrituras siguen yendo a ``default``. Va debajo de
+    ``login_required``/``user_passes_test``, para que los permisos se
+    verifiquen contra datos al día.
+    """
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        token = _en_replica.set(True)
+        try:
+            return vista(request, *args, **kwargs)
+        finally:
+            _en_replica.reset(token)
+    return envoltura
+
+
+class OptifireRouter:
+
+    def db_for_read(self, model, **hints):
+        if _es_notificacion(model):
+            return bd_notificaciones()
+        if _en_replica.get() and _configurada(BD_REPLICA):
+            return BD_REPLICA
+        # Explícito: si no, Django usaría la base de la instancia de origen
+        # (p.ej. el usuario de una notificación se buscaría en "notificaciones")
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if _es_notificacion(model):
+            return bd_notificaciones()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las tres bases comparten los mismos ids de usuario
+        propias = {DEFAULT_DB_ALIAS, BD_REPLICA, BD_NOTIFICACIONES}
+        if obj1._state.db in propias and obj2._state.db in propias:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == BD_REPLICA:
+            return False
+        notificacion = app_label == 'usuarios' and model_name in MODELOS_NOTIFICACIONES
+        # RunPython/RunSQL llegan sin model_name: en "notificaciones" no corren
+        if db == BD_NOTIFICACIONES:
+            return notificacion
+        if notificacion:
+            return db == bd_notificaciones()
+        return None
@@ -0,0 +1,234 @@
+"""
+Planificador de rutas diarias de los técnicos (100% offline).
+
+1. Geocodificación: ``SolicitudInspeccion.direccion`` es texto libre, así que
+   se busca la comuna dentro de ella contra la tabla incluida en
+   ``usuarios/datos/comunas.csv`` (comuna, región y coordenadas del centro).
+   La precisión es a nivel de comuna.
+2. Matriz de distancias en km (haversine, línea recta).
+3. Orden del día: vecino más cercano + mejoras 2-opt, partiendo desde la
+   base del técnico (``Perfil.direccion`` o ``Perfil.ciudad``) si se conoce.
+
+Las paradas de una misma comuna comparten coordenadas, por lo que la ruta se
+calcula sobre las comunas *distintas* del día y luego se expanden sus
+paradas: cientos de inspecciones se ordenan en milisegundos.
+"""
+
+import csv
+import math
+import re
+import time
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+from .asignacion import normalizar
+from .disponibilidad import ESTADOS_OCUPADO
+from .models import Inspeccion, Perfil
+
+RUTA_COMUNAS = Path(__file__).resolve().parent / 'datos' / 'comunas.csv'
+
+RADIO_TIERRA_KM = 6371.0
+
+# Tope de tiempo para las mejoras 2-opt (el vecino más cercano ya es una ruta válida)
+LIMITE_2OPT_SEGUNDOS = 0.25
+
+Comuna = namedtuple('Comuna', 'nombre region latitud longitud')
+
+
+# ==========================================================
+# 1. GEOCODIFICACIÓN OFFLINE
+# ==========================================================
+
+@lru_cache(maxsize=1)
+def _tabla_comunas():
+    comunas = {}
+    with open(RUTA_COMUNAS, encoding='utf-8', newline='') as archivo:
+        for fila in csv.DictReader(archivo):
+            comunas[normalizar(fila['comuna'])] = Comuna(
+                fila['comuna'], fila['region'], float(fila['latitud']), float(fila['longitud'])
+            )
+    # Las más largas primero: 'san pedro de la paz' antes que 'san pedro'
+    nombres = sorted(comunas, key=len, reverse=True)
+    patron = re.compile(r'\b(' + '|'.join(re.escape(n) for n in nombres) + r')\b')
+    return comunas, patron
+
+
+def geocodificar(direccion):
+    """
+    Comuna mencionada en ``direccion`` o None. El primer tramo (antes de la
+    primera coma) suele ser la calle, p.ej. "Av. Las Condes 123, Vitacura",
+    así que se revisa al final.
+    """
+    texto = normalizar(direccion)
+    if not texto:
+        return None
+    comunas, patron = _tabla_comunas()
+    tramos = texto.split(',')
+    for tramo in tramos[1:] + tramos[:1]:
+        encontrada = patron.search(tramo)
+        if encontrada:
+            return comunas[encontrada.group(1)]
+    return None
+
+
+# ==========================================================
+# 2. DISTANCIAS Y HEURÍSTICA TSP
+# ==========================================================
+
+def distancia_km(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (a.latitud, a.longitud, b.latitud, b.longitud))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(math.sqrt(h))
+
+
+def matriz_distancias(puntos):
+    n = len(puntos)
+    matriz = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            matriz[i][j] = matriz[j][i] = distancia_km(puntos[i], puntos[j])
+    return matriz
+
+
+def vecino_mas_cercano(matriz, inicio=0):
+    pendientes = set(range(len(matriz))) - {inicio}
+    ruta = [inicio]
+    while pendientes:
+        fila = matriz[ruta[-1]]
+        # Desempate por índice: el resultado es reproducible
+        siguiente = min(pendientes, key=lambda j: (fila[j], j))
+        pendientes.remove(siguiente)
+        ruta.append(siguiente)
+    return ruta
+
+
+def dos_opt(ruta, matriz, inicio_fijo=True, limite=LIMITE_2OPT_SEGUNDOS):
+    """
+    Mejora una ruta *abierta* (no vuelve al origen) invirtiendo tramos
+    mientras se acorte. Con ``inicio_fijo`` el primer punto no se mueve.
+    """
+    ruta = list(ruta)
+    n = len(ruta)
+    fin = time.perf_counter() + limite
+    mejora = True
+    while mejora and time.perf_counter() < fin:
+        mejora = False
+        for i in range(1 if inicio_fijo else 0, n - 1):
+            for j in range(i + 1, n):
+                a = matriz[ruta[i - 1]] if i > 0 else None
+                b, c = ruta[i], ruta[j]
+                antes = (a[b] if a else 0.0)
+                despues = (a[c] if a else 0.0)
+                if j + 1 < n:
+                    d = ruta[j + 1]
+                    antes += matriz[c][d]
+                    despues += matriz[b][d]
+                if despues < antes - 1e-9:
+                    ruta[i:j + 1] = reversed(ruta[i:j + 1])
+                    mejora = True
+    return ruta
+
+
+def longitud_ruta(ruta, matriz):
+    return sum(matriz[a][b] for a, b in zip(ruta, ruta[1:]))
+
+
+def ordenar_puntos(puntos, origen=None):
+    """Índices de ``puntos`` en el orden de visita (partiendo en ``origen`` si se da)."""
+    if len(puntos) < 2 and origen is None:
+        return list(range(len(puntos)))
+    if origen is not None:
+        matriz = matriz_distancias([origen] + list(puntos))
+        ruta = dos_opt(vecino_mas_cercano(matriz, 0), matriz, inicio_fijo=True)
+        return [i - 1 for i in ruta[1:]]
+    matriz = matriz_distancias(puntos)
+    return dos_opt(vecino_mas_cercano(matriz, 0), matriz, inicio_fijo=False)
+
+
+# ==========================================================
+# 3. AGENDA DEL TÉCNICO
+# ==========================================================
+
+class ParadaRuta:
+    def __init__(self, inspeccion, comuna, orden, km_tramo):
+        self.inspeccion = inspeccion
+        self.comuna = comuna
+        self.orden = orden
+        self.km_tramo = km_tramo
+
+
+class DiaRuta:
+    def __init__(self, fecha, paradas):
+        self.fecha = fecha
+        self.paradas = paradas
+
+    @property
+    def km_total(self):
+        return round(sum(p.km_tramo or 0 for p in self.paradas), 1)
+
+    @property
+    def sin_ubicacion(self):
+        return sum(1 for p in self.paradas if p.comuna is None)
+
+
+def planificar(items, origen=None):
+    """
+    ``items`` es una lista de ``(objeto, comuna_o_None)``. Retorna la lista de
+    ``ParadaRuta`` ordenada; las paradas sin ubicación van al final en su
+    orden original.
+    """
+    por_comuna = OrderedDict()
+    sin_ubicacion = []
+    for objeto, comuna in items:
+        if comuna is None:
+            sin_ubicacion.append(objeto)
+        else:
+            por_comuna.setdefault(comuna, []).append(objeto)
+
+    comunas = list(por_comuna)
+    paradas = []
+    anterior = origen
+    for indice in ordenar_puntos(comunas, origen):
+        comuna = comunas[indice]
+        for objeto in por_comuna[comuna]:
+            km = round(distancia_km(anterior, comuna), 1) if anterior else None
+            paradas.append(ParadaRuta(objeto, comuna, len(paradas) + 1, km))
+            anterior = comuna
+    for objeto in sin_ubicacion:
+        paradas.append(ParadaRuta(objeto, None, len(paradas) + 1, None))
+    return paradas
+
+
+def base_tecnico(tecnico_id):
+    """Comuna desde la que sale el técnico (su dirección o ciudad del perfil)."""
+    perfil = Perfil.objects.filter(usuario_id=tecnico_id).values_list('direccion', 'ciudad').first()
+    if not perfil:
+        return None
+    return geocodificar(perfil[0]) or geocodificar(perfil[1])
+
+
+def agenda_tecnico(tecnico_id, desde=None, hasta=None):
+    """
+    Inspecciones ASIGNADAS/EN CURSO del técnico agrupadas por
+    ``fecha_programada`` (las sin fecha al final), cada día en orden de ruta.
+    Retorna ``(base, [DiaRuta, ...])``.
+    """
+    inspecciones = Inspeccion.objects.filter(
+        tecnico_id=tecnico_id, estado__in=ESTADOS_OCUPADO
+    ).select_related('solicitud').order_by('fecha_programada', 'id')
+    if desde:
+        inspecciones = inspecciones.filter(fecha_programada__gte=desde)
+    if hasta:
+        inspecciones = inspecciones.filter(fecha_programada__lte=hasta)
+
+    por_dia = OrderedDict()
+    for inspeccion in inspecciones:
+        direccion = inspeccion.solicitud.direccion if inspeccion.solicitud else None
+        por_dia.setdefault(inspeccion.fecha_programada, []).append((inspeccion, geocodificar(direccion)))
+
+    base = base_tecnico(tecnico_id)
+    dias = [DiaRuta(fecha, planificar(items, base)) for fecha, items in por_dia.items() if fecha is not None]
+    if None in por_dia:
+        dias.append(DiaRuta(None, planificar(por_dia[None], base)))
+    return base, dias
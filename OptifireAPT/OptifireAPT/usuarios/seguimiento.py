@@ -0,0 +1,109 @@
+"""
+Seguimiento de cambios de campos sin consultar la BD en los ``pre_save``.
+
+Los modelos que heredan de ``ModeloConSeguimiento`` declaran
+``campos_seguidos``. Cuando una instancia sale de la BD (``from_db``), se
+anota el valor de esos campos. Las señales comparan contra esa foto en vez
+de hacer un ``get(pk=...)`` antes de cada ``save()``:
+
+    instancia.seguimiento.anterior('estado')   # valor al cargarla / último save
+    instancia.seguimiento.cambio('estado')     # True si difiere del actual
+
+La foto se renueva después de cada ``save()`` y de ``refresh_from_db()``.
+Solo si un campo seguido no se cargó (``only()``/``defer()``) se consulta
+su valor en la BD, una vez. ``QuerySet.update()`` y ``bulk_update()`` no
+pasan por aquí (tampoco disparan señales).
+
+Los ``FileField`` se comparan por nombre de archivo.
+"""
+
+from django.db import models
+
+
+def _valor(instancia, campo):
+    valor = getattr(instancia, campo.attname)
+    if isinstance(campo, models.FileField):
+        return valor.name or None
+    return valor
+
+
+class Seguimiento:
+    """Vista sobre la foto guardada en la instancia (``_valores_seguidos``)."""
+
+    def __init__(self, instancia):
+        self.instancia = instancia
+        self.campos = [instancia._meta.get_field(nombre) for nombre in instancia.campos_seguidos]
+
+    @property
+    def valores(self):
+        return self.instancia.__dict__.get('_valores_seguidos', {})
+
+    def _guardar(self, nuevos):
+        # Dict nuevo en vez de mutar: copy.copy() de la instancia comparte el anterior
+        self.instancia.__dict__['_valores_seguidos'] = {**self.valores, **nuevos}
+
+    def _campos(self, nombres=None):
+        if nombres is None:
+            return self.campos
+        nombres = set(nombres)
+        return [c for c in self.campos if c.name in nombres or c.attname in nombres]
+
+    def tomar(self, nombres=None):
+        """Anota el valor actual de los campos (todos o ``nombres``) ya cargados."""
+        diferidos = self.instancia.get_deferred_fields()
+        self._guardar({
+            campo.name: _valor(self.instancia, campo)
+            for campo in self._campos(nombres) if campo.attname not in diferidos
+        })
+
+    def _cargar_faltantes(self):
+        faltantes = [c for c in self.campos if c.name not in self.valores]
+        modelo = type(self.instancia)
+        fila = modelo._base_manager.using(self.instancia._state.db).filter(
+            pk=self.instancia.pk
+        ).values_list(*[c.attname for c in faltantes]).first()
+        nuevos = {}
+        for i, campo in enumerate(faltantes):
+            valor = fila[i] if fila else None
+            nuevos[campo.name] = (valor or None) if isinstance(campo, models.FileField) else valor
+        self._guardar(nuevos)
+
+    def anterior(self, nombre):
+        """Valor guardado en la BD. None si la instancia todavía no se guardó."""
+        if self.instancia._state.adding:
+            return None
+        if nombre not in self.valores:
+            self._cargar_faltantes()
+        return self.valores[nombre]
+
+    def cambio(self, nombre):
+        if self.instancia._state.adding:
+            return True
+        anterior = self.anterior(nombre)
+        return anterior != _valor(self.instancia, self.instancia._meta.get_field(nombre))
+
+
+class ModeloConSeguimiento(models.Model):
+    campos_seguidos = ()
+
+    class Meta:
+        abstract = True
+
+    @property
+    def seguimiento(self):
+        return Seguimiento(self)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia.seguimiento.tomar()
+        return instancia
+
+    def save(self, *args, **kwargs):
+        # Las señales post_save corren dentro de super().save() y ven la foto vieja
+        super().save(*args, **kwargs)
+        self.seguimiento.tomar(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self.seguimiento.tomar(fields)
@@ -1,43 +1,54 @@
-from django.db.models.signals import post_save, pre_save
+import logging
+
+from django.db.models.signals import post_delete, post_save, m2m_changed
 from django.dispatch import receiver
-from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
-from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
 
 # 🚨 IMPORTACIONES CORREGIDAS: Están todos los modelos necesarios
 from .models import (
     SolicitudInspeccion, 
     EstadoSolicitud, 
-    Notificacion,     # Para el Pop-up
-    TareaInspeccion   # Para detectar las fotos
+    Inspeccion,       # Para los resúmenes de estadísticas
+    Notificacion,     # Para invalidar el contador de no leídas
+    NotificacionArchivada,
+    TareaInspeccion,  # Para detectar las fotos
+    PlantillaInspeccion,
+    TareaPlantilla,   # Para versionar las plantillas
 )
+from .correos import URL_BASE_CORREOS, encolar_correo
+from .cotizaciones import aviso_cotizacion
+from .disponibilidad import invalidar_disponibilidad
+from .estadisticas import registrar_inspeccion, registrar_solicitud
+from .imagenes import programar_procesamiento
+from .plantillas import invalidar_catalogo, subir_version
+from .notificaciones import invalidar_no_leidas, notificar, notificar_evidencias
+from .tiempo_real import publicar_notificaciones
+from .roles import invalidar_roles
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
 
 # =========================================================================
 # 1. LOGICA DE CORREOS (CAMBIO DE ESTADO SOLICITUD)
 # =========================================================================
 
-@receiver(pre_save, sender=SolicitudInspeccion)
-def cache_old_status(sender, instance, **kwargs):
-    if instance.pk: 
-        try:
-            old_instance = SolicitudInspeccion.objects.get(pk=instance.pk)
-            instance._original_estado = old_instance.estado
-        except SolicitudInspeccion.DoesNotExist:
-            instance._original_estado = None
-
 @receiver(post_save, sender=SolicitudInspeccion)
 def notificar_cambio_estado(sender, instance, created, **kwargs):
     if created:
         return
 
-    estado_anterior = getattr(instance, '_original_estado', None)
+    # Estado con el que se cargó (usuarios/seguimiento.py): sin SELECT extra
+    estado_anterior = instance.seguimiento.anterior('estado')
     nuevo_estado = instance.estado
 
     if estado_anterior == nuevo_estado or estado_anterior is None:
         return
     
     # Preparar datos para el correo
-    context = {'solicitud': instance, 'base_url': 'http://127.0.0.1:8000/usuarios/'}
+    context = {'solicitud': instance, 'base_url': URL_BASE_CORREOS}
     asunto = ""
     html_template = None
     text_template = None
@@ -48,11 +59,7 @@ def notificar_cambio_estado(sender, instance, created, **kwargs):
         html_template = 'email/solicitud_cotizando.html'
         text_template = 'email/solicitud_cotizando_text.txt'
         # Notificación interna
-        Notificacion.objects.create(
-            usuario=instance.cliente,
-            mensaje=f"Tienes una cotización pendiente para la solicitud #{instance.pk}",
-            enlace=f"/usuarios/solicitud/aceptar-cotizacion/{instance.pk}/"
-        )
+        notificar(*aviso_cotizacion(instance))
     elif nuevo_estado == EstadoSolicitud.APROBADA:
         asunto = f"Solicitud N°{instance.pk} Aprobada y Asignada"
         context['tecnico_nombre'] = instance.inspeccion.tecnico.get_full_name() or instance.inspeccion.tecnico.username
@@ -69,44 +76,26 @@ def notificar_cambio_estado(sender, instance, created, **kwargs):
     else:
         return
 
-    # Enviar correo
+    # Encolar correo (se envía fuera del request: manage.py enviar_correos)
     destinatario = instance.cliente.email
     
     if destinatario:
-        try:
-            msg_plain = render_to_string(text_template, context)
-            msg_html = render_to_string(html_template, context)
-            
-            msg = EmailMultiAlternatives(
-                subject=asunto,
-                body=msg_plain,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[destinatario],
-            )
-            msg.attach_alternative(msg_html, "text/html")
-            msg.send()
-            print(f"📧 CORREO ENVIADO A {destinatario} (Estado: {nuevo_estado})")
-            
-        except Exception as e:
-            print(f"ERROR AL ENVIAR CORREO: {e}")
+        msg_plain = render_to_string(text_template, context)
+        msg_html = render_to_string(html_template, context)
+
+        encolar_correo(
+            asunto=asunto,
+            cuerpo_texto=msg_plain,
+            cuerpo_html=msg_html,
+            destinatarios=[destinatario],
+        )
+        logger.debug("Correo encolado para %s (estado %s)", destinatario, nuevo_estado)
 
 
 # =========================================================================
 # 2. LOGICA DE NOTIFICACIONES INTERNAS (FOTOS DE EVIDENCIA)
 # =========================================================================
 
-@receiver(pre_save, sender=TareaInspeccion)
-def cache_tarea_foto(sender, instance, **kwargs):
-    """Guarda la foto anterior para saber si cambió."""
-    if instance.pk:
-        try:
-            old_instance = TareaInspeccion.objects.get(pk=instance.pk)
-            instance._original_imagen = old_instance.imagen_evidencia
-        except TareaInspeccion.DoesNotExist:
-            instance._original_imagen = None
-    else:
-        instance._original_imagen = None
-
 @receiver(post_save, sender=TareaInspeccion)
 def crear_notificacion_evidencia(sender, instance, created, **kwargs):
     """Crea un Pop-up (Notificacion) cuando se sube una foto nueva."""
@@ -114,26 +103,113 @@ def crear_notificacion_evidencia(sender, instance, created, **kwargs):
     # Si no hay imagen, o es la misma de antes, no hacemos nada
     if not instance.imagen_evidencia:
         return
-    if instance.imagen_evidencia == getattr(instance, '_original_imagen', None):
+    if not created and not instance.seguimiento.cambio('imagen_evidencia'):
         return
 
+    # Optimizar la foto y generar su miniatura fuera del request
+    programar_procesamiento(instance.pk)
+
     try:
-        # Navegamos hacia arriba para encontrar al dueño
-        inspeccion = instance.inspeccion
-        solicitud = inspeccion.solicitud
-        cliente = solicitud.cliente
-        
-        # Enlace para que el cliente vaya directo a ver la foto
-        url_orden = f"/usuarios/solicitud/detalle/{solicitud.pk}/"
-
-        # Creamos la notificación en la Base de Datos
-        Notificacion.objects.create(
-            usuario=cliente,
-            mensaje=f"📸 Nueva evidencia cargada: {instance.descripcion}",
-            enlace=url_orden
-        )
-        
-        print(f"🔔 NOTIFICACIÓN CREADA PARA {cliente.username}: Nueva foto subida.")
+        # El servicio resuelve al cliente dueño de la orden en una sola consulta
+        if notificar_evidencias([instance.pk]):
+            print(f"🔔 NOTIFICACIÓN CREADA: Nueva foto subida en tarea #{instance.pk}.")
 
     except Exception as e:
-        print(f"ERROR AL CREAR NOTIFICACIÓN: {e}")
\ No newline at end of file
+        print(f"ERROR AL CREAR NOTIFICACIÓN: {e}")
+
+
+# =========================================================================
+# 3. INVALIDACIÓN DEL CACHE DE ROLES (CAMBIO DE GRUPOS)
+# =========================================================================
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidar_cache_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Cuando cambian los grupos de un usuario (p.ej. UsuarioAdminUpdateForm.save
+    hace groups.clear() + groups.add()), descartamos sus roles memorizados.
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidar_roles(instance)
+        return
+
+    # Cambio hecho desde el lado del grupo (group.user_set...)
+    if action == 'pre_clear':
+        usuarios = instance.user_set.only('pk')
+    elif action in ('post_add', 'post_remove'):
+        usuarios = User.objects.filter(pk__in=pk_set).only('pk')
+    else:
+        return
+    for usuario in usuarios:
+        invalidar_roles(usuario)
+
+
+# =========================================================================
+# 4. CONTADOR DE NOTIFICACIONES NO LEÍDAS
+# =========================================================================
+
+@receiver(post_save, sender=Notificacion)
+@receiver(post_delete, sender=Notificacion)
+def invalidar_contador_notificaciones(sender, instance, **kwargs):
+    """Crear, marcar como leída o borrar una notificación cambia el contador."""
+    invalidar_no_leidas([instance.usuario_id])
+    # Las creadas con save() (p.ej. desde el admin) también se empujan al navegador
+    if kwargs.get('created'):
+        transaction.on_commit(lambda: publicar_notificaciones([instance]))
+
+
+@receiver(post_delete, sender=User)
+def borrar_notificaciones_usuario(sender, instance, **kwargs):
+    """
+    Cascada manual: las notificaciones pueden vivir en otra base
+    (usuarios/routers.py), así que su FK no tiene ON DELETE CASCADE.
+    """
+    Notificacion.objects.filter(usuario_id=instance.pk).delete()
+    NotificacionArchivada.objects.filter(usuario_id=instance.pk).delete()
+
+
+# =========================================================================
+# 5. RESÚMENES DE ESTADÍSTICAS (ROLLUPS)
+# =========================================================================
+
+@receiver(post_save, sender=SolicitudInspeccion)
+def resumen_solicitud_guardada(sender, instance, created, **kwargs):
+    anterior = None if created else instance.seguimiento.anterior('estado')
+    if not created and anterior is None:
+        return
+    registrar_solicitud(instance.fecha_solicitud, anterior, instance.estado)
+
+@receiver(post_delete, sender=SolicitudInspeccion)
+def resumen_solicitud_eliminada(sender, instance, **kwargs):
+    registrar_solicitud(instance.fecha_solicitud, instance.estado, None)
+
+@receiver(post_save, sender=Inspeccion)
+def resumen_inspeccion_guardada(sender, instance, created, **kwargs):
+    seguimiento = instance.seguimiento
+    anterior = None if created else (seguimiento.anterior('tecnico'), seguimiento.anterior('estado'))
+    registrar_inspeccion(anterior, (instance.tecnico_id, instance.estado))
+
+    # Disponibilidad: creada, reprogramada, completada/cancelada o reasignada
+    if created or anterior != (instance.tecnico_id, instance.estado) or seguimiento.cambio('fecha_programada'):
+        invalidar_disponibilidad([instance.tecnico_id, anterior[0] if anterior else None])
+
+@receiver(post_delete, sender=Inspeccion)
+def resumen_inspeccion_eliminada(sender, instance, **kwargs):
+    registrar_inspeccion((instance.tecnico_id, instance.estado), None)
+    invalidar_disponibilidad([instance.tecnico_id])
+
+
+# =========================================================================
+# 6. REGISTRO DE PLANTILLAS (VERSIÓN Y CATÁLOGO)
+# =========================================================================
+
+@receiver(post_save, sender=TareaPlantilla)
+@receiver(post_delete, sender=TareaPlantilla)
+def version_plantilla_tareas(sender, instance, **kwargs):
+    """Cualquier cambio en las tareas crea una versión nueva de la plantilla."""
+    subir_version(instance.plantilla_id)
+
+@receiver(post_save, sender=PlantillaInspeccion)
+@receiver(post_delete, sender=PlantillaInspeccion)
+def catalogo_plantillas_cambiado(sender, instance, **kwargs):
+    invalidar_catalogo()
@@ -0,0 +1,305 @@
+"""
+Datos sintéticos a escala de producción (``manage.py seed_optifire``).
+
+* Todo sale de ``random.Random(semilla)``: la misma semilla, tamaño y fecha
+  ``hasta`` generan exactamente los mismos datos.
+* Se inserta con ``bulk_create`` por lotes, cada lote en su transacción:
+  solicitudes -> sus inspecciones -> sus tareas, sin guardar en memoria más
+  que el lote actual.
+* ``bulk_create`` no dispara señales, así que lo que ellas harían se hace
+  aquí: perfiles y grupos de los usuarios, y al final se reconstruyen los
+  resúmenes de estadísticas y se invalidan los caches afectados.
+* Las fechas se reparten en los ``dias`` anteriores a ``hasta``; para eso se
+  desactiva temporalmente ``auto_now_add`` de los campos de creación.
+"""
+
+import datetime
+import random
+from collections import namedtuple
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.utils import timezone
+
+from .estadisticas import reconstruir_resumenes
+from .models import (
+    EstadoInspeccion, EstadoSolicitud, EstadoTarea, Inspeccion, Notificacion, Perfil, PlantillaInspeccion,
+    Roles, SolicitudInspeccion, TareaInspeccion, TareaPlantilla,
+)
+from .notificaciones import invalidar_no_leidas
+from .plantillas import invalidar_catalogo
+from .rutas import _tabla_comunas
+
+PREFIJO = 'sintetico'
+
+CLAVE_USUARIOS = 'optifire123'
+
+TAMANO_LOTE_SEMILLA = 5000
+
+Tamano = namedtuple('Tamano', 'clientes tecnicos administradores plantillas solicitudes notificaciones')
+
+# Filas aproximadas: solicitudes + ~65% inspecciones + ~6 tareas por inspección + notificaciones
+TAMANOS = {
+    'mini': Tamano(20, 3, 1, 3, 300, 500),                          # ~2 mil filas (pruebas)
+    'chico': Tamano(500, 15, 2, 10, 10_000, 20_000),                # ~70 mil filas
+    'mediano': Tamano(5_000, 80, 3, 20, 130_000, 200_000),          # ~1 millón de filas
+    'grande': Tamano(20_000, 250, 5, 40, 400_000, 600_000),         # ~3 millones de filas
+}
+
+PESOS_SOLICITUD = {
+    EstadoSolicitud.PENDIENTE: 8,
+    EstadoSolicitud.COTIZANDO: 7,
+    EstadoSolicitud.APROBADA: 15,
+    EstadoSolicitud.COMPLETADA: 55,
+    EstadoSolicitud.RECHAZADA: 8,
+    EstadoSolicitud.ANULADA: 7,
+}
+
+PESOS_TAREA_REVISADA = {EstadoTarea.BUENO: 80, EstadoTarea.MALO: 12, EstadoTarea.NO_APLICA: 8}
+
+CALLES = ['Av. Providencia', 'Los Leones', 'Av. Apoquindo', 'San Diego', 'Gran Avenida', 'Av. Matta',
+          'Irarrázaval', 'Vicuña Mackenna', 'Av. Pajaritos', 'Los Carrera', 'Av. Grecia', 'Santa Rosa']
+MAQUINARIAS = ['Extintores', 'Red húmeda', 'Red seca', 'Detectores de humo', 'Rociadores',
+               'Luces de emergencia', 'Gabinetes contra incendio', 'Bombas de presurización']
+TAREAS = ['Revisar presión del manómetro', 'Verificar sello y pasador', 'Inspeccionar manguera',
+          'Comprobar señalética', 'Revisar fecha de carga', 'Probar alarma', 'Limpiar boquillas',
+          'Verificar accesibilidad', 'Revisar válvulas', 'Medir caudal', 'Inspeccionar soportes']
+
+
+@contextmanager
+def fechas_manuales():
+    """Permite fijar ``fecha_solicitud``/``fecha_creacion`` en ``bulk_create``."""
+    campos = [
+        SolicitudInspeccion._meta.get_field('fecha_solicitud'),
+        Inspeccion._meta.get_field('fecha_creacion'),
+        Notificacion._meta.get_field('fecha_creacion'),
+    ]
+    for campo in campos:
+        campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo in campos:
+            campo.auto_now_add = True
+
+
+def _lotes(filas, lote):
+    filas = iter(filas)
+    while True:
+        bloque = list(islice(filas, lote))
+        if not bloque:
+            return
+        yield bloque
+
+
+def _elegir(rng, pesos):
+    return rng.choices(list(pesos), weights=list(pesos.values()))[0]
+
+
+class GeneradorSintetico:
+    def __init__(self, tamano, semilla=1, hasta=None, dias=730, lote=TAMANO_LOTE_SEMILLA, progreso=None):
+        self.tamano = TAMANOS[tamano] if isinstance(tamano, str) else tamano
+        self.rng = random.Random(semilla)
+        self.hasta = hasta or timezone.localdate()
+        self.dias = dias
+        self.lote = lote
+        self.progreso = progreso or (lambda tabla, total: None)
+        self.comunas = sorted(comuna.nombre for comuna in _tabla_comunas()[0].values())
+        self.totales = {}
+
+    # --------------------------------------------------
+    # Utilidades
+    # --------------------------------------------------
+
+    def _momento(self):
+        """Fecha/hora aleatoria (hora de oficina) en los últimos ``dias``."""
+        fecha = self.hasta - datetime.timedelta(days=self.rng.randint(0, self.dias))
+        return timezone.make_aware(datetime.datetime.combine(
+            fecha, datetime.time(self.rng.randint(8, 19), self.rng.randint(0, 59), self.rng.randint(0, 59))
+        ), datetime.timezone.utc)
+
+    def _direccion(self):
+        return f"{self.rng.choice(CALLES)} {self.rng.randint(10, 9999)}, {self.rng.choice(self.comunas)}"
+
+    def _sumar(self, tabla, cantidad):
+        self.totales[tabla] = self.totales.get(tabla, 0) + cantidad
+        self.progreso(tabla, self.totales[tabla])
+
+    # --------------------------------------------------
+    # Usuarios
+    # --------------------------------------------------
+
+    def _usuarios(self, rol, cantidad, clave):
+        etiqueta = {Roles.ADMINISTRADOR: 'admin', Roles.TECNICO: 'tecnico', Roles.CLIENTE: 'cliente'}[rol]
+        grupo, _ = Group.objects.get_or_create(name=rol)
+        ids = []
+        for bloque in _lotes(range(cantidad), self.lote):
+            with transaction.atomic():
+                usuarios = User.objects.bulk_create([
+                    User(
+                        username=f'{PREFIJO}_{etiqueta}{i}', email=f'{PREFIJO}.{etiqueta}{i}@optifire.test',
+                        first_name=etiqueta.capitalize(), last_name=str(i), password=clave,
+                        date_joined=self._momento(), is_staff=rol == Roles.ADMINISTRADOR,
+                    ) for i in bloque
+                ])
+                Perfil.objects.bulk_create([
+                    Perfil(
+                        usuario=usuario, telefono=f'+569{self.rng.randint(10_000_000, 99_999_999)}',
+                        direccion=self._direccion(), ciudad='Santiago', region='Metropolitana',
+                        obligar_cambio_contrasena=False,
+                    ) for usuario in usuarios
+                ])
+                User.groups.through.objects.bulk_create([
+                    User.groups.through(user_id=usuario.pk, group_id=grupo.pk) for usuario in usuarios
+                ])
+            ids.extend(usuario.pk for usuario in usuarios)
+            self._sumar('usuarios', len(usuarios))
+        return ids
+
+    # --------------------------------------------------
+    # Plantillas
+    # --------------------------------------------------
+
+    def _plantillas(self):
+        plantillas = PlantillaInspeccion.objects.bulk_create([
+            PlantillaInspeccion(
+                nombre=f'[Sintética] {MAQUINARIAS[i % len(MAQUINARIAS)]} #{i}',
+                descripcion=f'Revisión de {MAQUINARIAS[i % len(MAQUINARIAS)].lower()}',
+            ) for i in range(self.tamano.plantillas)
+        ])
+        tareas = TareaPlantilla.objects.bulk_create([
+            TareaPlantilla(plantilla=plantilla, descripcion=descripcion, orden=orden)
+            for plantilla in plantillas
+            for orden, descripcion in enumerate(self.rng.sample(TAREAS, self.rng.randint(4, 8)), start=1)
+        ])
+        self._sumar('plantillas', len(plantillas) + len(tareas))
+
+        por_plantilla = {plantilla.pk: [] for plantilla in plantillas}
+        for tarea in tareas:
+            por_plantilla[tarea.plantilla_id].append(tarea)
+        return por_plantilla
+
+    # --------------------------------------------------
+    # Solicitudes -> inspecciones -> tareas
+    # --------------------------------------------------
+
+    def _solicitud(self, clientes, tecnicos, plantillas):
+        estado = _elegir(self.rng, PESOS_SOLICITUD)
+        fecha = self._momento()
+        solicitud = SolicitudInspeccion(
+            cliente_id=self.rng.choice(clientes), nombre_cliente=self.rng.choice(['Ana', 'Luis', 'Carla', 'Pedro', 'Sofía']),
+            apellido_cliente=self.rng.choice(['Soto', 'Rojas', 'Muñoz', 'Díaz', 'Pérez']), direccion=self._direccion(),
+            telefono=f'+569{self.rng.randint(10_000_000, 99_999_999)}',
+            maquinaria=self.rng.choice(MAQUINARIAS), fecha_solicitud=fecha, estado=estado,
+        )
+        if estado == EstadoSolicitud.RECHAZADA:
+            solicitud.motivo_rechazo = "Fuera del área de cobertura."
+        if estado in (EstadoSolicitud.COTIZANDO, EstadoSolicitud.APROBADA, EstadoSolicitud.COMPLETADA):
+            solicitud.monto_cotizacion = self.rng.randrange(30_000, 600_000, 1_000)
+            solicitud.detalle_cotizacion = "Cotización generada por el administrador."
+            solicitud.tecnico_preasignado_id = self.rng.choice(tecnicos)
+            solicitud.plantilla_preasignada_id = self.rng.choice(plantillas)
+            solicitud.nombre_inspeccion_preasignado = f'Mantención {solicitud.maquinaria}'
+            solicitud.fecha_programada_preasignada = fecha.date() + datetime.timedelta(days=self.rng.randint(1, 20))
+        if estado == EstadoSolicitud.APROBADA:
+            solicitud.fecha_programada = solicitud.fecha_programada_preasignada
+        elif estado == EstadoSolicitud.COMPLETADA:
+            solicitud.fecha_programada = min(solicitud.fecha_programada_preasignada, self.hasta)
+        return solicitud
+
+    def _inspeccion(self, solicitud):
+        if solicitud.estado == EstadoSolicitud.COMPLETADA:
+            estado = EstadoInspeccion.COMPLETADA
+        else:
+            estado = self.rng.choice([EstadoInspeccion.ASIGNADA, EstadoInspeccion.EN_CURSO])
+        finalizacion = None
+        if estado == EstadoInspeccion.COMPLETADA:
+            finalizacion = timezone.make_aware(
+                datetime.datetime.combine(solicitud.fecha_programada, datetime.time(self.rng.randint(9, 18))),
+                datetime.timezone.utc,
+            )
+        return Inspeccion(
+            solicitud=solicitud, tecnico_id=solicitud.tecnico_preasignado_id,
+            plantilla_base_id=solicitud.plantilla_preasignada_id, version_plantilla=1,
+            nombre_inspeccion=solicitud.nombre_inspeccion_preasignado, fecha_creacion=solicitud.fecha_solicitud,
+            fecha_programada=solicitud.fecha_programada, fecha_finalizacion=finalizacion, estado=estado,
+        )
+
+    def _estado_tarea(self, inspeccion):
+        if inspeccion.estado == EstadoInspeccion.COMPLETADA:
+            return _elegir(self.rng, PESOS_TAREA_REVISADA)
+        if inspeccion.estado == EstadoInspeccion.EN_CURSO and self.rng.random() < 0.5:
+            return _elegir(self.rng, PESOS_TAREA_REVISADA)
+        return EstadoTarea.PENDIENTE
+
+    def _ordenes(self, clientes, tecnicos, tareas_plantilla):
+        plantillas = list(tareas_plantilla)
+        filas = (self._solicitud(clientes, tecnicos, plantillas) for _ in range(self.tamano.solicitudes))
+        for bloque in _lotes(filas, self.lote):
+            with transaction.atomic():
+                solicitudes = SolicitudInspeccion.objects.bulk_create(bloque)
+                inspecciones = Inspeccion.objects.bulk_create([
+                    self._inspeccion(s) for s in solicitudes
+                    if s.estado in (EstadoSolicitud.APROBADA, EstadoSolicitud.COMPLETADA)
+                ])
+                tareas = TareaInspeccion.objects.bulk_create([
+                    TareaInspeccion(
+                        inspeccion=inspeccion, plantilla_tarea_id=base.pk, descripcion=base.descripcion,
+                        estado=self._estado_tarea(inspeccion),
+                        observacion="Requiere recambio." if self.rng.random() < 0.05 else None,
+                    )
+                    for inspeccion in inspecciones
+                    for base in tareas_plantilla[inspeccion.plantilla_base_id]
+                ], batch_size=self.lote)
+            self._sumar('solicitudes', len(solicitudes))
+            self._sumar('inspecciones', len(inspecciones))
+            self._sumar('tareas', len(tareas))
+
+    # --------------------------------------------------
+    # Notificaciones
+    # --------------------------------------------------
+
+    def _notificaciones(self, usuarios):
+        def fila():
+            # Las recientes suelen estar sin leer; las antiguas casi siempre leídas
+            fecha = self._momento()
+            antiguedad = (self.hasta - fecha.date()).days
+            return Notificacion(
+                usuario_id=self.rng.choice(usuarios), mensaje=f"Aviso de prueba #{self.rng.randint(1, 999_999)}",
+                enlace='/usuarios/notificaciones/', fecha_creacion=fecha,
+                leido=self.rng.random() < (0.4 if antiguedad < 7 else 0.95),
+            )
+
+        for bloque in _lotes((fila() for _ in range(self.tamano.notificaciones)), self.lote):
+            with transaction.atomic():
+                Notificacion.objects.bulk_create(bloque)
+            self._sumar('notificaciones', len(bloque))
+
+    # --------------------------------------------------
+    # Orquestación
+    # --------------------------------------------------
+
+    def generar(self):
+        if User.objects.filter(username__startswith=f'{PREFIJO}_').exists():
+            raise ValueError(
+                "La base ya tiene datos sintéticos: use una BD nueva (p.ej. `manage.py flush`) antes de volver a sembrar."
+            )
+        clave = make_password(CLAVE_USUARIOS, salt=PREFIJO)  # hashear 1 vez, no por usuario
+
+        with fechas_manuales():
+            administradores = self._usuarios(Roles.ADMINISTRADOR, self.tamano.administradores, clave)
+            tecnicos = self._usuarios(Roles.TECNICO, self.tamano.tecnicos, clave)
+            clientes = self._usuarios(Roles.CLIENTE, self.tamano.clientes, clave)
+            tareas_plantilla = self._plantillas()
+            self._ordenes(clientes, tecnicos, tareas_plantilla)
+            # Como en producción: la mayoría de los avisos son para clientes
+            self._notificaciones(clientes * 3 + tecnicos + administradores)
+
+        # Lo que habrían hecho las señales
+        reconstruir_resumenes()
+        invalidar_no_leidas(administradores + tecnicos + clientes)
+        invalidar_catalogo()
+        return self.totales
@@ -0,0 +1,184 @@
+"""
+Modo concurrente para SQLite (opt-in con ``SQLITE_AJUSTES = True``).
+
+Con la configuración por defecto de Django, SQLite usa journal en modo
+DELETE y transacciones DEFERRED. Todas las ``transaction.atomic()`` de la app
+leen antes de escribir: el ``get`` de la solicitud, el ``pre_save`` de las
+señales, el UPDATE de los resúmenes... Cuando dos requests hacen esto a la vez,
+el segundo no puede "subir" su lectura a escritura. SQLite responde
+``database is locked`` DE INMEDIATO, sin respetar el ``timeout``.
+
+Al abrir cada conexión SQLite, ``ajustar_conexion`` hace lo siguiente:
+
+* ``journal_mode=WAL``: los lectores no bloquean al escritor ni al revés.
+* ``synchronous=NORMAL``: con WAL es seguro ante caídas de la aplicación y
+  evita un fsync por commit (solo se arriesga el último commit si se corta la luz).
+* ``busy_timeout``: cuánto espera un escritor el lock antes de fallar.
+* ``mmap_size`` / ``cache_size``: lecturas desde memoria.
+* Transacciones ``BEGIN IMMEDIATE``: el lock de escritura se toma al entrar
+  al ``atomic()``. Las escrituras se ponen en fila (esperando hasta
+  ``busy_timeout``) en vez de fallar a mitad de la transacción. Respeta un
+  ``OPTIONS['transaction_mode']`` explícito en ``DATABASES``.
+
+``medir_escrituras`` es el benchmark de ``manage.py benchmark_sqlite``:
+N hilos repiten el patrón de escritura de la app con y sin estos ajustes.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .percentiles import percentil
+
+MODOS_BENCHMARK = ('defecto', 'ajustado')
+
+
+def pragmas():
+    return [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f'PRAGMA busy_timeout={int(getattr(settings, "SQLITE_BUSY_TIMEOUT", 20) * 1000)}',
+        f'PRAGMA mmap_size={getattr(settings, "SQLITE_MMAP_MB", 256) * 1024 * 1024}',
+        f'PRAGMA cache_size=-{getattr(settings, "SQLITE_CACHE_MB", 64) * 1024}',  # negativo = KiB
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+
+@receiver(connection_created)
+def ajustar_conexion(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not getattr(settings, 'SQLITE_AJUSTES', False):
+        return
+    cursor = connection.connection.cursor()
+    try:
+        for pragma in pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+    if connection.transaction_mode is None:
+        connection.transaction_mode = 'IMMEDIATE'
+
+
+# ==========================================================
+# BENCHMARK DE ESCRITURAS CONCURRENTES
+# ==========================================================
+
+ESQUEMA_BENCHMARK = """
+CREATE TABLE tarea (id INTEGER PRIMARY KEY, estado TEXT, observacion TEXT);
+CREATE TABLE notificacion (id INTEGER PRIMARY KEY, usuario_id INTEGER, mensaje TEXT, leido INTEGER);
+CREATE INDEX notificacion_usuario ON notificacion (usuario_id, leido);
+CREATE TABLE resumen (clave TEXT PRIMARY KEY, total INTEGER);
+"""
+
+
+def _conectar(ruta, modo):
+    # isolation_level=None: BEGIN/COMMIT explícitos, igual que Django
+    conexion = sqlite3.connect(ruta, timeout=5, isolation_level=None, check_same_thread=False)
+    if modo == 'ajustado':
+        for pragma in pragmas():
+            conexion.execute(pragma)
+    return conexion
+
+
+def _preparar(ruta, tareas):
+    conexion = sqlite3.connect(ruta, isolation_level=None)
+    conexion.executescript(ESQUEMA_BENCHMARK)
+    conexion.executemany('INSERT INTO tarea (id, estado) VALUES (?, ?)', ((i, 'PENDIENTE') for i in range(tareas)))
+    conexion.executemany('INSERT INTO resumen VALUES (?, 0)', ((e,) for e in ('B', 'M', 'N/A')))
+    conexion.close()
+
+
+def _escritor(ruta, modo, indice, fin, tareas, resultado, lock):
+    """Lo que hace un request al guardar una tarea: leer, actualizar, notificar y sumar al resumen."""
+    conexion = _conectar(ruta, modo)
+    inicio_tx = 'BEGIN IMMEDIATE' if modo == 'ajustado' else 'BEGIN'
+    tiempos, errores, n = [], 0, 0
+    while time.perf_counter() < fin:
+        tarea = (indice * 7919 + n) % tareas
+        estado = ('B', 'M', 'N/A')[n % 3]
+        n += 1
+        inicio = time.perf_counter()
+        try:
+            conexion.execute(inicio_tx)
+            conexion.execute('SELECT estado FROM tarea WHERE id = ?', (tarea,)).fetchone()
+            conexion.execute('UPDATE tarea SET estado = ?, observacion = ? WHERE id = ?', (estado, f'obs {n}', tarea))
+            conexion.execute('SELECT COUNT(*) FROM notificacion WHERE usuario_id = ? AND leido = 0', (indice,)).fetchone()
+            conexion.execute('INSERT INTO notificacion (usuario_id, mensaje, leido) VALUES (?, ?, 0)', (indice, f'Tarea {tarea}'))
+            conexion.execute('UPDATE resumen SET total = total + 1 WHERE clave = ?', (estado,))
+            conexion.execute('COMMIT')
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        except sqlite3.OperationalError:
+            errores += 1
+            if conexion.in_transaction:
+                conexion.execute('ROLLBACK')
+    conexion.close()
+    with lock:
+        resultado['tiempos'].extend(tiempos)
+        resultado['errores'] += errores
+
+
+def _lector(ruta, modo, fin, resultado, lock):
+    conexion = _conectar(ruta, modo)
+    lecturas = 0
+    while time.perf_counter() < fin:
+        try:
+            conexion.execute('SELECT COUNT(*) FROM notificacion WHERE usuario_id = 1 AND leido = 0').fetchone()
+            lecturas += 1
+        except sqlite3.OperationalError:
+            pass
+    conexion.close()
+    with lock:
+        resultado['lecturas'] += lecturas
+
+
+def medir_escrituras(modo, trabajadores=8, segundos=5.0, lectores=2, tareas=1000, directorio=None):
+    """
+    Corre ``trabajadores`` hilos escritores (y ``lectores`` hilos de solo
+    lectura) durante ``segundos`` sobre una BD nueva en ``directorio`` y
+    retorna escrituras/s, errores "database is locked" y percentiles en ms.
+    """
+    if modo not in MODOS_BENCHMARK:
+        raise ValueError(f"Modo desconocido: {modo}")
+    descriptor, ruta = tempfile.mkstemp(suffix='.sqlite3', dir=directorio)
+    os.close(descriptor)
+    os.remove(ruta)
+    try:
+        _preparar(ruta, tareas)
+        resultado = {'tiempos': [], 'errores': 0, 'lecturas': 0}
+        lock = threading.Lock()
+        fin = time.perf_counter() + segundos
+        hilos = [
+            threading.Thread(target=_escritor, args=(ruta, modo, i, fin, tareas, resultado, lock))
+            for i in range(trabajadores)
+        ] + [
+            threading.Thread(target=_lector, args=(ruta, modo, fin, resultado, lock))
+            for _ in range(lectores)
+        ]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+    finally:
+        for sufijo in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(ruta + sufijo):
+                os.remove(ruta + sufijo)
+
+    tiempos = sorted(resultado['tiempos'])
+    return {
+        'modo': modo,
+        'trabajadores': trabajadores,
+        'escrituras': len(tiempos),
+        'escrituras_por_segundo': round(len(tiempos) / duracion, 1),
+        'errores': resultado['errores'],
+        'lecturas_por_segundo': round(resultado['lecturas'] / duracion, 1),
+        'p50_ms': round(percentil(tiempos, 50), 2) if tiempos else None,
+        'p95_ms': round(percentil(tiempos, 95), 2) if tiempos else None,
+        'p99_ms': round(percentil(tiempos, 99), 2) if tiempos else None,
+    }
@@ -1,7 +1,51 @@
 
-from django.test import TestCase, Client
+import datetime
+import io
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from unittest import skipIf
+from smtplib import SMTPException
+
+from django.test import TestCase, LiveServerTestCase, TransactionTestCase, Client, override_settings
 from django.contrib.auth.models import User, Group
-from .models import SolicitudInspeccion, Roles, EstadoSolicitud, PlantillaInspeccion
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core import mail
+from django.forms import inlineformset_factory
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.test.utils import CaptureQueriesContext
+from django.core.mail.backends.base import BaseEmailBackend
+from django.urls import reverse
+from django.utils import timezone
+from .models import (
+	SolicitudInspeccion, Roles, EstadoSolicitud, PlantillaInspeccion, CorreoPendiente, EstadoCorreo,
+	Inspeccion, TareaInspeccion, TareaPlantilla, EstadoTarea, EstadoInspeccion, Notificacion, NotificacionArchivada,
+	ResumenDiarioSolicitudes, ResumenTecnicoEstado, Perfil,
+)
+from .notificaciones import (
+	compactar_leidas, marcar_leidas, notificar, notificar_evidencias, notificar_lote, usuarios_con_rol, resumen_notificaciones,
+)
+from .cotizaciones import cotizar_lote
+from .plantillas import catalogo_plantillas, limpiar_registro, tareas_plantilla
+from .asignacion import Asignador, asignar_pendientes, ranking_tecnicos
+from .rutas import Comuna, geocodificar, longitud_ruta, matriz_distancias, ordenar_puntos, vecino_mas_cercano
+from .estadisticas import reconstruir_resumenes
+from .tiempo_real import obtener_backend
+from .carga import ejecutar
+from .percentiles import percentil
+from .sqlite import medir_escrituras
+from .checklist import guardar_checklist
+from .routers import BD_NOTIFICACIONES, BD_REPLICA
+from .pdf import cerrar_pool, enviar_render, metricas_pdf
+from PIL import Image
 
 class CotizacionFlowTestCase(TestCase):
 	def setUp(self):
@@ -70,3 +114,1456 @@ class CotizacionFlowTestCase(TestCase):
 		})
 		self.solicitud.refresh_from_db()
 		self.assertEqual(self.solicitud.estado, EstadoSolicitud.RECHAZADA)
+
+
+class RolesCacheTestCase(TestCase):
+	def setUp(self):
+		for rol in Roles:
+			Group.objects.get_or_create(name=rol.value)
+		self.tecnico = User.objects.create_user(username='tecnico', password='tecnico1234', email='tecnico@test.com')
+		self.tecnico.groups.add(Group.objects.get(name=Roles.TECNICO))
+
+	def test_roles_se_consultan_una_vez(self):
+		from .roles import obtener_roles
+		usuario = User.objects.select_related('perfil').get(pk=self.tecnico.pk)
+		with self.assertNumQueries(1):
+			self.assertIn(Roles.TECNICO, obtener_roles(usuario))
+			self.assertEqual(usuario.perfil.get_role(), Roles.TECNICO)
+
+	def test_cambio_de_grupo_invalida_roles(self):
+		from .roles import obtener_roles, version_roles
+		version = version_roles(self.tecnico.pk)
+		obtener_roles(self.tecnico)
+		self.tecnico.groups.clear()
+		self.tecnico.groups.add(Group.objects.get(name=Roles.CLIENTE))
+		self.assertGreater(version_roles(self.tecnico.pk), version)
+		self.assertEqual(obtener_roles(self.tecnico), frozenset([Roles.CLIENTE]))
+
+	def test_roles_en_sesion(self):
+		self.client.login(username='tecnico', password='tecnico1234')
+		with self.settings(ROLES_CACHE_SESION=True):
+			self.client.get('/usuarios/dashboard/')
+			self.assertEqual(self.client.session['_roles_usuario']['roles'], [Roles.TECNICO])
+
+	def test_sesion_con_model_backend_sigue_valida(self):
+		# Sesiones creadas antes de PerfilBackend guardan la ruta de ModelBackend
+		self.client.force_login(self.tecnico, backend='django.contrib.auth.backends.ModelBackend')
+		resp = self.client.get('/usuarios/dashboard/')
+		self.assertTrue(resp.wsgi_request.user.is_authenticated)
+		self.assertEqual(resp.wsgi_request.user, self.tecnico)
+
+
+class BackendQueFalla(BaseEmailBackend):
+	def send_messages(self, email_messages):
+		raise SMTPException("Servidor SMTP caído")
+
+
+class CorreosOutboxTestCase(TestCase):
+	def setUp(self):
+		self.cliente = User.objects.create_user(username='cliente', password='cliente1234', email='cliente@test.com')
+		self.solicitud = SolicitudInspeccion.objects.create(
+			cliente=self.cliente,
+			nombre_cliente='Cliente',
+			direccion='Calle 123',
+			telefono='123456789',
+			maquinaria='Maquina X',
+		)
+
+	def test_cambio_de_estado_encola_y_worker_envia(self):
+		from .correos import procesar_lote
+		self.solicitud.estado = EstadoSolicitud.RECHAZADA
+		self.solicitud.save()
+		# Nada se envía dentro del request, solo queda encolado
+		self.assertEqual(len(mail.outbox), 0)
+		correo = CorreoPendiente.objects.get()
+		self.assertEqual(correo.destinatarios, ['cliente@test.com'])
+
+		resultado = procesar_lote()
+		self.assertEqual(resultado['enviados'], 1)
+		self.assertEqual(len(mail.outbox), 1)
+		self.assertEqual(mail.outbox[0].to, ['cliente@test.com'])
+		correo.refresh_from_db()
+		self.assertEqual(correo.estado, EstadoCorreo.ENVIADO)
+
+	@override_settings(EMAIL_BACKEND='usuarios.tests.BackendQueFalla', CORREOS_MAX_INTENTOS=2)
+	def test_reintentos_y_dead_letter(self):
+		from .correos import encolar_correo, procesar_lote
+		correo = encolar_correo("Asunto", "Cuerpo", ['x@test.com'])
+
+		with self.assertLogs('usuarios.correos', 'WARNING'):
+			self.assertEqual(procesar_lote()['reintentos'], 1)
+		correo.refresh_from_db()
+		self.assertEqual(correo.estado, EstadoCorreo.PENDIENTE)
+		self.assertGreater(correo.proximo_intento, timezone.now())
+
+		CorreoPendiente.objects.update(proximo_intento=timezone.now())
+		with self.assertLogs('usuarios.correos', 'ERROR'):
+			self.assertEqual(procesar_lote()['fallidos'], 1)
+		correo.refresh_from_db()
+		self.assertEqual(correo.estado, EstadoCorreo.FALLIDO)
+		self.assertIn("caído", correo.ultimo_error)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ActaPdfCacheTestCase(TestCase):
+	def setUp(self):
+		self.cliente = User.objects.create_user(username='cliente', password='cliente1234', email='cliente@test.com')
+		self.tecnico = User.objects.create_user(username='tecnico', password='tecnico1234', email='tecnico@test.com')
+		solicitud = SolicitudInspeccion.objects.create(
+			cliente=self.cliente,
+			nombre_cliente='Cliente',
+			direccion='Calle 123',
+			telefono='123456789',
+			maquinaria='Maquina X',
+		)
+		self.inspeccion = Inspeccion.objects.create(solicitud=solicitud, tecnico=self.tecnico, nombre_inspeccion='OT Test')
+		self.tarea = TareaInspeccion.objects.create(inspeccion=self.inspeccion, descripcion='Extintor')
+		self.client.login(username='cliente', password='cliente1234')
+		self.url = f'/usuarios/inspeccion/acta/{self.inspeccion.pk}/'
+
+	def test_acta_se_sirve_desde_cache_con_etag(self):
+		resp = self.client.get(self.url)
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(resp['Content-Type'], 'application/pdf')
+		etag = resp['ETag']
+
+		resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(resp.status_code, 304)
+
+		# Un cambio en las tareas invalida el acta guardada
+		self.tarea.estado = EstadoTarea.MALO
+		self.tarea.save()
+		resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(resp.status_code, 200)
+		self.assertNotEqual(resp['ETag'], etag)
+
+	@override_settings(PDF_WORKERS=1)
+	def test_pregenerar_no_espera_cupo(self):
+		from . import pdf
+		from .actas import huella_acta, obtener_tareas_acta, pregenerar_acta, ruta_acta
+		pdf._obtener_pool()
+		tomados = 0
+		while pdf._semaforo.acquire(timeout=0):
+			tomados += 1
+		try:
+			inicio = time.monotonic()
+			with self.assertLogs('usuarios.actas', 'INFO'):
+				pregenerar_acta(self.inspeccion.pk)
+			self.assertLess(time.monotonic() - inicio, 1)
+		finally:
+			for _ in range(tomados):
+				pdf._semaforo.release()
+			cerrar_pool()
+		ruta = ruta_acta(self.inspeccion.pk, huella_acta(self.inspeccion, obtener_tareas_acta(self.inspeccion)))
+		self.assertFalse(ruta.exists())
+
+
+class ServicioPdfTestCase(TestCase):
+	def tearDown(self):
+		cerrar_pool()
+
+	@override_settings(PDF_WORKERS=1, PDF_MAX_CONCURRENCIA=2)
+	def test_render_en_pool_con_metricas(self):
+		cerrar_pool()
+		antes = metricas_pdf()['renders']
+		futuros = [enviar_render(f'<h1>Acta {i}</h1>') for i in range(3)]
+		for futuro in futuros:
+			self.assertTrue(futuro.result(timeout=60).startswith(b'%PDF'))
+		metricas = metricas_pdf()
+		self.assertEqual(metricas['renders'], antes + 3)
+		self.assertEqual(metricas['en_vuelo'], 0)
+
+	@override_settings(PDF_WORKERS=1)
+	def test_pool_roto_se_reemplaza(self):
+		from . import pdf
+		cerrar_pool()
+		pool = pdf.precalentar_pool()
+		self.assertTrue(enviar_render('<h1>Acta</h1>', 'acta_inspeccion').result(timeout=60).startswith(b'%PDF'))
+		# Un worker muere (OOM, crash): el pool queda roto
+		for proceso in list(pool._processes.values()):
+			proceso.kill()
+		limite = time.monotonic() + 30
+		while not pool._broken and time.monotonic() < limite:
+			time.sleep(0.05)
+		self.assertTrue(pool._broken)
+
+		for _ in range(2):
+			self.assertTrue(enviar_render('<h1>Acta</h1>', 'orden_facturacion').result(timeout=60).startswith(b'%PDF'))
+		self.assertIsNot(pdf._pool, pool)
+		self.assertEqual(metricas_pdf()['en_vuelo'], 0)
+
+
+class PaginacionKeysetTestCase(TestCase):
+	def setUp(self):
+		for rol in Roles:
+			Group.objects.get_or_create(name=rol.value)
+		self.admin = User.objects.create_user(username='admin', password='admin1234', email='admin@test.com')
+		self.admin.groups.add(Group.objects.get(name=Roles.ADMINISTRADOR))
+		self.cliente = User.objects.create_user(username='cliente', password='cliente1234', email='cliente@test.com')
+		self.cliente.groups.add(Group.objects.get(name=Roles.CLIENTE))
+		SolicitudInspeccion.objects.bulk_create([
+			SolicitudInspeccion(
+				cliente=self.cliente,
+				nombre_cliente=f'Cliente {i}',
+				direccion='Calle 123',
+				telefono='123456789',
+				maquinaria='Maquina X',
+				estado=EstadoSolicitud.RECHAZADA if i % 2 else EstadoSolicitud.COMPLETADA,
+			) for i in range(60)
+		])
+
+	def _recorrer(self, url):
+		vistos = []
+		while url:
+			resp = self.client.get(url)
+			self.assertEqual(resp.status_code, 200)
+			pagina = resp.context['pagina']
+			vistos.extend(s.pk for s in pagina)
+			url = pagina.url_siguiente and resp.request['PATH_INFO'] + pagina.url_siguiente
+		return vistos
+
+	def test_historial_recorre_todas_las_paginas_sin_repetir(self):
+		self.client.login(username='admin', password='admin1234')
+		vistos = self._recorrer('/usuarios/historial/')
+		esperados = list(SolicitudInspeccion.objects.order_by('-fecha_solicitud', '-id').values_list('pk', flat=True))
+		self.assertEqual(vistos, esperados)
+
+	def test_filtro_estado_y_pagina_anterior(self):
+		self.client.login(username='admin', password='admin1234')
+		resp = self.client.get('/usuarios/historial/', {'estado': EstadoSolicitud.RECHAZADA})
+		primera = [s.pk for s in resp.context['pagina']]
+		self.assertEqual(resp.context['pagina'].total, 30)
+		resp = self.client.get('/usuarios/historial/' + resp.context['pagina'].url_siguiente)
+		self.assertTrue(all(s.estado == EstadoSolicitud.RECHAZADA for s in resp.context['pagina']))
+		resp = self.client.get('/usuarios/historial/' + resp.context['pagina'].url_anterior)
+		self.assertEqual([s.pk for s in resp.context['pagina']], primera)
+
+	def test_cursor_alterado_vuelve_a_la_primera_pagina(self):
+		from .paginacion import codificar_cursor
+		self.client.login(username='admin', password='admin1234')
+		primera = [s.pk for s in self.client.get('/usuarios/historial/').context['pagina']]
+		for valores in (['abc', 1], [{}, 1], [None, 1], ['2024-01-01T00:00:00', 'x']):
+			for parametro in ('despues', 'antes'):
+				resp = self.client.get('/usuarios/historial/', {parametro: codificar_cursor(valores)})
+				self.assertEqual(resp.status_code, 200, (parametro, valores))
+				self.assertEqual([s.pk for s in resp.context['pagina']], primera)
+		tecnico = User.objects.create_user(username='tecnico_cursor', password='x')
+		tecnico.groups.add(Group.objects.get(name=Roles.TECNICO))
+		self.client.force_login(tecnico)
+		resp = self.client.get(reverse('registro_trabajos'), {'despues': codificar_cursor(['abc', 1])})
+		self.assertEqual(resp.status_code, 200)
+
+	def test_total_acotado(self):
+		from .paginacion import PaginaKeyset, contar_acotado
+		rechazadas = SolicitudInspeccion.objects.filter(estado=EstadoSolicitud.RECHAZADA)
+		with CaptureQueriesContext(connection) as consultas:
+			self.assertEqual(contar_acotado(rechazadas, limite=10), 11)
+		# El COUNT corre sobre una subconsulta con LIMIT, no sobre la tabla completa
+		self.assertIn('LIMIT 11', consultas[0]['sql'])
+		self.assertEqual(contar_acotado(rechazadas, limite=100), 30)
+		self.assertEqual(PaginaKeyset([], {}, total=11, limite_conteo=10).total_texto, 'más de 10')
+		self.assertEqual(PaginaKeyset([], {}, total=30, limite_conteo=100).total_texto, '30')
+
+	def test_listados_renderizan(self):
+		self.client.login(username='admin', password='admin1234')
+		for url in ('/usuarios/dashboard/admin/', '/usuarios/usuarios/?rol=Cliente'):
+			self.assertEqual(self.client.get(url).status_code, 200)
+		self.client.login(username='cliente', password='cliente1234')
+		self.assertEqual(self.client.get('/usuarios/dashboard/cliente/?desde=2000-01-01').status_code, 200)
+		tecnico = User.objects.create_user(username='tecnico', password='tecnico1234')
+		tecnico.groups.add(Group.objects.get(name=Roles.TECNICO))
+		Inspeccion.objects.create(tecnico=tecnico, nombre_inspeccion='OT', estado=EstadoInspeccion.COMPLETADA)
+		self.client.login(username='tecnico', password='tecnico1234')
+		resp = self.client.get('/usuarios/dashboard/tecnico/registro/')
+		self.assertEqual(len(resp.context['pagina']), 1)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), EVIDENCIA_EN_SEGUNDO_PLANO=False, EVIDENCIA_LADO_MAXIMO=800, EVIDENCIA_LADO_MINIATURA=100)
+class EvidenciaImagenTestCase(TestCase):
+	def setUp(self):
+		self.tecnico = User.objects.create_user(username='tecnico', password='tecnico1234')
+		inspeccion = Inspeccion.objects.create(tecnico=self.tecnico, nombre_inspeccion='OT')
+		self.tarea = TareaInspeccion.objects.create(inspeccion=inspeccion, descripcion='Extintor')
+
+	def _foto(self, ancho=2400, alto=1800):
+		exif = Image.Exif()
+		exif[0x0110] = 'Telefono de prueba'  # Model
+		buffer = io.BytesIO()
+		Image.new('RGB', (ancho, alto), (200, 30, 30)).save(buffer, 'JPEG', exif=exif)
+		return SimpleUploadedFile('foto.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+	def test_foto_se_reduce_sin_exif_y_con_miniatura(self):
+		with self.captureOnCommitCallbacks(execute=True):
+			self.tarea.imagen_evidencia = self._foto()
+			self.tarea.save()
+
+		self.tarea.refresh_from_db()
+		with Image.open(self.tarea.imagen_evidencia.path) as imagen:
+			self.assertEqual(imagen.size, (800, 600))
+			self.assertFalse(imagen.getexif())
+		with Image.open(self.tarea.miniatura_evidencia.path) as miniatura:
+			self.assertEqual(miniatura.size, (100, 100))
+
+	def test_comando_procesa_fotos_existentes(self):
+		# Fotos subidas antes del pipeline: UPDATE directo, sin señales
+		self.tarea.imagen_evidencia.save('antigua.jpg', self._foto(1000, 1000), save=False)
+		TareaInspeccion.objects.filter(pk=self.tarea.pk).update(imagen_evidencia=self.tarea.imagen_evidencia.name)
+
+		from django.core.management import call_command
+		call_command('procesar_evidencias', stdout=io.StringIO())
+
+		self.tarea.refresh_from_db()
+		self.assertTrue(self.tarea.miniatura_evidencia)
+
+
+class NotificacionesServicioTestCase(TestCase):
+	def setUp(self):
+		for rol in Roles:
+			Group.objects.get_or_create(name=rol.value)
+		grupo_admin = Group.objects.get(name=Roles.ADMINISTRADOR)
+		self.admins = [User.objects.create_user(username=f'admin{i}', password='x') for i in range(5)]
+		grupo_admin.user_set.add(*self.admins)
+		self.tecnico = User.objects.create_user(username='tecnico', password='x')
+		self.cliente = User.objects.create_user(username='cliente', password='x')
+
+	def test_un_insert_para_rol_y_usuario(self):
+		# 1 SELECT de ids de administradores + 1 INSERT
+		with self.assertNumQueries(2):
+			creadas = notificar_lote([
+				(usuarios_con_rol(Roles.ADMINISTRADOR), 'Para admins', '/a/'),
+				(self.tecnico, 'Para el técnico', '/b/'),
+			])
+		self.assertEqual(len(creadas), 6)
+		self.assertEqual(Notificacion.objects.filter(mensaje='Para admins').count(), 5)
+
+	def test_destinatarios_repetidos_y_vacios(self):
+		with self.assertNumQueries(1):
+			notificar([self.cliente, self.cliente.pk], 'Hola')
+		self.assertEqual(Notificacion.objects.filter(usuario=self.cliente).count(), 1)
+		with self.assertNumQueries(0):
+			self.assertEqual(notificar([], 'Nadie'), [])
+
+	def test_evidencias_notifican_al_cliente_de_cada_orden(self):
+		solicitud = SolicitudInspeccion.objects.create(
+			cliente=self.cliente, nombre_cliente='C', apellido_cliente='L', direccion='D',
+			telefono='1', maquinaria='M',
+		)
+		inspeccion = Inspeccion.objects.create(solicitud=solicitud, tecnico=self.tecnico, nombre_inspeccion='OT')
+		tareas = [TareaInspeccion.objects.create(inspeccion=inspeccion, descripcion=f'T{i}') for i in range(3)]
+		with self.assertNumQueries(2):
+			notificar_evidencias([t.pk for t in tareas])
+		self.assertEqual(self.cliente.notificaciones.count(), 3)
+
+
+@override_settings(NOTIFICACIONES_MAX_VISIBLES=3)
+class ContadorNotificacionesTestCase(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.usuario = User.objects.create_user(username='cliente', password='x')
+
+	def test_sin_pendientes_no_consulta_la_lista(self):
+		resumen = resumen_notificaciones(self.usuario)
+		with self.assertNumQueries(1):
+			self.assertFalse(resumen)
+			self.assertEqual(list(resumen), [])
+		with self.assertNumQueries(0):
+			self.assertFalse(resumen_notificaciones(self.usuario))
+
+	def test_lista_limitada_y_contador_invalidado(self):
+		with self.captureOnCommitCallbacks(execute=True):
+			notificar_lote([(self.usuario, f'Aviso {i}', None) for i in range(10)])
+		resumen = resumen_notificaciones(self.usuario)
+		self.assertEqual(resumen.no_leidas, 10)
+		self.assertEqual(len(resumen), 3)
+		self.assertEqual(resumen.ocultas, 7)
+		self.assertEqual(resumen.ultimas[0].mensaje, 'Aviso 9')
+
+		# Marcar como leída invalida el contador (post_save)
+		with self.captureOnCommitCallbacks(execute=True):
+			notif = self.usuario.notificaciones.first()
+			notif.leido = True
+			notif.save()
+		self.assertEqual(resumen_notificaciones(self.usuario).no_leidas, 9)
+
+
+@override_settings(TIEMPO_REAL_ESPERA=2, TIEMPO_REAL_LATIDO=1, TIEMPO_REAL_DURACION_STREAM=1)
+class TiempoRealTestCase(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.usuario = User.objects.create_user(username='cliente', password='x')
+
+	def _publicar_en(self, segundos, mensaje):
+		def publicar():
+			obtener_backend().publicar(self.usuario.pk, {'id': 10 ** 6, 'mensaje': mensaje, 'enlace': None, 'fecha': None})
+		hilo = threading.Timer(segundos, publicar)
+		hilo.start()
+		return hilo
+
+	def test_long_poll_devuelve_pendientes_de_inmediato(self):
+		anterior = notificar(self.usuario, 'Vieja')[0]
+		nueva = notificar(self.usuario, 'Nueva')[0]
+		self.client.force_login(self.usuario)
+		datos = self.client.get('/usuarios/notificaciones/esperar/', {'desde': anterior.pk}).json()
+		self.assertEqual([n['mensaje'] for n in datos['notificaciones']], ['Nueva'])
+		self.assertEqual(datos['ultimo_id'], nueva.pk)
+
+	@override_settings(TIEMPO_REAL_ESPERA=0.2)
+	async def test_long_poll_sin_novedades_expira(self):
+		await self.async_client.aforce_login(self.usuario)
+		datos = (await self.async_client.get('/usuarios/notificaciones/esperar/')).json()
+		self.assertEqual(datos['notificaciones'], [])
+
+	async def test_long_poll_despierta_con_el_pubsub(self):
+		await self.async_client.aforce_login(self.usuario)
+		hilo = self._publicar_en(0.3, 'En vivo')
+		datos = (await self.async_client.get('/usuarios/notificaciones/esperar/')).json()
+		hilo.join()
+		self.assertEqual([n['mensaje'] for n in datos['notificaciones']], ['En vivo'])
+
+	@override_settings(TIEMPO_REAL_ESPERA=5, TIEMPO_REAL_DURACION_STREAM=5)
+	def test_bajo_wsgi_no_retiene_el_hilo(self):
+		self.client.force_login(self.usuario)
+		inicio = time.monotonic()
+		datos = self.client.get('/usuarios/notificaciones/esperar/').json()
+		stream = self.client.get('/usuarios/notificaciones/stream/')
+		self.assertLess(time.monotonic() - inicio, 2)
+		self.assertEqual(datos['notificaciones'], [])
+		# 204: el EventSource no se reconecta
+		self.assertEqual(stream.status_code, 204)
+
+		nueva = notificar(self.usuario, 'Pendiente')[0]
+		datos = self.client.get('/usuarios/notificaciones/esperar/').json()
+		self.assertEqual(datos['ultimo_id'], nueva.pk)
+
+		self.usuario.groups.add(Group.objects.get_or_create(name=Roles.CLIENTE)[0])
+		self.assertContains(self.client.get('/usuarios/dashboard/cliente/'), 'data-sse="0"')
+
+	async def test_stream_sse(self):
+		await self.async_client.aforce_login(self.usuario)
+		hilo = self._publicar_en(0.3, 'Por SSE')
+		response = await self.async_client.get('/usuarios/notificaciones/stream/')
+		self.assertEqual(response['Content-Type'], 'text/event-stream')
+		cuerpo = ''.join([c.decode() async for c in response.streaming_content])
+		hilo.join()
+		datos = [json.loads(l[len('data: '):]) for l in cuerpo.splitlines() if l.startswith('data: ')]
+		self.assertEqual([d['mensaje'] for d in datos], ['Por SSE'])
+
+
+class BandejaNotificacionesTestCase(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.usuario = User.objects.create_user(username='cliente', password='x')
+		self.otro = User.objects.create_user(username='otro', password='x')
+		self.notificaciones = notificar_lote([(self.usuario, f'Aviso {i}', None) for i in range(30)])
+		self.ajena = notificar(self.otro, 'Ajena')[0]
+		self.client.force_login(self.usuario)
+
+	def _marcar(self, datos):
+		return self.client.post('/usuarios/notificaciones/marcar-leidas/', json.dumps(datos), content_type='application/json')
+
+	def test_marcar_lote_con_un_update(self):
+		ids = [n.pk for n in self.notificaciones[:10]] + [self.ajena.pk]
+		with self.assertNumQueries(1):
+			self.assertEqual(marcar_leidas(self.usuario.pk, ids), 10)
+		self.ajena.refresh_from_db()
+		self.assertFalse(self.ajena.leido)
+
+	def test_endpoint_marcar_todas(self):
+		self.assertEqual(self.client.get('/usuarios/notificaciones/marcar-leidas/').status_code, 405)
+		self.assertEqual(self._marcar({'ids': []}).status_code, 400)
+		resp = self._marcar({'todas': True})
+		self.assertEqual(resp.json()['actualizadas'], 30)
+		self.assertFalse(self.usuario.notificaciones.filter(leido=False).exists())
+
+	def test_marcar_una_ajena_da_404(self):
+		resp = self.client.get(f'/usuarios/notificacion/leida/{self.ajena.pk}/')
+		self.assertEqual(resp.status_code, 404)
+
+	def test_bandeja_paginada_por_cursor(self):
+		vistos = []
+		url = '/usuarios/notificaciones/'
+		while url:
+			datos = self.client.get(url).json()
+			vistos.extend(n['id'] for n in datos['notificaciones'])
+			url = datos['siguiente'] and '/usuarios/notificaciones/' + datos['siguiente']
+		self.assertEqual(vistos, sorted((n.pk for n in self.notificaciones), reverse=True))
+
+	def test_compactar_archiva_leidas_antiguas_en_lotes(self):
+		antiguas = [n.pk for n in self.notificaciones[:25]]
+		Notificacion.objects.filter(pk__in=antiguas).update(
+			leido=True, fecha_creacion=timezone.now() - datetime.timedelta(days=60)
+		)
+		lotes = list(compactar_leidas(dias=30, lote=10))
+		self.assertEqual(lotes, [10, 10, 5])
+		self.assertFalse(Notificacion.objects.filter(pk__in=antiguas).exists())
+		self.assertEqual(NotificacionArchivada.objects.filter(usuario=self.usuario).count(), 25)
+		self.assertEqual(self.usuario.notificaciones.count(), 5)
+
+
+class ResumenesEstadisticasTestCase(TestCase):
+	def setUp(self):
+		for rol in Roles:
+			Group.objects.get_or_create(name=rol.value)
+		self.admin = User.objects.create_user(username='admin', password='admin1234')
+		self.admin.groups.add(Group.objects.get(name=Roles.ADMINISTRADOR))
+		self.cliente = User.objects.create_user(username='cliente', password='x')
+		self.tecnicos = [User.objects.create_user(username=f'tecnico{i}', password='x') for i in range(2)]
+		Group.objects.get(name=Roles.TECNICO).user_set.add(*self.tecnicos)
+
+	def _crear(self, cantidad):
+		for i in range(cantidad):
+			solicitud = SolicitudInspeccion.objects.create(
+				cliente=self.cliente, nombre_cliente='C', direccion='D', telefono='1', maquinaria='M',
+			)
+			if i % 2:
+				Inspeccion.objects.create(solicitud=solicitud, tecnico=self.tecnicos[i % 4 // 2], nombre_inspeccion='OT')
+				solicitud.estado = EstadoSolicitud.APROBADA
+				solicitud.save()
+
+	def _resumen_diario(self):
+		return {(r.fecha, r.estado): r.total for r in ResumenDiarioSolicitudes.objects.filter(total__gt=0)}
+
+	def _resumen_tecnicos(self):
+		return {(r.tecnico_id, r.estado): r.total for r in ResumenTecnicoEstado.objects.filter(total__gt=0)}
+
+	def test_incremental_coincide_con_reconstruccion(self):
+		self._crear(8)
+		inspeccion = Inspeccion.objects.first()
+		inspeccion.estado = EstadoInspeccion.COMPLETADA
+		inspeccion.save()
+		inspeccion.tecnico = self.tecnicos[1]
+		inspeccion.save()
+		SolicitudInspeccion.objects.filter(estado=EstadoSolicitud.PENDIENTE).first().delete()
+
+		incremental = (self._resumen_diario(), self._resumen_tecnicos())
+		reconstruir_resumenes(lote=3)
+		self.assertEqual((self._resumen_diario(), self._resumen_tecnicos()), incremental)
+		self.assertEqual(sum(incremental[0].values()), 7)
+
+	def test_grupo_sin_fila_se_cuenta_desde_el_origen(self):
+		self._crear(4)
+		# Filas anteriores al backfill o borradas por una reconstrucción parcial
+		ResumenDiarioSolicitudes.objects.all().delete()
+		ResumenTecnicoEstado.objects.all().delete()
+		solicitud = SolicitudInspeccion.objects.filter(estado=EstadoSolicitud.PENDIENTE).first()
+		solicitud.estado = EstadoSolicitud.RECHAZADA
+		solicitud.save()
+		inspeccion = Inspeccion.objects.first()
+		inspeccion.estado = EstadoInspeccion.COMPLETADA
+		inspeccion.save()
+
+		self.assertFalse(ResumenDiarioSolicitudes.objects.filter(total__lt=0).exists())
+		self.assertFalse(ResumenTecnicoEstado.objects.filter(total__lt=0).exists())
+		self.assertEqual(ResumenDiarioSolicitudes.objects.get(estado=EstadoSolicitud.PENDIENTE).total, 1)
+		self.assertEqual(ResumenDiarioSolicitudes.objects.get(estado=EstadoSolicitud.RECHAZADA).total, 1)
+		self.assertEqual(ResumenTecnicoEstado.objects.get(estado=EstadoInspeccion.COMPLETADA).total, 1)
+
+	def test_vista_admin_lee_solo_resumenes(self):
+		self._crear(6)
+		self.client.force_login(self.admin)
+		self.client.get('/usuarios/estadisticas/')  # calienta sesión/roles
+		with self.assertNumQueries(6) as consultas:
+			resp = self.client.get('/usuarios/estadisticas/')
+		sql = ' '.join(c['sql'] for c in consultas.captured_queries)
+		self.assertNotIn('"usuarios_solicitudinspeccion"', sql)
+		self.assertNotIn('"usuarios_inspeccion"', sql)
+		self.assertEqual(sum(resp.context['data_semana']), 6)
+		self.assertEqual(sorted(resp.context['data_carga']), [1, 2])
+
+
+class DisponibilidadTecnicosTestCase(TestCase):
+	URL = '/usuarios/api/tecnicos/disponibilidad/'
+
+	def setUp(self):
+		cache.clear()
+		for rol in Roles:
+			Group.objects.get_or_create(name=rol.value)
+		self.admin = User.objects.create_user(username='admin', password='x')
+		self.admin.groups.add(Group.objects.get(name=Roles.ADMINISTRADOR))
+		self.tecnicos = [User.objects.create_user(username=f'tecnico{i}', password='x') for i in range(3)]
+		self.hoy = timezone.localdate()
+		self.manana = self.hoy + datetime.timedelta(days=1)
+		for tecnico in self.tecnicos[:2]:
+			Inspeccion.objects.create(tecnico=tecnico, nombre_inspeccion='OT', fecha_programada=self.manana)
+		Inspeccion.objects.create(tecnico=self.tecnicos[0], nombre_inspeccion='OT 2', fecha_programada=self.manana)
+		Inspeccion.objects.create(
+			tecnico=self.tecnicos[0], nombre_inspeccion='Lista', fecha_programada=self.manana,
+			estado=EstadoInspeccion.COMPLETADA,
+		)
+		self.client.force_login(self.admin)
+
+	def _pedir(self, **extra):
+		ids = ','.join(str(t.pk) for t in self.tecnicos)
+		return self.client.get(self.URL, {'tecnicos': ids, 'desde': self.hoy.isoformat()}, **extra)
+
+	def test_conteo_por_dia_y_tecnico(self):
+		resp = self._pedir()
+		datos = resp.json()['tecnicos']
+		dia = self.manana.isoformat()
+		self.assertEqual(datos[str(self.tecnicos[0].pk)], {dia: 2})
+		self.assertEqual(datos[str(self.tecnicos[1].pk)], {dia: 1})
+		self.assertEqual(datos[str(self.tecnicos[2].pk)], {})
+		self.assertIn('no-cache', resp['Cache-Control'])
+
+	def test_etag_304_e_invalidacion_al_reprogramar(self):
+		etag = self._pedir()['ETag']
+		with self.assertNumQueries(3):  # sesión, usuario y roles; nada de inspecciones
+			self.assertEqual(self._pedir(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+		inspeccion = Inspeccion.objects.filter(tecnico=self.tecnicos[1]).get()
+		with self.captureOnCommitCallbacks(execute=True):
+			inspeccion.fecha_programada = self.hoy
+			inspeccion.save()
+		resp = self._pedir(HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(resp.json()['tecnicos'][str(self.tecnicos[1].pk)], {self.hoy.isoformat(): 1})
+
+	def test_cache_por_proceso_expira_en_segundos(self):
+		from unittest import mock
+		from .disponibilidad import TTL_DISPONIBILIDAD_LOCAL, cache_compartido, ocupacion_tecnicos
+		self.assertFalse(cache_compartido())
+		ids = [t.pk for t in self.tecnicos]
+		ocupacion_tecnicos(ids, self.hoy, self.manana)
+		# Otro worker asigna: su invalidación no llega al locmem de este proceso
+		Inspeccion.objects.create(tecnico=self.tecnicos[2], nombre_inspeccion='OT', fecha_programada=self.manana)
+		with self.assertNumQueries(0):
+			self.assertEqual(ocupacion_tecnicos(ids, self.hoy, self.manana)[self.tecnicos[2].pk], {})
+		with mock.patch('time.time', return_value=time.time() + TTL_DISPONIBILIDAD_LOCAL + 1):
+			ocupacion = ocupacion_tecnicos(ids, self.hoy, self.manana)
+		self.assertEqual(ocupacion[self.tecnicos[2].pk], {self.manana.isoformat(): 1})
+
+	def test_parametros_invalidos(self):
+		self.assertEqual(self.client.get(self.URL).status_code, 400)
+		resp = self.client.get(self.URL, {'tecnicos': '1', 'desde': '2030-01-01', 'hasta': '2020-01-01'})
+		self.assertEqual(resp.status_code, 400)
+
+	def test_endpoint_anterior_compatible(self):
+		resp = self.client.get(f'/usuarios/api/tecnico/disponibilidad/{self.tecnicos[0].pk}/')
+		self.assertEqual(resp.json(), {'fechas_ocupadas': [self.manana.isoformat()]})
+
+
+class AsignacionTecnicosTestCase(TestCase):
+	def setUp(self):
+		for rol in Roles:
+			Group.objects.get_or_create(name=rol.value)
+		self.cliente = User.objects.create_user(username='cliente', password='x')
+		grupo = Group.objects.get(name=Roles.TECNICO)
+		self.santiago = User.objects.create_user(username='santiago', password='x')
+		self.vina = User.objects.create_user(username='vina', password='x')
+		self.otro = User.objects.create_user(username='otro', password='x')
+		grupo.user_set.add(self.santiago, self.vina, self.otro)
+		for tecnico, ciudad, region in ((self.santiago, 'Santiago', 'Metropolitana'), (self.vina, 'Viña del Mar', 'Valparaíso')):
+			perfil = tecnico.perfil
+			perfil.ciudad, perfil.region = ciudad, region
+			perfil.save()
+		self.manana = timezone.localdate() + datetime.timedelta(days=1)
+
+	def _solicitud(self, direccion, **extra):
+		return SolicitudInspeccion.objects.create(
+			cliente=self.cliente, nombre_cliente='C', direccion=direccion, telefono='1', maquinaria='M', **extra
+		)
+
+	def test_ranking_por_zona_carga_y_dia(self):
+		solicitud = self._solicitud('Av. Libertad 100, Vina del Mar', fecha_programada_preasignada=self.manana)
+		self.assertEqual(ranking_tecnicos(solicitud)[0].tecnico, self.vina)
+
+		# Con el técnico de la zona ocupado ese día y con carga, gana otro
+		for _ in range(2):
+			Inspeccion.objects.create(tecnico=self.vina, nombre_inspeccion='OT', fecha_programada=self.manana)
+		ranking = ranking_tecnicos(solicitud)
+		self.assertNotEqual(ranking[0].tecnico, self.vina)
+		self.assertEqual(ranking[-1].tecnico, self.vina)
+
+	def test_consultas_constantes(self):
+		fechas = [self.manana + datetime.timedelta(days=i) for i in range(5)]
+		with self.assertNumQueries(5):
+			Asignador(fechas=fechas)
+		User.objects.bulk_create([User(username=f'extra{i}') for i in range(20)])
+		Group.objects.get(name=Roles.TECNICO).user_set.add(*User.objects.filter(username__startswith='extra'))
+		with self.assertNumQueries(5):
+			Asignador(fechas=fechas)
+
+	def test_lote_reparte_la_carga(self):
+		for i in range(9):
+			self._solicitud(f'Calle {i}, Rancagua')
+		with self.assertNumQueries(7):  # pendientes + 3 del asignador (sin fechas) + savepoint/UPDATE/release
+			asignaciones = asignar_pendientes()
+		self.assertEqual(len(asignaciones), 9)
+		por_tecnico = Counter(SolicitudInspeccion.objects.values_list('tecnico_preasignado__username', flat=True))
+		self.assertEqual(sorted(por_tecnico.values()), [3, 3, 3])
+		self.assertEqual(asignar_pendientes(), [])
+
+	def test_lote_respeta_las_ya_procesadas_e_invalida_disponibilidad(self):
+		from .disponibilidad import versiones
+		pendiente = self._solicitud('Calle 1, Santiago', tecnico_preasignado=self.otro)
+		cotizada = self._solicitud('Calle 2, Santiago', tecnico_preasignado=self.otro, estado=EstadoSolicitud.COTIZANDO)
+		antes = versiones([self.santiago.pk, self.otro.pk])
+		with self.captureOnCommitCallbacks(execute=True):
+			asignaciones = asignar_pendientes(reasignar=True)
+		self.assertEqual([s.pk for s, _, _ in asignaciones], [pendiente.pk])
+		cotizada.refresh_from_db()
+		self.assertEqual(cotizada.tecnico_preasignado, self.otro)
+		despues = versiones([self.santiago.pk, self.otro.pk])
+		self.assertGreater(despues[self.santiago.pk], antes[self.santiago.pk])
+		self.assertGreater(despues[self.otro.pk], antes[self.otro.pk])
+
+	def test_vista_gestionar_recomienda_y_auto_asignar(self):
+		admin = User.objects.create_user(username='admin', password='x')
+		admin.groups.add(Group.objects.get(name=Roles.ADMINISTRADOR))
+		solicitud = self._solicitud('Pasaje 1, Santiago Centro')
+		self.client.force_login(admin)
+		resp = self.client.get(f'/usuarios/solicitud/gestionar/{solicitud.pk}/')
+		self.assertEqual(resp.context['tecnico_recomendado'], self.santiago.pk)
+		resp = self.client.post('/usuarios/solicitud/auto-asignar/')
+		self.assertRedirects(resp, '/usuarios/dashboard/admin/', fetch_redirect_response=False)
+		solicitud.refresh_from_db()
+		self.assertEqual(solicitud.tecnico_preasignado, self.santiago)
+
+
+class RutasTecnicoTestCase(TestCase):
+	def setUp(self):
+		for rol in Roles:
+			Group.objects.get_or_create(name=rol.value)
+		self.cliente = User.objects.create_user(username='cliente', password='x')
+		self.tecnico = User.objects.create_user(username='tecnico', password='x')
+		self.tecnico.groups.add(Group.objects.get(name=Roles.TECNICO))
+		perfil = self.tecnico.perfil
+		perfil.direccion = 'Av. Providencia 1000, Providencia'
+		perfil.save()
+		self.manana = timezone.localdate() + datetime.timedelta(days=1)
+
+	def _ot(self, direccion, fecha):
+		solicitud = SolicitudInspeccion.objects.create(
+			cliente=self.cliente, nombre_cliente='C', direccion=direccion, telefono='1', maquinaria='M'
+		)
+		return Inspeccion.objects.create(
+			solicitud=solicitud, tecnico=self.tecnico, nombre_inspeccion=direccion, fecha_programada=fecha
+		)
+
+	def test_geocodificar(self):
+		# La calle (primer tramo) no se confunde con la comuna
+		self.assertEqual(geocodificar('Av. Las Condes 123, Vitacura, Santiago').nombre, 'Vitacura')
+		self.assertEqual(geocodificar('Los Carrera 5, San Pedro de la Paz').nombre, 'San Pedro de la Paz')
+		self.assertEqual(geocodificar('Irarrazaval 3000, NUNOA').nombre, 'Ñuñoa')
+		self.assertEqual(geocodificar('Viña del Mar').nombre, 'Viña del Mar')
+		self.assertIsNone(geocodificar('Calle sin comuna 12'))
+		self.assertIsNone(geocodificar(None))
+
+	def test_heuristica_rapida_y_no_empeora(self):
+		azar = random.Random(7)
+		puntos = [Comuna(str(i), '', -33.0 - azar.random(), -70.0 - azar.random()) for i in range(400)]
+		inicio = time.perf_counter()
+		orden = ordenar_puntos(puntos)
+		self.assertLess(time.perf_counter() - inicio, 1.0)
+		self.assertEqual(sorted(orden), list(range(400)))
+		matriz = matriz_distancias(puntos)
+		self.assertLessEqual(longitud_ruta(orden, matriz), longitud_ruta(vecino_mas_cercano(matriz), matriz) + 1e-6)
+
+		# Puntos sobre una línea desordenados: la ruta los recorre en orden
+		linea = [Comuna(str(i), '', -33.0, -70.0 - i * 0.1) for i in (3, 0, 4, 1, 2)]
+		self.assertEqual([linea[i].nombre for i in ordenar_puntos(linea, origen=Comuna('o', '', -33.0, -69.9))], ['0', '1', '2', '3', '4'])
+
+	def test_agenda_en_dashboard_y_json(self):
+		for direccion in ('Pajaritos 10, Maipu', 'Sin comuna 1', 'Apoquindo 20, Las Condes', 'Grecia 30, Ñuñoa'):
+			self._ot(direccion, self.manana)
+		self._ot('Calle 1, Rancagua', self.manana + datetime.timedelta(days=1))
+		self._ot('Calle 2, Talca', None)
+
+		self.client.force_login(self.tecnico)
+		resp = self.client.get('/usuarios/dashboard/tecnico/')
+		self.assertEqual(resp.context['base_ruta'].nombre, 'Providencia')
+		agenda = resp.context['agenda']
+		self.assertEqual([d.fecha for d in agenda], [self.manana, self.manana + datetime.timedelta(days=1), None])
+		# Providencia -> Las Condes -> Ñuñoa -> Maipú es más corta que partir por Ñuñoa (la más cercana)
+		primer_dia = [p.inspeccion.nombre_inspeccion for p in agenda[0].paradas]
+		self.assertEqual(primer_dia, ['Apoquindo 20, Las Condes', 'Grecia 30, Ñuñoa', 'Pajaritos 10, Maipu', 'Sin comuna 1'])
+		self.assertEqual(agenda[0].sin_ubicacion, 1)
+		self.assertContains(resp, 'Las Condes')
+
+		datos = self.client.get('/usuarios/api/tecnico/ruta/', {'desde': self.manana.isoformat(), 'hasta': self.manana.isoformat()}).json()
+		self.assertEqual(datos['base'], 'Providencia')
+		self.assertEqual(len(datos['dias']), 1)
+		paradas = datos['dias'][0]['paradas']
+		self.assertEqual([p['comuna'] for p in paradas], ['Las Condes', 'Ñuñoa', 'Maipú', None])
+		self.assertEqual([p['orden'] for p in paradas], [1, 2, 3, 4])
+		self.assertGreater(datos['dias'][0]['km_total'], 0)
+
+		self.assertEqual(self.client.get('/usuarios/api/tecnico/ruta/', {'desde': 'x'}).status_code, 400)
+
+
+class CotizacionLoteTestCase(TestCase):
+	def setUp(self):
+		for rol in Roles:
+			Group.objects.get_or_create(name=rol.value)
+		self.admin = User.objects.create_user(username='admin', password='x')
+		self.admin.groups.add(Group.objects.get(name=Roles.ADMINISTRADOR))
+		self.cliente = User.objects.create_user(username='cliente', password='x', email='cliente@test.com')
+		self.tecnico = User.objects.create_user(username='tecnico', password='x')
+		self.tecnico.groups.add(Group.objects.get(name=Roles.TECNICO))
+		self.plantilla = PlantillaInspeccion.objects.create(nombre='Extintores')
+
+	def _pendientes(self, n, **extra):
+		return [
+			SolicitudInspeccion.objects.create(
+				cliente=self.cliente, nombre_cliente='C', direccion='D', telefono='1', maquinaria='M', **extra
+			) for _ in range(n)
+		]
+
+	def test_consultas_constantes(self):
+		def contar(n):
+			ids = [s.pk for s in self._pendientes(n)]
+			with CaptureQueriesContext(connection) as capturadas:
+				resultado = cotizar_lote(ids, self.plantilla, 1000, tecnico=self.tecnico)
+			self.assertEqual(len(resultado.cotizadas), n)
+			return len(capturadas)
+		contar(1)  # crea la fila del resumen COTIZANDO de hoy
+		self.assertEqual(contar(3), contar(30))
+		self.assertEqual(Notificacion.objects.filter(usuario=self.cliente).count(), 34)
+		self.assertEqual(CorreoPendiente.objects.count(), 34)
+		self.assertEqual(
+			ResumenDiarioSolicitudes.objects.get(estado=EstadoSolicitud.COTIZANDO).total, 34
+		)
+		self.assertFalse(ResumenDiarioSolicitudes.objects.filter(estado=EstadoSolicitud.PENDIENTE).exclude(total=0).exists())
+
+	def test_vista_informa_fallas_sin_abortar(self):
+		con_tecnico = self._pendientes(2, tecnico_preasignado=self.tecnico)
+		sin_tecnico, = self._pendientes(1)
+		procesada, = self._pendientes(1)
+		procesada.estado = EstadoSolicitud.RECHAZADA
+		procesada.save()
+		ids = [s.pk for s in con_tecnico] + [sin_tecnico.pk, procesada.pk, 999999]
+
+		self.client.force_login(self.admin)
+		resp = self.client.post('/usuarios/solicitud/cotizar-lote/', {
+			'solicitudes': ids, 'plantilla': self.plantilla.pk, 'monto_cotizacion': '45000', 'tecnico': '',
+		}, follow=True)
+		textos = [str(m) for m in resp.context['messages']]
+		self.assertIn("Se enviaron 2 cotización(es) a los clientes.", textos)
+		self.assertEqual(len([t for t in textos if t.startswith('Solicitud #')]), 3)
+
+		for solicitud in con_tecnico:
+			solicitud.refresh_from_db()
+			self.assertEqual(solicitud.estado, EstadoSolicitud.COTIZANDO)
+			self.assertEqual(solicitud.monto_cotizacion, 45000)
+			self.assertEqual(solicitud.plantilla_preasignada, self.plantilla)
+		sin_tecnico.refresh_from_db()
+		self.assertEqual(sin_tecnico.estado, EstadoSolicitud.PENDIENTE)
+		self.assertEqual(
+			set(Notificacion.objects.values_list('enlace', flat=True)),
+			{f'/usuarios/solicitud/aceptar-cotizacion/{s.pk}/' for s in con_tecnico},
+		)
+
+		# El monto es obligatorio
+		resp = self.client.post('/usuarios/solicitud/cotizar-lote/', {'solicitudes': [sin_tecnico.pk], 'plantilla': self.plantilla.pk})
+		self.assertRedirects(resp, '/usuarios/dashboard/admin/', fetch_redirect_response=False)
+		sin_tecnico.refresh_from_db()
+		self.assertEqual(sin_tecnico.estado, EstadoSolicitud.PENDIENTE)
+
+
+class RegistroPlantillasTestCase(TestCase):
+	def setUp(self):
+		cache.clear()
+		limpiar_registro()
+		for rol in Roles:
+			Group.objects.get_or_create(name=rol.value)
+		self.plantilla = PlantillaInspeccion.objects.create(nombre='Extintores')
+		for orden, descripcion in ((2, 'Presión'), (1, 'Sello'), (3, 'Etiqueta')):
+			TareaPlantilla.objects.create(plantilla=self.plantilla, descripcion=descripcion, orden=orden)
+		self.plantilla.refresh_from_db()
+
+	def test_version_y_cache(self):
+		self.assertEqual(self.plantilla.version, 4)  # 1 + una por tarea
+		with self.assertNumQueries(1):
+			foto = tareas_plantilla(self.plantilla)
+		self.assertEqual([t.descripcion for t in foto.tareas], ['Sello', 'Presión', 'Etiqueta'])
+		with self.assertNumQueries(0):
+			self.assertIs(tareas_plantilla(self.plantilla), foto)
+
+		# Otro proceso (sin memoria local) lo toma del cache compartido
+		limpiar_registro()
+		with self.assertNumQueries(0):
+			self.assertEqual(tareas_plantilla(self.plantilla), foto)
+
+		# Editar la plantilla crea una versión nueva; la foto anterior no cambia
+		TareaPlantilla.objects.create(plantilla=self.plantilla, descripcion='Manguera', orden=4)
+		self.plantilla.refresh_from_db()
+		nueva = tareas_plantilla(self.plantilla)
+		self.assertEqual(nueva.version, foto.version + 1)
+		self.assertEqual(len(nueva.tareas), 4)
+		self.assertEqual(len(foto.tareas), 3)
+
+	def test_save_de_instancia_vieja_no_retrocede_la_version(self):
+		cargada = PlantillaInspeccion.objects.get(pk=self.plantilla.pk)
+		# Un inline del admin agrega una tarea (sube la versión en la BD)...
+		TareaPlantilla.objects.create(plantilla=self.plantilla, descripcion='Manguera', orden=4)
+		# ...y luego se guarda el padre, cargado antes del cambio
+		cargada.descripcion = 'Editada'
+		cargada.save()
+		self.plantilla.refresh_from_db()
+		self.assertEqual(self.plantilla.version, 5)
+		self.assertEqual(self.plantilla.descripcion, 'Editada')
+
+	def test_aceptar_cotizacion_clona_la_version(self):
+		cliente = User.objects.create_user(username='cliente', password='x')
+		cliente.groups.add(Group.objects.get(name=Roles.CLIENTE))
+		tecnico = User.objects.create_user(username='tecnico', password='x')
+		solicitud = SolicitudInspeccion.objects.create(
+			cliente=cliente, nombre_cliente='C', direccion='D', telefono='1', maquinaria='M',
+			estado=EstadoSolicitud.COTIZANDO, tecnico_preasignado=tecnico,
+			plantilla_preasignada=self.plantilla, nombre_inspeccion_preasignado='OT',
+		)
+		self.client.force_login(cliente)
+		self.client.post(f'/usuarios/solicitud/aceptar-cotizacion/{solicitud.pk}/', {'action': 'aceptar'})
+		inspeccion = Inspeccion.objects.get(solicitud=solicitud)
+		self.assertEqual(inspeccion.version_plantilla, self.plantilla.version)
+		self.assertEqual(
+			list(inspeccion.tareas.order_by('id').values_list('descripcion', flat=True)), ['Sello', 'Presión', 'Etiqueta']
+		)
+
+		# La OT en curso conserva su foto aunque la plantilla cambie
+		TareaPlantilla.objects.filter(plantilla=self.plantilla, descripcion='Sello').delete()
+		self.assertEqual(inspeccion.tareas.count(), 3)
+		self.assertIn('Sello', inspeccion.tareas.values_list('descripcion', flat=True))
+
+	def test_catalogo_se_invalida(self):
+		with self.assertNumQueries(1):
+			self.assertEqual([p.nombre for p in catalogo_plantillas()], ['Extintores'])
+		with self.assertNumQueries(0):
+			catalogo_plantillas()
+		with self.captureOnCommitCallbacks(execute=True):
+			PlantillaInspeccion.objects.create(nombre='Alarmas')
+		self.assertEqual([p.nombre for p in catalogo_plantillas()], ['Alarmas', 'Extintores'])
+
+
+class DatosSinteticosTestCase(TestCase):
+	HASTA = datetime.date(2025, 6, 30)
+
+	def setUp(self):
+		cache.clear()
+
+	def _sembrar(self, semilla=7):
+		call_command('seed_optifire', tamano='mini', semilla=semilla, hasta=self.HASTA, lote=100, stdout=io.StringIO())
+
+	def _huella(self):
+		return list(
+			SolicitudInspeccion.objects.order_by('fecha_solicitud', 'direccion')
+			.values_list('cliente__username', 'direccion', 'estado', 'monto_cotizacion', 'fecha_solicitud', 'inspeccion__estado')
+		)
+
+	def _limpiar(self):
+		Inspeccion.objects.all().delete()  # Inspeccion.tecnico es PROTECT
+		User.objects.filter(username__startswith='sintetico_').delete()
+		PlantillaInspeccion.objects.filter(nombre__startswith='[Sintética]').delete()
+
+	def test_volumen_roles_y_resumenes(self):
+		self._sembrar()
+		self.assertEqual(SolicitudInspeccion.objects.count(), 300)
+		self.assertEqual(Notificacion.objects.count(), 500)
+		self.assertEqual(User.objects.filter(groups__name=Roles.CLIENTE).count(), 20)
+		self.assertEqual(User.objects.filter(groups__name=Roles.TECNICO).count(), 3)
+		self.assertEqual(Perfil.objects.count(), User.objects.count())
+		self.assertEqual(set(SolicitudInspeccion.objects.values_list('estado', flat=True)), set(EstadoSolicitud.values))
+
+		# Cada OT tiene las tareas de su plantilla y las terminadas no quedan PENDIENTES
+		inspeccion = Inspeccion.objects.filter(estado=EstadoInspeccion.COMPLETADA).first()
+		self.assertEqual(inspeccion.tareas.count(), inspeccion.plantilla_base.tareas_base.count())
+		self.assertFalse(TareaInspeccion.objects.filter(
+			inspeccion__estado=EstadoInspeccion.COMPLETADA, estado=EstadoTarea.PENDIENTE
+		).exists())
+		self.assertFalse(SolicitudInspeccion.objects.filter(fecha_solicitud__date__gt=self.HASTA).exists())
+
+		# Las fechas no son todas "ahora" y los resúmenes cuadran con el historial
+		self.assertGreater(SolicitudInspeccion.objects.dates('fecha_solicitud', 'day').count(), 100)
+		self.assertEqual(sum(ResumenDiarioSolicitudes.objects.values_list('total', flat=True)), 300)
+		self.assertEqual(
+			sum(ResumenTecnicoEstado.objects.values_list('total', flat=True)), Inspeccion.objects.count()
+		)
+		self.assertTrue(self.client.login(username='sintetico_cliente0', password='optifire123'))
+
+	def test_misma_semilla_mismos_datos(self):
+		self._sembrar()
+		huella = self._huella()
+		with self.assertRaises(CommandError):
+			self._sembrar()  # no se siembra dos veces sobre la misma BD
+
+		self._limpiar()
+		self._sembrar()
+		self.assertEqual(self._huella(), huella)
+
+		self._limpiar()
+		self._sembrar(semilla=8)
+		self.assertNotEqual(self._huella(), huella)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), EVIDENCIA_EN_SEGUNDO_PLANO=False)
+class PruebaCargaTestCase(LiveServerTestCase):
+	def setUp(self):
+		cache.clear()
+		call_command('seed_optifire', tamano='mini', stdout=io.StringIO())
+
+	def test_percentiles(self):
+		valores = list(range(1, 101))
+		self.assertEqual([percentil(valores, p) for p in (50, 95, 99)], [50, 95, 99])
+		self.assertEqual(percentil([7], 99), 7)
+		self.assertIsNone(percentil([], 50))
+
+	def test_flujo_completo_contra_servidor(self):
+		errores = []
+		resumen = ejecutar(self.live_server_url, usuarios=1, iteraciones=1, errores=errores)
+		self.assertEqual(errores, [])
+		self.assertEqual(resumen['flujos'], 1)
+		for endpoint in ('solicitar_inspeccion POST', 'gestionar_solicitud POST', 'aceptar_cotizacion POST',
+						 'completar_inspeccion POST', 'descargar_acta'):
+			self.assertEqual(resumen['endpoints'][endpoint]['errores'], 0)
+			self.assertIn('p95_ms', resumen['endpoints'][endpoint])
+
+		# El flujo quedó registrado de punta a punta, con una foto por tarea
+		inspeccion = Inspeccion.objects.get(comentarios_generales__startswith='Carga ')
+		self.assertEqual(inspeccion.estado, EstadoInspeccion.COMPLETADA)
+		self.assertEqual(inspeccion.solicitud.estado, EstadoSolicitud.COMPLETADA)
+		self.assertFalse(inspeccion.tareas.filter(imagen_evidencia='').exists())
+
+
+class AjustesSqliteTestCase(TestCase):
+	def _conexion(self, directorio):
+		from django.db.backends.sqlite3.base import DatabaseWrapper
+		datos = dict(connection.settings_dict, NAME=f'{directorio}/prueba.sqlite3')
+		return DatabaseWrapper(datos, alias='prueba_sqlite')
+
+	def _pragma(self, conexion, nombre):
+		with conexion.cursor() as cursor:
+			cursor.execute(f'PRAGMA {nombre}')
+			return cursor.fetchone()[0]
+
+	def test_sin_ajustes_no_cambia_nada(self):
+		with tempfile.TemporaryDirectory() as directorio:
+			conexion = self._conexion(directorio)
+			try:
+				self.assertEqual(self._pragma(conexion, 'journal_mode'), 'delete')
+				self.assertIsNone(conexion.transaction_mode)
+			finally:
+				conexion.close()
+
+	@override_settings(SQLITE_AJUSTES=True, SQLITE_BUSY_TIMEOUT=3, SQLITE_CACHE_MB=8)
+	def test_pragmas_y_begin_immediate(self):
+		with tempfile.TemporaryDirectory() as directorio:
+			conexion = self._conexion(directorio)
+			try:
+				self.assertEqual(self._pragma(conexion, 'journal_mode'), 'wal')
+				self.assertEqual(self._pragma(conexion, 'synchronous'), 1)  # NORMAL
+				self.assertEqual(self._pragma(conexion, 'busy_timeout'), 3000)
+				self.assertEqual(self._pragma(conexion, 'cache_size'), -8 * 1024)
+				self.assertEqual(conexion.transaction_mode, 'IMMEDIATE')
+
+				sentencias = []
+				with conexion.execute_wrapper(lambda execute, sql, *args: sentencias.append(sql) or execute(sql, *args)):
+					# Lo mismo que hace atomic() al entrar
+					conexion.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+					conexion.rollback()
+					conexion.set_autocommit(True)
+				self.assertIn('BEGIN IMMEDIATE', sentencias)
+			finally:
+				conexion.close()
+
+	def test_benchmark_sin_bloqueos_con_ajustes(self):
+		with tempfile.TemporaryDirectory() as directorio:
+			resultado = medir_escrituras('ajustado', trabajadores=4, segundos=0.5, lectores=1, tareas=50, directorio=directorio)
+			self.assertGreater(resultado['escrituras'], 0)
+			self.assertEqual(resultado['errores'], 0)
+			self.assertIsNotNone(resultado['p95_ms'])
+			self.assertEqual(os.listdir(directorio), [])  # la BD temporal se borra
+
+
+@skipIf({BD_REPLICA, BD_NOTIFICACIONES} & set(connections.settings), "Alias ya configurados por entorno")
+class RuteoBasesDatosTestCase(TransactionTestCase):
+	"""Réplica y base de notificaciones como dos archivos SQLite reales."""
+
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		# Se agregan después de setUpClass: el runner solo crea bases de test para
+		# los alias de settings, y estos dos son archivos temporales propios.
+		# Al sumarlos a "databases", TransactionTestCase también los vacía entre tests.
+		cls.directorio = tempfile.mkdtemp()
+		nuevas = {
+			alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(cls.directorio, f'{alias}.sqlite3')}
+			for alias in (BD_REPLICA, BD_NOTIFICACIONES)
+		}
+		configuradas = connections.configure_settings({**connections.settings, **nuevas})
+		for alias in nuevas:
+			connections.settings[alias] = configuradas[alias]
+		cls.databases = cls.databases | set(nuevas)
+		call_command('migrate', database=BD_NOTIFICACIONES, verbosity=0)
+
+	@classmethod
+	def tearDownClass(cls):
+		for alias in (BD_REPLICA, BD_NOTIFICACIONES):
+			connections[alias].close()
+			del connections[alias]
+			del connections.settings[alias]
+		shutil.rmtree(cls.directorio, ignore_errors=True)
+		super().tearDownClass()
+
+	def setUp(self):
+		cache.clear()
+		for rol in Roles:
+			Group.objects.get_or_create(name=rol.value)
+		self.admin = User.objects.create_user(username='admin', password='x')
+		self.admin.groups.add(Group.objects.get(name=Roles.ADMINISTRADOR))
+		self.tecnico = User.objects.create_user(username='tecnico', password='x')
+		self.tecnico.groups.add(Group.objects.get(name=Roles.TECNICO))
+
+	def _solicitud(self, direccion):
+		return SolicitudInspeccion.objects.create(
+			cliente=self.admin, nombre_cliente='C', direccion=direccion, telefono='1', maquinaria='M',
+			estado=EstadoSolicitud.COMPLETADA,
+		)
+
+	def _replicar(self):
+		"""Hace las veces de la replicación: copia default (en memoria) al archivo de la réplica."""
+		connections['default'].ensure_connection()
+		destino = sqlite3.connect(connections.settings[BD_REPLICA]['NAME'])
+		try:
+			connections['default'].connection.backup(destino)
+		finally:
+			destino.close()
+		connections[BD_REPLICA].close()
+
+	def test_las_tablas_de_notificaciones_solo_se_migran_en_su_base(self):
+		tablas = connections[BD_NOTIFICACIONES].introspection.table_names()
+		self.assertIn(Notificacion._meta.db_table, tablas)
+		self.assertIn(NotificacionArchivada._meta.db_table, tablas)
+		self.assertNotIn(SolicitudInspeccion._meta.db_table, tablas)
+		self.assertNotIn('auth_user', tablas)
+
+	def test_vistas_de_reportes_leen_de_la_replica(self):
+		self._solicitud('Replicada 1')
+		self._replicar()
+		self._solicitud('Sin replicar 2')
+
+		self.client.force_login(self.admin)
+		with CaptureQueriesContext(connections[BD_REPLICA]) as replica:
+			respuesta = self.client.get(reverse('historial_solicitudes'))
+		self.assertContains(respuesta, 'Replicada 1')
+		self.assertNotContains(respuesta, 'Sin replicar 2')
+		self.assertTrue(replica.captured_queries)
+
+		# Fuera de esas vistas se lee de default
+		respuesta = self.client.get(reverse('admin_usuarios_list'))
+		self.assertEqual(respuesta.status_code, 200)
+		self.assertEqual(SolicitudInspeccion.objects.count(), 2)
+
+	def test_registro_y_estadisticas_usan_la_replica(self):
+		self._replicar()
+		self.client.force_login(self.tecnico)
+		for nombre in ('registro_trabajos', 'estadisticas'):
+			with CaptureQueriesContext(connections[BD_REPLICA]) as replica:
+				respuesta = self.client.get(reverse(nombre))
+			self.assertEqual(respuesta.status_code, 200)
+			self.assertTrue(replica.captured_queries, nombre)
+
+	def test_notificaciones_van_a_su_base(self):
+		notificar(self.tecnico, 'Hola')
+		self.assertEqual(Notificacion.objects.using(BD_NOTIFICACIONES).count(), 1)
+		self.assertFalse(Notificacion.objects.using('default').exists())
+
+		notificacion = Notificacion.objects.get()
+		self.assertEqual(notificacion.usuario, self.tecnico)  # el usuario se busca en default
+		Notificacion.objects.create(usuario=self.tecnico, mensaje='Otra')
+		self.assertEqual(Notificacion.objects.using(BD_NOTIFICACIONES).count(), 2)
+
+		self.client.force_login(self.tecnico)
+		respuesta = self.client.get(reverse('bandeja_notificaciones'))
+		self.assertContains(respuesta, 'Hola')
+		self.assertEqual(marcar_leidas(self.tecnico.pk), 2)
+
+		Notificacion.objects.update(fecha_creacion=timezone.now() - datetime.timedelta(days=60))
+		self.assertEqual(sum(compactar_leidas(30)), 2)
+		self.assertEqual(NotificacionArchivada.objects.using(BD_NOTIFICACIONES).count(), 2)
+
+	def test_notificacion_sigue_a_la_transaccion_de_default(self):
+		solicitud = self._solicitud('Calle 1')
+		with self.assertRaises(RuntimeError):
+			with transaction.atomic():
+				solicitud.estado = EstadoSolicitud.RECHAZADA
+				solicitud.save()
+				notificar(self.tecnico, 'Rechazada')
+				raise RuntimeError("falla después de notificar")
+		self.assertFalse(Notificacion.objects.using(BD_NOTIFICACIONES).exists())
+
+		with transaction.atomic():
+			creadas = notificar(self.tecnico, 'Confirmada')
+			self.assertFalse(Notificacion.objects.using(BD_NOTIFICACIONES).exists())
+		self.assertEqual(Notificacion.objects.using(BD_NOTIFICACIONES).get().pk, creadas[0].pk)
+
+	def test_borrar_usuario_borra_sus_notificaciones_en_la_otra_base(self):
+		notificar(self.tecnico, 'Hola')
+		NotificacionArchivada.objects.create(
+			usuario=self.tecnico, mensaje='Vieja', fecha_creacion=timezone.now(),
+		)
+		self.tecnico.delete()
+		self.assertFalse(Notificacion.objects.exists())
+		self.assertFalse(NotificacionArchivada.objects.exists())
+
+
+class SeguimientoCamposTestCase(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.cliente = User.objects.create_user(username='cliente', password='x', email='cliente@test.com')
+		self.tecnico = User.objects.create_user(username='tecnico', password='x')
+		self.solicitud = SolicitudInspeccion.objects.create(
+			cliente=self.cliente, nombre_cliente='C', direccion='D', telefono='1', maquinaria='M',
+		)
+		self.inspeccion = Inspeccion.objects.create(solicitud=self.solicitud, tecnico=self.tecnico, nombre_inspeccion='OT')
+		TareaInspeccion.objects.bulk_create([
+			TareaInspeccion(inspeccion=self.inspeccion, descripcion=f'T{i}') for i in range(40)
+		])
+
+	def test_checklist_de_40_tareas_sin_select_previo(self):
+		tareas = list(self.inspeccion.tareas.all())
+		for tarea in tareas:
+			tarea.estado = EstadoTarea.BUENO
+		with CaptureQueriesContext(connection) as consultas:
+			for tarea in tareas:
+				tarea.save()
+		# Solo los 40 UPDATE: ningún SELECT para conocer la foto anterior
+		self.assertEqual(len(consultas), 40)
+		self.assertFalse([q for q in consultas.captured_queries if q['sql'].startswith('SELECT')])
+
+	def test_anterior_y_cambio(self):
+		solicitud = SolicitudInspeccion.objects.get(pk=self.solicitud.pk)
+		self.assertEqual(solicitud.seguimiento.anterior('estado'), EstadoSolicitud.PENDIENTE)
+		self.assertFalse(solicitud.seguimiento.cambio('estado'))
+		solicitud.estado = EstadoSolicitud.RECHAZADA
+		self.assertTrue(solicitud.seguimiento.cambio('estado'))
+		self.assertEqual(solicitud.seguimiento.anterior('estado'), EstadoSolicitud.PENDIENTE)
+
+		# Después de guardar, la foto pasa a ser el nuevo estado: un solo correo
+		with self.captureOnCommitCallbacks(execute=True):
+			solicitud.save()
+			solicitud.save()
+		self.assertEqual(CorreoPendiente.objects.filter(asunto__contains='Rechazada').count(), 1)
+		self.assertEqual(solicitud.seguimiento.anterior('estado'), EstadoSolicitud.RECHAZADA)
+
+		nueva = SolicitudInspeccion(cliente=self.cliente)
+		self.assertIsNone(nueva.seguimiento.anterior('estado'))
+		self.assertTrue(nueva.seguimiento.cambio('estado'))
+
+	def test_campos_diferidos_y_refresh(self):
+		inspeccion = Inspeccion.objects.only('pk', 'nombre_inspeccion').get(pk=self.inspeccion.pk)
+		with self.assertNumQueries(1):  # el valor anterior se busca una sola vez
+			self.assertEqual(inspeccion.seguimiento.anterior('estado'), EstadoInspeccion.ASIGNADA)
+			self.assertEqual(inspeccion.seguimiento.anterior('tecnico'), self.tecnico.pk)
+
+		otra = Inspeccion.objects.get(pk=self.inspeccion.pk)
+		Inspeccion.objects.filter(pk=otra.pk).update(estado=EstadoInspeccion.EN_CURSO)
+		otra.refresh_from_db()
+		self.assertEqual(otra.seguimiento.anterior('estado'), EstadoInspeccion.EN_CURSO)
+		self.assertFalse(otra.seguimiento.cambio('estado'))
+
+	def test_foto_nueva_se_detecta_sin_consultar(self):
+		tarea = self.inspeccion.tareas.first()
+		self.assertIsNone(tarea.seguimiento.anterior('imagen_evidencia'))
+		tarea.imagen_evidencia.name = 'inspecciones/evidencias/foto.jpg'
+		self.assertTrue(tarea.seguimiento.cambio('imagen_evidencia'))
+		with self.captureOnCommitCallbacks():
+			tarea.save()
+		self.assertEqual(Notificacion.objects.filter(usuario=self.cliente).count(), 1)
+		self.assertFalse(tarea.seguimiento.cambio('imagen_evidencia'))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), EVIDENCIA_EN_SEGUNDO_PLANO=False)
+class ChecklistEnLoteTestCase(TestCase):
+	def setUp(self):
+		cache.clear()
+		for rol in Roles:
+			Group.objects.get_or_create(name=rol.value)
+		self.cliente = User.objects.create_user(username='cliente', password='x', email='cliente@test.com')
+		self.tecnico = User.objects.create_user(username='tecnico', password='x')
+		self.tecnico.groups.add(Group.objects.get(name=Roles.TECNICO))
+		self.solicitud = SolicitudInspeccion.objects.create(
+			cliente=self.cliente, nombre_cliente='C', direccion='D', telefono='1', maquinaria='M',
+			estado=EstadoSolicitud.APROBADA,
+		)
+		self.inspeccion = Inspeccion.objects.create(solicitud=self.solicitud, tecnico=self.tecnico, nombre_inspeccion='OT')
+		TareaInspeccion.objects.bulk_create([
+			TareaInspeccion(inspeccion=self.inspeccion, descripcion=f'T{i}') for i in range(40)
+		])
+		self.tareas = list(self.inspeccion.tareas.order_by('pk'))
+		self.client.force_login(self.tecnico)
+
+	def _foto(self, nombre):
+		buffer = io.BytesIO()
+		Image.new('RGB', (40, 30), (10, 120, 200)).save(buffer, 'JPEG')
+		return SimpleUploadedFile(nombre, buffer.getvalue(), content_type='image/jpeg')
+
+	def _datos(self, cambios=None, accion='guardar'):
+		datos = {
+			'tareas-TOTAL_FORMS': len(self.tareas), 'tareas-INITIAL_FORMS': len(self.tareas),
+			'tareas-MIN_NUM_FORMS': 0, 'tareas-MAX_NUM_FORMS': 1000,
+			'comentarios_generales': 'Todo en orden', 'action': accion,
+		}
+		for i, tarea in enumerate(self.tareas):
+			datos[f'tareas-{i}-id'] = tarea.pk
+			datos[f'tareas-{i}-estado'] = tarea.estado
+			datos[f'tareas-{i}-observacion'] = tarea.observacion or ''
+		datos.update(cambios or {})
+		return datos
+
+	def test_solo_las_tareas_cambiadas_en_un_update(self):
+		datos = self._datos({
+			'tareas-0-estado': EstadoTarea.BUENO, 'tareas-1-estado': EstadoTarea.MALO,
+			'tareas-2-observacion': 'Manómetro bajo',
+			'tareas-3-imagen_evidencia': self._foto('a.jpg'), 'tareas-4-imagen_evidencia': self._foto('b.jpg'),
+		})
+		url = reverse('completar_inspeccion', args=[self.inspeccion.pk])
+		with CaptureQueriesContext(connection) as consultas, self.captureOnCommitCallbacks(execute=True):
+			respuesta = self.client.post(url, datos)
+		self.assertRedirects(respuesta, reverse('dashboard_tecnico'), fetch_redirect_response=False)
+
+		tabla = TareaInspeccion._meta.db_table
+		updates = [q['sql'] for q in consultas.captured_queries if q['sql'].startswith(f'UPDATE "{tabla}"')]
+		# bulk_update + el UPDATE del procesamiento de cada foto (imagenes.py)
+		self.assertEqual(len(updates), 1 + 2)
+		inserts = [q['sql'] for q in consultas.captured_queries if q['sql'].startswith(f'INSERT INTO "{Notificacion._meta.db_table}"')]
+		self.assertEqual(len(inserts), 1)
+
+		estados = dict(TareaInspeccion.objects.values_list('pk', 'estado'))
+		self.assertEqual(estados[self.tareas[0].pk], EstadoTarea.BUENO)
+		self.assertEqual(estados[self.tareas[1].pk], EstadoTarea.MALO)
+		self.assertEqual(TareaInspeccion.objects.get(pk=self.tareas[2].pk).observacion, 'Manómetro bajo')
+		con_foto = TareaInspeccion.objects.exclude(imagen_evidencia='').exclude(imagen_evidencia=None)
+		self.assertEqual(sorted(con_foto.values_list('pk', flat=True)), [self.tareas[3].pk, self.tareas[4].pk])
+		for tarea in con_foto:
+			self.assertTrue(tarea.miniatura_evidencia)
+		self.assertEqual(Notificacion.objects.filter(usuario=self.cliente).count(), 2)
+
+		self.inspeccion.refresh_from_db()
+		self.assertEqual(self.inspeccion.estado, EstadoInspeccion.EN_CURSO)
+		self.assertEqual(self.inspeccion.comentarios_generales, 'Todo en orden')
+
+	def test_sin_cambios_no_escribe_tareas(self):
+		url = reverse('completar_inspeccion', args=[self.inspeccion.pk])
+		with CaptureQueriesContext(connection) as consultas:
+			self.client.post(url, self._datos())
+		tabla = TareaInspeccion._meta.db_table
+		self.assertFalse([q for q in consultas.captured_queries if q['sql'].startswith(f'UPDATE "{tabla}"')])
+
+	def test_terminar_completa_inspeccion_y_solicitud(self):
+		url = reverse('completar_inspeccion', args=[self.inspeccion.pk])
+		with self.captureOnCommitCallbacks(execute=True):
+			respuesta = self.client.post(url, self._datos({'tareas-0-estado': EstadoTarea.BUENO}, accion='terminar'))
+		self.assertRedirects(respuesta, reverse('dashboard_tecnico'), fetch_redirect_response=False)
+		self.inspeccion.refresh_from_db()
+		self.solicitud.refresh_from_db()
+		self.assertEqual(self.inspeccion.estado, EstadoInspeccion.COMPLETADA)
+		self.assertIsNotNone(self.inspeccion.fecha_finalizacion)
+		self.assertEqual(self.solicitud.estado, EstadoSolicitud.COMPLETADA)
+		self.assertEqual(TareaInspeccion.objects.get(pk=self.tareas[0].pk).estado, EstadoTarea.BUENO)
+		self.assertTrue(CorreoPendiente.objects.filter(asunto__contains='Finalizada').exists())
+
+	def test_si_la_transaccion_falla_se_borran_las_fotos(self):
+		TareaFormSet = inlineformset_factory(
+			Inspeccion, TareaInspeccion, fields=('estado', 'observacion', 'imagen_evidencia'), extra=0, can_delete=False,
+		)
+		datos = self._datos({'tareas-0-estado': EstadoTarea.BUENO})
+		archivos = {'tareas-1-imagen_evidencia': self._foto('c.jpg'), 'tareas-2-imagen_evidencia': self._foto('d.jpg')}
+		formset = TareaFormSet(datos, archivos, instance=self.inspeccion)
+		self.assertTrue(formset.is_valid())
+
+		with self.assertRaises(ValueError):
+			with guardar_checklist(formset) as tareas:
+				nombres = [t.imagen_evidencia.name for t in tareas if t.imagen_evidencia]
+				self.assertEqual(len(nombres), 2)
+				raise ValueError('falla')
+		storage = TareaInspeccion._meta.get_field('imagen_evidencia').storage
+		self.assertFalse([n for n in nombres if storage.exists(n)])
+		self.assertEqual(TareaInspeccion.objects.get(pk=self.tareas[0].pk).estado, EstadoTarea.PENDIENTE)
+		self.assertFalse(Notificacion.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), EVIDENCIA_EN_SEGUNDO_PLANO=False)
+class AutoguardadoChecklistTestCase(TestCase):
+	def setUp(self):
+		cache.clear()
+		for rol in Roles:
+			Group.objects.get_or_create(name=rol.value)
+		self.cliente = User.objects.create_user(username='cliente', password='x')
+		self.tecnico = User.objects.create_user(username='tecnico', password='x')
+		self.tecnico.groups.add(Group.objects.get(name=Roles.TECNICO))
+		solicitud = SolicitudInspeccion.objects.create(
+			cliente=self.cliente, nombre_cliente='C', direccion='D', telefono='1', maquinaria='M',
+		)
+		self.inspeccion = Inspeccion.objects.create(solicitud=solicitud, tecnico=self.tecnico, nombre_inspeccion='OT')
+		self.tarea = TareaInspeccion.objects.create(inspeccion=self.inspeccion, descripcion='Extintor', observacion='Inicial')
+		self.client.force_login(self.tecnico)
+
+	def _patch(self, cambios, tarea=None):
+		url = reverse('api_tarea_inspeccion', args=[(tarea or self.tarea).pk])
+		return self.client.patch(url, json.dumps(cambios), content_type='application/json')
+
+	def _foto(self):
+		buffer = io.BytesIO()
+		Image.new('RGB', (40, 30), (10, 120, 200)).save(buffer, 'JPEG')
+		return SimpleUploadedFile('foto.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+	def test_patch_escribe_solo_lo_enviado(self):
+		tabla = TareaInspeccion._meta.db_table
+		with CaptureQueriesContext(connection) as consultas:
+			respuesta = self._patch({'estado': EstadoTarea.MALO})
+		self.assertEqual(respuesta.status_code, 200)
+		self.assertEqual(respuesta.json()['guardados'], ['estado'])
+		updates = [q['sql'] for q in consultas.captured_queries if q['sql'].startswith(f'UPDATE "{tabla}"')]
+		self.assertEqual(len(updates), 1)
+		self.assertNotIn('observacion', updates[0])
+
+		self.tarea.refresh_from_db()
+		self.assertEqual(self.tarea.estado, EstadoTarea.MALO)
+		self.assertEqual(self.tarea.observacion, 'Inicial')
+		self.inspeccion.refresh_from_db()
+		self.assertEqual(self.inspeccion.estado, EstadoInspeccion.EN_CURSO)
+
+		# Repetir el mismo valor no escribe nada
+		with CaptureQueriesContext(connection) as consultas:
+			self.assertEqual(self._patch({'estado': EstadoTarea.MALO}).json()['guardados'], [])
+		self.assertFalse([q for q in consultas.captured_queries if q['sql'].startswith('UPDATE')])
+
+	def test_patch_valida(self):
+		self.assertEqual(self._patch({'estado': 'ROTO'}).status_code, 400)
+		self.assertEqual(self._patch({'descripcion': 'Otra'}).status_code, 400)
+		self.assertEqual(self._patch({}).status_code, 400)
+		url = reverse('api_tarea_inspeccion', args=[self.tarea.pk])
+		self.assertEqual(self.client.patch(url, 'no es json', content_type='application/json').status_code, 400)
+		self.assertEqual(self.client.post(url).status_code, 405)
+
+	def test_solo_tareas_propias_y_abiertas(self):
+		otro = User.objects.create_user(username='otro', password='x')
+		otro.groups.add(Group.objects.get(name=Roles.TECNICO))
+		ajena = TareaInspeccion.objects.create(
+			inspeccion=Inspeccion.objects.create(tecnico=otro, nombre_inspeccion='Ajena'), descripcion='X',
+		)
+		self.assertEqual(self._patch({'observacion': 'x'}, tarea=ajena).status_code, 404)
+
+		self.inspeccion.estado = EstadoInspeccion.COMPLETADA
+		self.inspeccion.save()
+		self.assertEqual(self._patch({'observacion': 'x'}).status_code, 409)
+
+	def test_subir_una_foto(self):
+		url = reverse('api_evidencia_tarea', args=[self.tarea.pk])
+		with self.captureOnCommitCallbacks(execute=True):
+			respuesta = self.client.post(url, {'imagen_evidencia': self._foto()})
+		self.assertEqual(respuesta.status_code, 200)
+		self.tarea.refresh_from_db()
+		self.assertTrue(self.tarea.imagen_evidencia)
+		self.assertTrue(self.tarea.miniatura_evidencia)
+		self.assertEqual(self.tarea.observacion, 'Inicial')
+		self.assertEqual(Notificacion.objects.filter(usuario=self.cliente).count(), 1)
+
+		self.assertEqual(self.client.post(url, {}).status_code, 400)
+		texto = SimpleUploadedFile('foto.jpg', b'no es una imagen', content_type='image/jpeg')
+		self.assertEqual(self.client.post(url, {'imagen_evidencia': texto}).status_code, 400)
+
+	def test_plantilla_trae_el_autoguardado(self):
+		respuesta = self.client.get(reverse('completar_inspeccion', args=[self.inspeccion.pk]))
+		self.assertContains(respuesta, f'data-tarea="{self.tarea.pk}"')
+		self.assertContains(respuesta, 'checklist_autoguardado.js')
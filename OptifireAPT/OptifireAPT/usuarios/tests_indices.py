@@ -0,0 +1,140 @@
+import datetime
+import re
+from unittest import skipUnless
+
+from django.contrib.auth.models import User, Group
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import (
+	SolicitudInspeccion, Roles, EstadoSolicitud, Inspeccion, EstadoInspeccion, Notificacion,
+)
+
+# Tablas que crecen con el uso: ninguna consulta de las vistas calientes puede recorrerlas completas
+TABLAS_CALIENTES = {
+	'auth_user',
+	'usuarios_solicitudinspeccion',
+	'usuarios_inspeccion',
+	'usuarios_notificacion',
+	'usuarios_tareainspeccion',
+}
+
+# "SCAN tabla" sin "USING ... INDEX" = lectura de la tabla completa
+ESCANEO_COMPLETO = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN es específico de SQLite")
+class PlanesConsultaTestCase(TestCase):
+	"""
+	Ejecuta las vistas más usadas sobre un volumen de datos representativo y
+	revisa con ``EXPLAIN QUERY PLAN`` que todas sus consultas usen índices.
+	"""
+
+	@classmethod
+	def setUpTestData(cls):
+		for rol in Roles:
+			Group.objects.get_or_create(name=rol.value)
+		cls.admin = User.objects.create_user(username='admin', password='clave-admin', email='admin@test.com')
+		cls.admin.groups.add(Group.objects.get(name=Roles.ADMINISTRADOR))
+		cls.tecnico = User.objects.create_user(username='tecnico', password='x', email='tecnico@test.com')
+		cls.tecnico.groups.add(Group.objects.get(name=Roles.TECNICO))
+		cls.cliente = User.objects.create_user(username='cliente', password='x', email='cliente@test.com')
+		cls.cliente.groups.add(Group.objects.get(name=Roles.CLIENTE))
+
+		clientes = User.objects.bulk_create([
+			User(username=f'cliente{i}', email=f'cliente{i}@test.com') for i in range(300)
+		]) + [cls.cliente]
+		Group.objects.get(name=Roles.CLIENTE).user_set.add(*clientes)
+
+		estados = list(EstadoSolicitud.values)
+		solicitudes = SolicitudInspeccion.objects.bulk_create([
+			SolicitudInspeccion(
+				cliente=clientes[i % len(clientes)], nombre_cliente=f'Cliente {i}', direccion='Calle 1, Santiago',
+				telefono='1', maquinaria='M', estado=estados[i % len(estados)],
+			) for i in range(2000)
+		])
+		hoy = timezone.localdate()
+		Inspeccion.objects.bulk_create([
+			Inspeccion(
+				solicitud=s, tecnico=cls.tecnico if i % 4 == 0 else cls.admin, nombre_inspeccion=f'OT {i}',
+				fecha_programada=hoy + datetime.timedelta(days=i % 30),
+				estado=EstadoInspeccion.values[i % len(EstadoInspeccion.values)],
+			) for i, s in enumerate(solicitudes[:1200])
+		])
+		Notificacion.objects.bulk_create([
+			Notificacion(usuario=clientes[i % len(clientes)] if i % 3 else cls.admin, mensaje=f'Aviso {i}', leido=i % 5 == 0)
+			for i in range(3000)
+		])
+
+		# Estadísticas para el planificador, como en una BD en uso
+		with connection.cursor() as cursor:
+			cursor.execute('ANALYZE')
+
+	def _consultas(self, accion):
+		"""Ejecuta ``accion`` y retorna los SELECT que hizo, con sus parámetros."""
+		capturadas = []
+
+		def capturar(execute, sql, params, many, context):
+			if sql.lstrip().upper().startswith('SELECT'):
+				capturadas.append((sql, params))
+			return execute(sql, params, many, context)
+
+		with connection.execute_wrapper(capturar):
+			accion()
+		return capturadas
+
+	def assertUsaIndices(self, accion, paginas_ordenadas=False):
+		"""
+		Falla si alguna consulta recorre completa una tabla caliente. Con
+		``paginas_ordenadas`` además exige que las páginas (consultas con LIMIT
+		sobre esas tablas) salgan del índice ya ordenadas, sin ordenar en memoria.
+		"""
+		consultas = self._consultas(accion)
+		self.assertTrue(consultas)
+		problemas = []
+		with connection.cursor() as cursor:
+			for sql, params in consultas:
+				cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+				detalles = [fila[-1] for fila in cursor.fetchall()]
+				tabla = re.search(r'FROM "(\w+)"', sql)
+				paginada = ' LIMIT ' in sql and tabla and tabla.group(1) in TABLAS_CALIENTES
+				for detalle in detalles:
+					encontrado = ESCANEO_COMPLETO.match(detalle)
+					if encontrado and encontrado.group(1) in TABLAS_CALIENTES:
+						problemas.append(f'{detalle}\n    {sql}')
+					elif paginas_ordenadas and paginada and detalle == 'USE TEMP B-TREE FOR ORDER BY':
+						problemas.append(f'{detalle}\n    {sql}')
+		self.assertEqual(problemas, [], "Consultas sin índice adecuado:\n" + '\n'.join(problemas))
+
+	def _get(self, usuario, url, datos=None):
+		self.client.force_login(usuario)
+		return lambda: self.assertEqual(self.client.get(url, datos).status_code, 200)
+
+	def test_login_por_email(self):
+		self.assertUsaIndices(
+			lambda: self.client.post('/usuarios/login/', {'email': 'admin@test.com', 'password': 'clave-admin'})
+		)
+
+	def test_dashboard_administrador(self):
+		self.assertUsaIndices(self._get(self.admin, '/usuarios/dashboard/admin/'), paginas_ordenadas=True)
+		hoy = timezone.localdate()
+		self.assertUsaIndices(self._get(self.admin, '/usuarios/dashboard/admin/', {
+			'desde': (hoy - datetime.timedelta(days=7)).isoformat(), 'hasta': hoy.isoformat(),
+		}))
+
+	def test_historial_solicitudes(self):
+		self.assertUsaIndices(self._get(self.admin, '/usuarios/historial/'), paginas_ordenadas=True)
+		self.assertUsaIndices(self._get(self.admin, '/usuarios/historial/', {'estado': EstadoSolicitud.RECHAZADA}), paginas_ordenadas=True)
+
+	def test_dashboard_cliente(self):
+		self.assertUsaIndices(self._get(self.cliente, '/usuarios/dashboard/cliente/'), paginas_ordenadas=True)
+		self.assertUsaIndices(self._get(self.cliente, '/usuarios/dashboard/cliente/', {'estado': EstadoSolicitud.COTIZANDO}))
+
+	def test_vistas_tecnico(self):
+		self.assertUsaIndices(self._get(self.tecnico, '/usuarios/dashboard/tecnico/'))
+		self.assertUsaIndices(self._get(self.tecnico, '/usuarios/dashboard/tecnico/registro/'))
+
+	def test_bandeja_notificaciones(self):
+		self.assertUsaIndices(self._get(self.admin, '/usuarios/notificaciones/'), paginas_ordenadas=True)
+		self.assertUsaIndices(self._get(self.admin, '/usuarios/notificaciones/', {'solo_no_leidas': 1}), paginas_ordenadas=True)
@@ -0,0 +1,265 @@
+import datetime
+import io
+import json
+import os
+import tempfile
+import time
+from collections import namedtuple
+
+from django.contrib.auth.models import User, Group
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from PIL import Image
+
+from . import urls
+from .models import (
+	SolicitudInspeccion, Roles, EstadoSolicitud, PlantillaInspeccion, TareaPlantilla,
+	Inspeccion, TareaInspeccion, EstadoTarea, EstadoInspeccion, Notificacion,
+)
+
+# Reporte de latencias (se sobreescribe en cada corrida)
+REPORTE = os.environ.get('OPTIFIRE_REPORTE_RENDIMIENTO', os.path.join(tempfile.gettempdir(), 'optifire_rendimiento.json'))
+
+# Conexiones largas (SSE / long-poll): se prueban en TiempoRealTestCase
+RUTAS_EXCLUIDAS = {'stream_notificaciones', 'esperar_notificaciones'}
+
+# ``kwargs``, ``datos`` y ``preparar`` son funciones que reciben el TestCase (se evalúan antes de medir)
+Caso = namedtuple(
+	'Caso', 'nombre rol presupuesto estado metodo kwargs datos preparar', defaults=(200, 'get', None, None, None)
+)
+
+CASOS = [
+	# Públicas
+	Caso('home', None, 0),
+	Caso('nosotros', None, 0),
+	Caso('login', None, 0),
+	Caso('password_reset', None, 0),
+	Caso('password_reset_done', None, 0),
+	Caso('password_reset_confirm', None, 5, 302, kwargs=lambda t: {
+		'uidb64': urlsafe_base64_encode(force_bytes(t.cliente.pk)),
+		'token': default_token_generator.make_token(t.cliente),
+	}),
+	Caso('password_reset_complete', None, 0),
+	Caso('logout', 'cliente', 4, 302),
+
+	# Comunes
+	Caso('dashboard', 'admin', 3, 302),
+	Caso('estadisticas', 'admin', 8),
+	Caso('estadisticas', 'tecnico', 6),
+	Caso('estadisticas', 'cliente', 6),
+	Caso('editar_perfil', 'cliente', 9),
+	Caso('cambiar_password_forzado', 'cliente', 2),
+	Caso('bandeja_notificaciones', 'cliente', 4),
+	Caso('marcar_notificacion_leida', 'cliente', 3, kwargs=lambda t: {'pk': t._notificacion().pk}),
+	Caso('marcar_notificaciones_leidas', 'cliente', 3, metodo='post', datos=lambda t: {'todas': '1'}),
+	Caso('descargar_acta', 'cliente', 4, kwargs=lambda t: {'pk': t.inspeccion_completa.pk}),
+
+	# Cliente
+	Caso('dashboard_cliente', 'cliente', 6),
+	Caso('solicitar_inspeccion', 'cliente', 4),
+	Caso('detalle_orden', 'cliente', 8, kwargs=lambda t: {'pk': t.solicitud_completa.pk}),
+	Caso('aceptar_cotizacion_cliente', 'cliente', 5, kwargs=lambda t: {'pk': t.solicitud_cotizando.pk}),
+	Caso('anular_solicitud', 'cliente', 7, 302, kwargs=lambda t: {'pk': t._solicitud().pk}),
+
+	# Técnico
+	Caso('dashboard_tecnico', 'tecnico', 7),
+	Caso('registro_trabajos', 'tecnico', 8),
+	Caso('completar_inspeccion', 'tecnico', 9, kwargs=lambda t: {'pk': t.inspeccion_asignada.pk}),
+	Caso('api_tarea_inspeccion', 'tecnico', 10, metodo='patch', kwargs=lambda t: {'pk': t._tarea_abierta().pk},
+		datos=lambda t: {'estado': EstadoTarea.MALO}),
+	Caso('api_evidencia_tarea', 'tecnico', 12, metodo='post', kwargs=lambda t: {'pk': t._tarea_abierta().pk},
+		datos=lambda t: {'imagen_evidencia': t._foto()}),
+	Caso('perfil_tecnico', 'tecnico', 6),
+	Caso('api_ruta_tecnico', 'tecnico', 5),
+
+	# Administrador
+	Caso('dashboard_administrador', 'admin', 9),
+	Caso('historial_solicitudes', 'admin', 8),
+	Caso('admin_usuarios_list', 'admin', 8),
+	Caso('admin_usuario_crear', 'admin', 5),
+	Caso('admin_usuario_editar', 'admin', 7, kwargs=lambda t: {'pk': t.cliente.pk}),
+	Caso('admin_usuario_eliminar', 'admin', 6, kwargs=lambda t: {'pk': t.cliente.pk}),
+	Caso('gestionar_solicitud', 'admin', 11, kwargs=lambda t: {'pk': t.solicitud_pendiente.pk}),
+	Caso('enviar_orden_facturacion', 'admin', 9, 302, kwargs=lambda t: {'pk': t.solicitud_completa.pk}),
+	Caso('auto_asignar_tecnicos', 'admin', 10, 302, metodo='post', preparar=lambda t: [t._solicitud() for _ in range(2)]),
+	Caso('cotizar_solicitudes_lote', 'admin', 13, 302, metodo='post', datos=lambda t: {
+		'solicitudes': [t._solicitud().pk, t._solicitud().pk],
+		'tecnico': t.tecnico.pk, 'plantilla': t.plantilla.pk, 'monto_cotizacion': '50000',
+	}),
+	Caso('api_disponibilidad', 'admin', 4, kwargs=lambda t: {'tecnico_id': t.tecnico.pk}),
+	Caso('api_disponibilidad_tecnicos', 'admin', 4, datos=lambda t: {'tecnicos': f'{t.tecnico.pk},{t.admin.pk}'}),
+]
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class PresupuestoConsultasTestCase(TestCase):
+	"""
+	Recorre TODAS las rutas de ``usuarios/urls.py`` con el rol que les
+	corresponde, con pocos datos y luego con varias veces más, y exige que:
+
+	* la cantidad de consultas no supere el presupuesto de la vista, y
+	* no crezca con el volumen de datos (un N+1 haría fallar la prueba).
+
+	La latencia de cada vista se guarda en ``OPTIFIRE_REPORTE_RENDIMIENTO``
+	(JSON) para compararla entre versiones.
+	"""
+
+	resultados = []
+
+	@classmethod
+	def tearDownClass(cls):
+		super().tearDownClass()
+		with open(REPORTE, 'w', encoding='utf-8') as archivo:
+			json.dump({
+				'generado': timezone.now().isoformat(),
+				'vistas': cls.resultados,
+			}, archivo, indent=2, ensure_ascii=False)
+
+	def setUp(self):
+		cache.clear()
+		for rol in Roles:
+			Group.objects.get_or_create(name=rol.value)
+		self.admin = self._usuario('admin', Roles.ADMINISTRADOR)
+		self.tecnico = self._usuario('tecnico', Roles.TECNICO)
+		self.cliente = self._usuario('cliente', Roles.CLIENTE)
+
+		self.plantilla = self._plantilla('Base')
+		self.solicitud_pendiente = self._solicitud()
+		self.solicitud_cotizando = self._solicitud(
+			estado=EstadoSolicitud.COTIZANDO, monto_cotizacion=10000, tecnico_preasignado=self.tecnico,
+			plantilla_preasignada=self.plantilla, nombre_inspeccion_preasignado='OT',
+		)
+		self.solicitud_completa = self._solicitud(monto_cotizacion=20000)
+		self.inspeccion_completa = self._inspeccion(self.solicitud_completa, EstadoInspeccion.COMPLETADA)
+		self.inspeccion_asignada = self._inspeccion(self._solicitud(), EstadoInspeccion.ASIGNADA)
+
+	# --------------------------------------------------
+	# Datos
+	# --------------------------------------------------
+
+	def _usuario(self, nombre, rol):
+		usuario = User.objects.create_user(username=nombre, password='x', email=f'{nombre}@test.com')
+		usuario.groups.add(Group.objects.get(name=rol))
+		usuario.perfil.obligar_cambio_contrasena = False
+		usuario.perfil.save()
+		return usuario
+
+	def _plantilla(self, nombre):
+		plantilla = PlantillaInspeccion.objects.create(nombre=nombre)
+		for orden in range(1, 4):
+			TareaPlantilla.objects.create(plantilla=plantilla, descripcion=f'Tarea {orden}', orden=orden)
+		return plantilla
+
+	def _solicitud(self, cliente=None, **extra):
+		return SolicitudInspeccion.objects.create(
+			cliente=cliente or self.cliente, nombre_cliente='Cliente', direccion='Av. Central 100, Las Condes',
+			telefono='1', maquinaria='Extintores', **extra
+		)
+
+	def _inspeccion(self, solicitud, estado, fecha=None):
+		inspeccion = Inspeccion.objects.create(
+			solicitud=solicitud, tecnico=self.tecnico, nombre_inspeccion=f'OT {solicitud.pk}', estado=estado,
+			plantilla_base=self.plantilla, fecha_programada=fecha or timezone.localdate(),
+			fecha_finalizacion=timezone.now() if estado == EstadoInspeccion.COMPLETADA else None,
+		)
+		TareaInspeccion.objects.bulk_create([
+			TareaInspeccion(inspeccion=inspeccion, descripcion=f'Tarea {i}', estado=EstadoTarea.BUENO)
+			for i in range(3)
+		])
+		return inspeccion
+
+	def _tarea_abierta(self):
+		"""Tarea de una OT recién asignada (el autoguardado la pasa a EN_CURSO)."""
+		return self._inspeccion(self._solicitud(), EstadoInspeccion.ASIGNADA).tareas.first()
+
+	def _foto(self):
+		buffer = io.BytesIO()
+		Image.new('RGB', (40, 30), (10, 120, 200)).save(buffer, 'JPEG')
+		return SimpleUploadedFile('foto.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+	def _notificacion(self):
+		return Notificacion.objects.create(usuario=self.cliente, mensaje='Aviso')
+
+	def _sembrar(self, cantidad):
+		"""Agrega ``cantidad`` elementos de cada tipo (usuarios, solicitudes, OTs, avisos...)."""
+		inicio = User.objects.count()
+		for i in range(cantidad):
+			self._usuario(f'tecnico_extra{inicio + i}', Roles.TECNICO)
+			otro_cliente = self._usuario(f'cliente_extra{inicio + i}', Roles.CLIENTE)
+			self._plantilla(f'Plantilla {inicio + i}')
+			self._solicitud(cliente=otro_cliente)
+			for estado in (EstadoSolicitud.PENDIENTE, EstadoSolicitud.RECHAZADA):
+				self._solicitud(estado=estado)
+			self._inspeccion(self._solicitud(estado=EstadoSolicitud.APROBADA), EstadoInspeccion.COMPLETADA)
+			self._inspeccion(
+				self._solicitud(estado=EstadoSolicitud.APROBADA), EstadoInspeccion.ASIGNADA,
+				fecha=timezone.localdate() + datetime.timedelta(days=i % 3),
+			)
+			for usuario in (self.admin, self.tecnico, self.cliente):
+				Notificacion.objects.create(usuario=usuario, mensaje=f'Aviso {i}')
+
+	# --------------------------------------------------
+	# Medición
+	# --------------------------------------------------
+
+	def _medir(self, caso):
+		if caso.preparar:
+			caso.preparar(self)
+		kwargs = caso.kwargs(self) if caso.kwargs else {}
+		datos = caso.datos(self) if caso.datos else None
+		url = reverse(caso.nombre, kwargs=kwargs)
+		if caso.rol:
+			self.client.force_login(getattr(self, caso.rol))
+		else:
+			self.client.logout()
+		# Siempre en frío: el presupuesto no depende de lo que otra vista dejó en cache
+		cache.clear()
+
+		with CaptureQueriesContext(connection) as consultas:
+			inicio = time.perf_counter()
+			# PATCH: el cliente de test solo codifica el dict si el cuerpo es JSON
+			opciones = {'content_type': 'application/json'} if caso.metodo == 'patch' else {}
+			respuesta = getattr(self.client, caso.metodo)(url, datos, **opciones)
+			milisegundos = (time.perf_counter() - inicio) * 1000
+		respuesta.close()
+		self.assertEqual(respuesta.status_code, caso.estado, f'{caso.nombre} ({caso.rol})')
+		return len(consultas), round(milisegundos, 2), [c['sql'] for c in consultas]
+
+	def test_todas_las_rutas_tienen_caso(self):
+		nombres = {patron.name for patron in urls.urlpatterns if patron.name}
+		cubiertas = {caso.nombre for caso in CASOS} | RUTAS_EXCLUIDAS
+		self.assertEqual(nombres - cubiertas, set(), "Rutas sin presupuesto de consultas")
+
+	def test_presupuesto_no_crece_con_los_datos(self):
+		self._sembrar(2)
+		# Primera pasada descartada: crea filas que solo se insertan una vez (p.ej. resúmenes del día)
+		for caso in CASOS:
+			self._medir(caso)
+		chico = {caso: self._medir(caso) for caso in CASOS}
+		self._sembrar(10)
+		grande = {caso: self._medir(caso) for caso in CASOS}
+
+		for caso in CASOS:
+			(consultas_chico, ms_chico, _), (consultas_grande, ms_grande, sql) = chico[caso], grande[caso]
+			type(self).resultados.append({
+				'ruta': caso.nombre, 'rol': caso.rol, 'presupuesto': caso.presupuesto,
+				'consultas': {'chico': consultas_chico, 'grande': consultas_grande},
+				'ms': {'chico': ms_chico, 'grande': ms_grande},
+			})
+			with self.subTest(ruta=caso.nombre, rol=caso.rol):
+				self.assertEqual(
+					consultas_grande, consultas_chico,
+					f"{caso.nombre}: las consultas crecen con los datos ({consultas_chico} -> {consultas_grande})\n" + '\n'.join(sql)
+				)
+				self.assertLessEqual(
+					consultas_grande, caso.presupuesto,
+					f"{caso.nombre}: {consultas_grande} consultas, presupuesto {caso.presupuesto}\n" + '\n'.join(sql)
+				)
@@ -0,0 +1,201 @@
+"""
+Pub/sub de notificaciones en tiempo real.
+
+Cuando se crea una ``Notificacion`` (después del commit) se publica un evento
+en el canal del usuario destinatario. Las vistas ``stream_notificaciones``
+(Server-Sent Events) y ``esperar_notificaciones`` (long-poll) se suscriben a
+ese canal y entregan el evento al navegador sin recargar la página.
+
+El backend se elige con ``TIEMPO_REAL_BACKEND``:
+
+* ``usuarios.tiempo_real.BackendMemoria`` (por defecto): en el mismo
+  proceso. Sirve para runserver o un único worker ASGI.
+* ``usuarios.tiempo_real.BackendRedis``: canales PUB/SUB de Redis, para que
+  varios workers/servidores compartan los eventos. Requiere el paquete
+  ``redis`` y ``TIEMPO_REAL_REDIS_URL``.
+
+Los eventos no son persistentes: quien se reconecta recupera lo perdido desde
+la BD usando el id del último evento recibido.
+
+SSE y long-poll solo se usan bajo ASGI. Bajo WSGI cada conexión abierta
+retiene un hilo del servidor, así que ahí el navegador consulta cada
+``TIEMPO_REAL_INTERVALO_WSGI`` segundos y la vista responde de inmediato.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Eventos en espera por suscripción; si el cliente no da abasto se descartan
+# (al reconectarse los recupera desde la BD).
+TAMANO_COLA = 100
+
+
+def admite_conexiones_largas(request):
+    """True bajo ASGI: una conexión en espera no ocupa un hilo del servidor."""
+    return isinstance(request, ASGIRequest)
+
+
+def evento_notificacion(notificacion):
+    return {
+        'id': notificacion.pk,
+        'mensaje': notificacion.mensaje,
+        'enlace': notificacion.enlace,
+        'fecha': notificacion.fecha_creacion.isoformat() if notificacion.fecha_creacion else None,
+    }
+
+
+# ==========================================================
+# 1. BACKEND EN MEMORIA (un proceso)
+# ==========================================================
+
+class SuscripcionMemoria:
+    def __init__(self, backend, usuario_id):
+        self._backend = backend
+        self.usuario_id = usuario_id
+        self._loop = None
+        self._cola = None
+
+    async def __aenter__(self):
+        self._loop = asyncio.get_running_loop()
+        self._cola = asyncio.Queue(maxsize=TAMANO_COLA)
+        self._backend._agregar(self)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._backend._quitar(self)
+
+    def entregar(self, evento):
+        """Se llama desde cualquier hilo (p.ej. el on_commit de una vista síncrona)."""
+        try:
+            self._loop.call_soon_threadsafe(self._poner, evento)
+        except RuntimeError:
+            # El loop del suscriptor ya terminó
+            self._backend._quitar(self)
+
+    def _poner(self, evento):
+        try:
+            self._cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            pass
+
+    async def recibir(self, timeout):
+        """Devuelve el siguiente evento, o None si no llega ninguno en ``timeout`` s."""
+        try:
+            return await asyncio.wait_for(self._cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class BackendMemoria:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscripciones = defaultdict(set)
+
+    def _agregar(self, suscripcion):
+        with self._lock:
+            self._suscripciones[suscripcion.usuario_id].add(suscripcion)
+
+    def _quitar(self, suscripcion):
+        with self._lock:
+            activas = self._suscripciones.get(suscripcion.usuario_id)
+            if activas is not None:
+                activas.discard(suscripcion)
+                if not activas:
+                    del self._suscripciones[suscripcion.usuario_id]
+
+    def suscribir(self, usuario_id):
+        return SuscripcionMemoria(self, usuario_id)
+
+    def publicar(self, usuario_id, evento):
+        with self._lock:
+            destinos = list(self._suscripciones.get(usuario_id, ()))
+        for suscripcion in destinos:
+            suscripcion.entregar(evento)
+
+
+# ==========================================================
+# 2. BACKEND REDIS (varios procesos / servidores)
+# ==========================================================
+
+class SuscripcionRedis:
+    def __init__(self, url, canal):
+        self._url = url
+        self._canal = canal
+        self._cliente = None
+        self._pubsub = None
+
+    async def __aenter__(self):
+        import redis.asyncio
+
+        self._cliente = redis.asyncio.Redis.from_url(self._url)
+        self._pubsub = self._cliente.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self._canal)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._pubsub.aclose()
+        await self._cliente.aclose()
+
+    async def recibir(self, timeout):
+        mensaje = await self._pubsub.get_message(timeout=timeout)
+        if mensaje is None:
+            return None
+        return json.loads(mensaje['data'])
+
+
+class BackendRedis:
+    def __init__(self, url=None):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImproperlyConfigured("BackendRedis requiere el paquete 'redis' (pip install redis).") from e
+        self._url = url or getattr(settings, 'TIEMPO_REAL_REDIS_URL', 'redis://localhost:6379/0')
+        self._cliente = redis.Redis.from_url(self._url)
+
+    @staticmethod
+    def _canal(usuario_id):
+        return f'optifire:notificaciones:{usuario_id}'
+
+    def suscribir(self, usuario_id):
+        return SuscripcionRedis(self._url, self._canal(usuario_id))
+
+    def publicar(self, usuario_id, evento):
+        self._cliente.publish(self._canal(usuario_id), json.dumps(evento))
+
+
+# ==========================================================
+# 3. API
+# ==========================================================
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def obtener_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            ruta = getattr(settings, 'TIEMPO_REAL_BACKEND', 'usuarios.tiempo_real.BackendMemoria')
+            _backend = import_string(ruta)()
+        return _backend
+
+
+def publicar_notificaciones(notificaciones):
+    """Publica cada notificación en el canal de su destinatario (nunca lanza)."""
+    try:
+        backend = obtener_backend()
+        for notificacion in notificaciones:
+            backend.publicar(notificacion.usuario_id, evento_notificacion(notificacion))
+    except Exception:
+        # Sin tiempo real la notificación igual aparece al recargar
+        logger.exception("Error al publicar notificaciones en tiempo real")
@@ -13,6 +13,10 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('nosotros/', views.nosotros_view, name='nosotros'),
     path('notificacion/leida/<int:pk>/', views.marcar_notificacion_leida, name='marcar_notificacion_leida'),
+    path('notificaciones/', views.bandeja_notificaciones, name='bandeja_notificaciones'),
+    path('notificaciones/marcar-leidas/', views.marcar_notificaciones_leidas, name='marcar_notificaciones_leidas'),
+    path('notificaciones/stream/', views.stream_notificaciones, name='stream_notificaciones'),
+    path('notificaciones/esperar/', views.esperar_notificaciones, name='esperar_notificaciones'),
     path('seguridad/cambiar-password/', CambioContrasenaForzadoView.as_view(), name='cambiar_password_forzado'),
 
     # --- Recuperación de contraseña ---
@@ -29,6 +33,8 @@ urlpatterns = [
 
     #  CALENDARIO (API)
     path('api/tecnico/disponibilidad/<int:tecnico_id>/', views.api_disponibilidad_tecnico, name='api_disponibilidad'),
+    path('api/tecnicos/disponibilidad/', views.api_disponibilidad_tecnicos, name='api_disponibilidad_tecnicos'),
+    path('api/tecnico/ruta/', views.api_ruta_tecnico, name='api_ruta_tecnico'),
 
     # =========================================
     # RUTAS CLIENTE
@@ -45,6 +51,9 @@ urlpatterns = [
     # =========================================
     path('dashboard/tecnico/', views.dashboard_tecnico, name='dashboard_tecnico'),
     path('inspeccion/completar/<int:pk>/', views.completar_inspeccion, name='completar_inspeccion'),
+    # Autoguardado del checklist: una tarea (PATCH JSON) o una foto por request
+    path('api/tarea/<int:pk>/', views.api_tarea_inspeccion, name='api_tarea_inspeccion'),
+    path('api/tarea/<int:pk>/evidencia/', views.api_evidencia_tarea, name='api_evidencia_tarea'),
     path('perfil/tecnico/', views.perfil_tecnico, name='perfil_tecnico'),
     path('dashboard/tecnico/registro/', views.registro_trabajos, name='registro_trabajos'),
 
@@ -66,4 +75,6 @@ urlpatterns = [
     path('admin/facturacion/<int:pk>/', views.enviar_orden_facturacion, name='enviar_orden_facturacion'),
     # Gestión de Solicitudes
     path('solicitud/gestionar/<int:pk>/', views.aprobar_solicitud, name='gestionar_solicitud'),
+    path('solicitud/auto-asignar/', views.auto_asignar_tecnicos, name='auto_asignar_tecnicos'),
+    path('solicitud/cotizar-lote/', views.cotizar_solicitudes_lote, name='cotizar_solicitudes_lote'),
 ]
\ No newline at end of file
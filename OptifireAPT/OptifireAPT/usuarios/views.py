@@ -6,20 +6,38 @@ from django.forms import inlineformset_factory
 from django.utils import timezone
 from django.db import transaction
 from django.urls import reverse
-from django.http import HttpResponse
+from django.http import HttpResponse, FileResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.template.loader import render_to_string
-from weasyprint import HTML
 from django.http import JsonResponse
 from .models import Notificacion 
 from django.contrib.auth.views import PasswordChangeView
 from django.urls import reverse_lazy
 from django.contrib.auth import update_session_auth_hash
-from django.core.mail import EmailMessage # <--- OJO: EmailMessage, no EmailMultiAlternatives
 from django.conf import settings
-from django.db.models import Count, Q
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
 from django.http import JsonResponse
 from django.utils import timezone
+import asyncio
 import datetime
+import json
+
+from .actas import huella_acta, obtener_acta, obtener_tareas_acta, pregenerar_acta
+from .asignacion import asignar_pendientes, ranking_tecnicos
+from .checklist import guardar_checklist, guardar_tareas, iniciar_inspeccion
+from .correos import encolar_correo
+from .cotizaciones import DETALLE_COTIZACION, cotizar_lote
+from .disponibilidad import MAX_TECNICOS, huella as huella_disponibilidad, ocupacion_tecnicos, rango_consulta
+from .notificaciones import contar_no_leidas, marcar_leidas, notificar_lote, notificar_rol, usuarios_con_rol
+from .paginacion import paginar_keyset
+from .plantillas import catalogo_plantillas, clonar_tareas, tareas_plantilla
+from .pdf import renderizar_pdf
+from .roles import tiene_rol
+from .routers import leer_de_replica
+from .rutas import agenda_tecnico
+from .tiempo_real import admite_conexiones_largas, evento_notificacion, obtener_backend
+from django.views.decorators.http import require_GET, require_POST, require_http_methods
 
 # Importamos formularios
 from .forms import (
@@ -30,6 +48,10 @@ from .forms import (
     UsuarioPerfilForm, 
     TecnicoPerfilForm, 
     ClientePerfilForm , 
+    FiltroListadoForm,
+    CotizacionLoteForm,
+    TareaAutoguardadoForm,
+    EvidenciaTareaForm,
 )
 
 # Importamos los Modelos y las NUEVAS CLASES DE CONSTANTES
@@ -41,6 +63,8 @@ from .models import (
     EstadoSolicitud,    # <--- Esto reemplaza a los strings 'PENDIENTE', etc.
     EstadoInspeccion, 
     EstadoTarea,
+    ResumenDiarioSolicitudes,
+    ResumenTecnicoEstado,
     SolicitudInspeccion, 
     TareaInspeccion, 
     TareaPlantilla
@@ -52,13 +76,59 @@ User = get_user_model()
 # 1. LOGICA DE PERMISOS (Centralizada)
 # ==========================================================
 def check_role(user, role_name):
-    # Usamos .value para comparar con el string del nombre del grupo
-    return user.is_authenticated and user.groups.filter(name=role_name).exists()
+    # Los roles se resuelven una sola vez por request (ver usuarios/roles.py)
+    return user.is_authenticated and tiene_rol(user, role_name)
 
 def is_cliente(user): return check_role(user, Roles.CLIENTE)
 def is_administrador(user): return check_role(user, Roles.ADMINISTRADOR) or user.is_superuser
 def is_tecnico(user): return check_role(user, Roles.TECNICO)
 
+# ==========================================================
+# 1.1 FILTROS DE LISTADOS (Se usan con paginar_keyset)
+# ==========================================================
+def aplicar_filtros(queryset, filtros, campo_fecha=None, campo_tecnico=None, prefijo_solicitud=''):
+    """
+    Aplica en la BD los filtros válidos de un FiltroListadoForm.
+    ``prefijo_solicitud`` permite filtrar Inspecciones por datos de su solicitud.
+    """
+    if not filtros.is_valid():
+        return queryset
+    datos = filtros.cleaned_data
+
+    if datos.get('estado'):
+        queryset = queryset.filter(estado=datos['estado'])
+
+    # Rango de fechas como rango de datetime (usa el índice, a diferencia de __date)
+    if campo_fecha and datos.get('desde'):
+        inicio = timezone.make_aware(datetime.datetime.combine(datos['desde'], datetime.time.min))
+        queryset = queryset.filter(**{f'{campo_fecha}__gte': inicio})
+    if campo_fecha and datos.get('hasta'):
+        fin = timezone.make_aware(datetime.datetime.combine(datos['hasta'] + datetime.timedelta(days=1), datetime.time.min))
+        queryset = queryset.filter(**{f'{campo_fecha}__lt': fin})
+
+    if campo_tecnico and datos.get('tecnico'):
+        queryset = queryset.filter(**{campo_tecnico: datos['tecnico']})
+
+    if datos.get('cliente'):
+        texto = datos['cliente']
+        queryset = queryset.filter(
+            Q(**{f'{prefijo_solicitud}nombre_cliente__icontains': texto}) |
+            Q(**{f'{prefijo_solicitud}apellido_cliente__icontains': texto}) |
+            Q(**{f'{prefijo_solicitud}cliente__username__icontains': texto})
+        )
+
+    if datos.get('rol'):
+        queryset = queryset.filter(groups__name=datos['rol'])
+
+    if datos.get('buscar'):
+        texto = datos['buscar']
+        queryset = queryset.filter(
+            Q(username__icontains=texto) | Q(email__icontains=texto) |
+            Q(first_name__icontains=texto) | Q(last_name__icontains=texto)
+        )
+
+    return queryset
+
 # ==========================================================
 # 2. AUTENTICACIÓN Y REDIRECCIÓN
 # ==========================================================
@@ -128,33 +198,58 @@ def nosotros_view(request):
 @login_required
 @user_passes_test(is_administrador)
 def dashboard_administrador(request):
-    solicitudes_pendientes = SolicitudInspeccion.objects.filter(
-        estado=EstadoSolicitud.PENDIENTE
-    ).order_by('-fecha_solicitud')
+    filtros = FiltroListadoForm(request.GET, campos=('desde', 'hasta', 'cliente'))
+    solicitudes_pendientes = aplicar_filtros(
+        SolicitudInspeccion.objects.filter(estado=EstadoSolicitud.PENDIENTE).select_related('tecnico_preasignado'),
+        filtros, campo_fecha='fecha_solicitud'
+    )
+    pagina = paginar_keyset(request, solicitudes_pendientes, ('fecha_solicitud', 'id'))
     
     return render(request, 'dashboards/admin_dashboard.html', {
-        'solicitudes_pendientes': solicitudes_pendientes
+        'solicitudes_pendientes': pagina,
+        'pagina': pagina,
+        'filtros': filtros,
+        'form_cotizacion': CotizacionLoteForm(),
     })
 
 @login_required
 @user_passes_test(is_administrador)
+@leer_de_replica
 def historial_solicitudes(request):
-    historial = SolicitudInspeccion.objects.exclude(estado=EstadoSolicitud.PENDIENTE).order_by('-fecha_solicitud')
-    return render(request, 'dashboards/admin/historial_solicitudes.html', {'historial': historial})
+    estados = [e for e in EstadoSolicitud.choices if e[0] != EstadoSolicitud.PENDIENTE]
+    filtros = FiltroListadoForm(request.GET, campos=('estado', 'desde', 'hasta', 'tecnico', 'cliente'), estados=estados)
+    historial = aplicar_filtros(
+        SolicitudInspeccion.objects.exclude(estado=EstadoSolicitud.PENDIENTE),
+        filtros, campo_fecha='fecha_solicitud', campo_tecnico='inspeccion__tecnico'
+    )
+    pagina = paginar_keyset(request, historial, ('fecha_solicitud', 'id'))
+    return render(request, 'dashboards/admin/historial_solicitudes.html', {
+        'historial': pagina,
+        'pagina': pagina,
+        'filtros': filtros,
+    })
 
 @login_required
 @user_passes_test(is_administrador)
 def admin_usuarios_list(request):
-    usuarios = User.objects.all().order_by('username').prefetch_related('groups')
+    filtros = FiltroListadoForm(request.GET, campos=('rol', 'buscar'))
+    usuarios = aplicar_filtros(User.objects.all(), filtros).prefetch_related('groups')
+    pagina = paginar_keyset(request, usuarios, ('username',), descendente=False)
+
+    nombres_roles = [r.value for r in Roles]
     usuarios_info = []
-    for usuario in usuarios:
-        # Buscamos si el usuario pertenece a alguno de nuestros roles definidos
-        grupo = usuario.groups.filter(name__in=[r.value for r in Roles]).first()
+    for usuario in pagina:
+        # Buscamos el rol entre los grupos ya precargados (sin consulta por fila)
+        rol = next((g.name for g in usuario.groups.all() if g.name in nombres_roles), None)
         usuarios_info.append({
             'obj': usuario,
-            'rol': grupo.name if grupo else 'Sin rol',
+            'rol': rol or 'Sin rol',
         })
-    return render(request, 'dashboards/admin/usuarios_list.html', {'usuarios_info': usuarios_info})
+    return render(request, 'dashboards/admin/usuarios_list.html', {
+        'usuarios_info': usuarios_info,
+        'pagina': pagina,
+        'filtros': filtros,
+    })
 
 @login_required
 @user_passes_test(is_administrador)
@@ -230,7 +325,7 @@ def aprobar_solicitud(request, pk):
 
                         # Guardar datos de cotización y preasignación en campos persistentes
                         solicitud.monto_cotizacion = monto_cotizacion
-                        solicitud.detalle_cotizacion = f"Cotización generada por el administrador."
+                        solicitud.detalle_cotizacion = DETALLE_COTIZACION
                         solicitud.tecnico_preasignado = tecnico
                         solicitud.plantilla_preasignada = plantilla
                         solicitud.nombre_inspeccion_preasignado = nombre_inspeccion
@@ -249,51 +344,109 @@ def aprobar_solicitud(request, pk):
         elif action == 'rechazar':
             motivo = request.POST.get('motivo_rechazo')
             if motivo:
-                solicitud.estado = EstadoSolicitud.RECHAZADA
-                solicitud.motivo_rechazo = motivo
-                solicitud.save()
+                with transaction.atomic():
+                    solicitud.estado = EstadoSolicitud.RECHAZADA
+                    solicitud.motivo_rechazo = motivo
+                    solicitud.save()
                 messages.warning(request, "Solicitud rechazada.")
                 return redirect('dashboard_administrador')
             else:
                 messages.error(request, "Indica un motivo de rechazo.")
 
+    # Técnicos ordenados por el motor de asignación (el primero es el recomendado)
+    candidatos = ranking_tecnicos(solicitud)
+    recomendado = solicitud.tecnico_preasignado_id or (candidatos[0].tecnico.pk if candidatos else None)
     context = {
         'solicitud': solicitud,
-        'tecnicos': User.objects.filter(groups__name=Roles.TECNICO),
-        'plantillas': PlantillaInspeccion.objects.all()
+        'candidatos': candidatos,
+        'tecnico_recomendado': recomendado,
+        'plantillas': catalogo_plantillas(),
     }
     return render(request, 'dashboards/admin/gestionar_solicitud.html', context)
 
+@login_required
+@user_passes_test(is_administrador)
+@require_POST
+def cotizar_solicitudes_lote(request):
+    """
+    Cotiza de una vez las solicitudes marcadas en el panel con los mismos
+    técnico/plantilla/monto/fecha. Las que fallan se informan una por una.
+    """
+    form = CotizacionLoteForm(request.POST)
+    try:
+        ids = [int(pk) for pk in request.POST.getlist('solicitudes')]
+    except ValueError:
+        ids = []
+    if not ids:
+        messages.error(request, "Selecciona al menos una solicitud.")
+        return redirect('dashboard_administrador')
+    if not form.is_valid():
+        for campo, errores in form.errors.items():
+            etiqueta = form.fields[campo].label if campo in form.fields else campo
+            messages.error(request, f"{etiqueta}: {' '.join(errores)}")
+        return redirect('dashboard_administrador')
+
+    datos = form.cleaned_data
+    resultado = cotizar_lote(
+        ids, datos['plantilla'], datos['monto_cotizacion'],
+        tecnico=datos['tecnico'], fecha=datos['fecha_programada'], nombre=datos['nombre_inspeccion'],
+    )
+    if resultado.cotizadas:
+        messages.success(request, f"Se enviaron {len(resultado.cotizadas)} cotización(es) a los clientes.")
+    for pk, motivo in resultado.fallidas:
+        messages.warning(request, f"Solicitud #{pk}: {motivo}")
+    return redirect('dashboard_administrador')
+
+@login_required
+@user_passes_test(is_administrador)
+@require_POST
+def auto_asignar_tecnicos(request):
+    """Preasigna técnico a todas las solicitudes PENDIENTES que no tienen uno."""
+    asignaciones = asignar_pendientes()
+    if asignaciones:
+        messages.success(request, f"Se preasignó técnico a {len(asignaciones)} solicitud(es) pendiente(s).")
+    else:
+        messages.info(request, "No hay solicitudes pendientes sin técnico (o no hay técnicos activos).")
+    return redirect('dashboard_administrador')
+
 # ==========================================================
 # 4. VISTAS TÉCNICO
 # ==========================================================
 @login_required
 @user_passes_test(is_tecnico)
 def dashboard_tecnico(request):
-    estados_activos = [EstadoInspeccion.ASIGNADA, EstadoInspeccion.EN_CURSO]
-    inspecciones = Inspeccion.objects.filter(
-        tecnico=request.user,
-        estado__in=estados_activos
-    ).select_related('solicitud').order_by('fecha_programada')
+    # Cada día ordenado como ruta (comuna por comuna) desde la base del técnico
+    base, agenda = agenda_tecnico(request.user.pk)
 
     return render(request, 'dashboards/tecnico/tecnico_dashboard.html', {
-        'inspecciones_asignadas': inspecciones
+        'agenda': agenda,
+        'base_ruta': base,
+        'inspecciones_asignadas': [parada.inspeccion for dia in agenda for parada in dia.paradas],
     })
 
 
 @login_required
 @user_passes_test(is_tecnico)
+@leer_de_replica
 def registro_trabajos(request):
     """
     Lista las inspecciones completadas por el técnico logueado.
     """
-    inspecciones = Inspeccion.objects.filter(
-        tecnico=request.user,
-        estado=EstadoInspeccion.COMPLETADA
-    ).select_related('solicitud').order_by('-fecha_finalizacion')
+    filtros = FiltroListadoForm(request.GET, campos=('desde', 'hasta', 'cliente'))
+    inspecciones = aplicar_filtros(
+        Inspeccion.objects.filter(
+            tecnico=request.user,
+            estado=EstadoInspeccion.COMPLETADA
+        # Las OT antiguas sin fecha de finalización se ordenan por su creación
+        ).annotate(fecha_orden=Coalesce('fecha_finalizacion', 'fecha_creacion')),
+        filtros, campo_fecha='fecha_orden', prefijo_solicitud='solicitud__'
+    ).select_related('solicitud').prefetch_related('tareas')
+    pagina = paginar_keyset(request, inspecciones, ('fecha_orden', 'id'))
 
     return render(request, 'dashboards/tecnico/registro_trabajos.html', {
-        'inspecciones_completadas': inspecciones
+        'inspecciones_completadas': pagina,
+        'pagina': pagina,
+        'filtros': filtros,
     })
 
 @login_required
@@ -317,25 +470,31 @@ def completar_inspeccion(request, pk):
         formset = TareaFormSet(request.POST, request.FILES, instance=inspeccion) # <--- ¡AQUÍ!
         
         if formset.is_valid():
-            formset.save()
             inspeccion.comentarios_generales = request.POST.get('comentarios_generales')
             action = request.POST.get('action')
-            
+
+            # Solo las tareas que cambiaron, en un bulk_update y en la misma
+            # transacción que la inspección (usuarios/checklist.py)
+            with guardar_checklist(formset):
+                if action == 'terminar':
+                    inspeccion.estado = EstadoInspeccion.COMPLETADA
+                    inspeccion.fecha_finalizacion = timezone.now()
+                    inspeccion.save()
+                    if inspeccion.solicitud:
+                        inspeccion.solicitud.estado = EstadoSolicitud.COMPLETADA
+                        inspeccion.solicitud.save()
+                    # El acta queda lista en disco para la primera descarga
+                    transaction.on_commit(lambda: pregenerar_acta(inspeccion.pk))
+                else:
+                    if inspeccion.estado == EstadoInspeccion.ASIGNADA:
+                        inspeccion.estado = EstadoInspeccion.EN_CURSO
+                    inspeccion.save()
+
             if action == 'terminar':
-                inspeccion.estado = EstadoInspeccion.COMPLETADA
-                inspeccion.fecha_finalizacion = timezone.now()
-                inspeccion.save()
-                if inspeccion.solicitud:
-                    inspeccion.solicitud.estado = EstadoSolicitud.COMPLETADA
-                    inspeccion.solicitud.save()
                 messages.success(request, "Inspección completada.")
-                return redirect('dashboard_tecnico')
             else:
-                if inspeccion.estado == EstadoInspeccion.ASIGNADA:
-                    inspeccion.estado = EstadoInspeccion.EN_CURSO
-                inspeccion.save()
                 messages.success(request, "Progreso guardado (con fotos).")
-                return redirect('dashboard_tecnico') # Recargar para ver las fotos
+            return redirect('dashboard_tecnico') # Recargar para ver las fotos
     else:
         formset = TareaFormSet(instance=inspeccion)
 
@@ -344,6 +503,68 @@ def completar_inspeccion(request, pk):
         'formset': formset
     })
 
+# ----------------------------------------------------------
+# AUTOGUARDADO DEL CHECKLIST (static/js/checklist_autoguardado.js)
+# Cada cambio viaja solo: una tarea en JSON o una foto, no el formset entero.
+# ----------------------------------------------------------
+
+def _tarea_del_tecnico(request, pk):
+    """Tarea de una OT del técnico logueado. None si la OT ya está finalizada."""
+    tarea = get_object_or_404(
+        TareaInspeccion.objects.select_related('inspeccion'), pk=pk, inspeccion__tecnico=request.user
+    )
+    return None if tarea.inspeccion.estado == EstadoInspeccion.COMPLETADA else tarea
+
+def _errores_json(form):
+    return JsonResponse({'status': 'error', 'errores': form.errors.get_json_data()}, status=400)
+
+@login_required
+@user_passes_test(is_tecnico)
+@require_http_methods(['PATCH'])
+def api_tarea_inspeccion(request, pk):
+    """
+    Cuerpo JSON con ``estado`` y/u ``observacion``. Escribe solo las
+    columnas que cambiaron; sin cambios no toca la BD.
+    """
+    tarea = _tarea_del_tecnico(request, pk)
+    if tarea is None:
+        return JsonResponse({'status': 'error', 'mensaje': "La inspección ya está finalizada."}, status=409)
+    try:
+        cambios = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'status': 'error', 'mensaje': 'JSON inválido'}, status=400)
+    if not isinstance(cambios, dict) or not cambios or set(cambios) - set(TareaAutoguardadoForm._meta.fields):
+        return JsonResponse({'status': 'error', 'mensaje': "Indique estado y/u observacion."}, status=400)
+
+    form = TareaAutoguardadoForm(cambios, instance=tarea)
+    if not form.is_valid():
+        return _errores_json(form)
+    if form.changed_data:
+        with guardar_tareas([tarea], form.changed_data):
+            iniciar_inspeccion(tarea.inspeccion)
+
+    return JsonResponse({
+        'status': 'ok', 'tarea': tarea.pk, 'guardados': form.changed_data,
+        'estado': tarea.estado, 'observacion': tarea.observacion or '',
+    })
+
+@login_required
+@user_passes_test(is_tecnico)
+@require_POST
+def api_evidencia_tarea(request, pk):
+    """Sube UNA foto (``imagen_evidencia``, multipart) a la tarea."""
+    tarea = _tarea_del_tecnico(request, pk)
+    if tarea is None:
+        return JsonResponse({'status': 'error', 'mensaje': "La inspección ya está finalizada."}, status=409)
+
+    form = EvidenciaTareaForm(request.POST, request.FILES, instance=tarea)
+    if not form.is_valid():
+        return _errores_json(form)
+    with guardar_tareas([tarea], ['imagen_evidencia']):
+        iniciar_inspeccion(tarea.inspeccion)
+
+    return JsonResponse({'status': 'ok', 'tarea': tarea.pk, 'url': tarea.imagen_evidencia.url})
+
 @login_required
 @user_passes_test(is_tecnico)
 def perfil_tecnico(request):
@@ -379,8 +600,17 @@ def perfil_tecnico(request):
 @login_required
 @user_passes_test(is_cliente)
 def dashboard_cliente(request):
-    solicitudes = SolicitudInspeccion.objects.filter(cliente=request.user).order_by('-fecha_solicitud')
-    return render(request, 'dashboards/cliente_dashboard.html', {'solicitudes': solicitudes})
+    filtros = FiltroListadoForm(request.GET, campos=('estado', 'desde', 'hasta'))
+    solicitudes = aplicar_filtros(
+        SolicitudInspeccion.objects.filter(cliente=request.user),
+        filtros, campo_fecha='fecha_solicitud'
+    )
+    pagina = paginar_keyset(request, solicitudes, ('fecha_solicitud', 'id'))
+    return render(request, 'dashboards/cliente_dashboard.html', {
+        'solicitudes': pagina,
+        'pagina': pagina,
+        'filtros': filtros,
+    })
 
 
 # Nueva vista: aceptar o rechazar cotización
@@ -402,24 +632,18 @@ def aceptar_cotizacion_cliente(request, pk):
             if all([tecnico, plantilla, nombre_inspeccion]):
                 try:
                     with transaction.atomic():
+                        # Tareas de la versión vigente de la plantilla (registro en cache)
+                        foto = tareas_plantilla(plantilla)
                         nueva_inspeccion = Inspeccion.objects.create(
                             solicitud=solicitud,
                             tecnico=tecnico,
                             plantilla_base=plantilla,
+                            version_plantilla=foto.version,
                             nombre_inspeccion=nombre_inspeccion,
                             fecha_programada=fecha_programada if fecha_programada else None,
                             estado=EstadoInspeccion.ASIGNADA
                         )
-                        tareas_plantilla = TareaPlantilla.objects.filter(plantilla=plantilla)
-                        tareas_a_crear = [
-                            TareaInspeccion(
-                                inspeccion=nueva_inspeccion,
-                                plantilla_tarea=tp,
-                                descripcion=tp.descripcion,
-                                estado=EstadoTarea.PENDIENTE
-                            ) for tp in tareas_plantilla
-                        ]
-                        TareaInspeccion.objects.bulk_create(tareas_a_crear)
+                        clonar_tareas(nueva_inspeccion, foto)
                         solicitud.estado = EstadoSolicitud.APROBADA
                         # Limpiar preasignación
                         solicitud.tecnico_preasignado = None
@@ -427,22 +651,19 @@ def aceptar_cotizacion_cliente(request, pk):
                         solicitud.nombre_inspeccion_preasignado = None
                         solicitud.fecha_programada_preasignada = None
                         solicitud.save()
-                        # Notificación interna al admin y técnico
-                        from .models import Notificacion, Roles
-                        # Notificar a todos los admins
-                        from django.contrib.auth.models import User
-                        for admin in User.objects.filter(groups__name=Roles.ADMINISTRADOR):
-                            Notificacion.objects.create(
-                                usuario=admin,
-                                mensaje=f"El cliente {solicitud.cliente.username} aceptó la cotización de la solicitud #{solicitud.pk}.",
-                                enlace=f"/usuarios/solicitud/detalle/{solicitud.pk}/"
-                            )
-                        # Notificar al técnico asignado
-                        Notificacion.objects.create(
-                            usuario=tecnico,
-                            mensaje=f"Te han asignado una nueva inspección por aceptación de cotización (solicitud #{solicitud.pk}).",
-                            enlace=f"/usuarios/inspeccion/completar/{nueva_inspeccion.pk}/"
-                        )
+                        # Notificación interna a todos los admins y al técnico (un solo INSERT)
+                        notificar_lote([
+                            (
+                                usuarios_con_rol(Roles.ADMINISTRADOR),
+                                f"El cliente {request.user.username} aceptó la cotización de la solicitud #{solicitud.pk}.",
+                                f"/usuarios/solicitud/detalle/{solicitud.pk}/",
+                            ),
+                            (
+                                tecnico,
+                                f"Te han asignado una nueva inspección por aceptación de cotización (solicitud #{solicitud.pk}).",
+                                f"/usuarios/inspeccion/completar/{nueva_inspeccion.pk}/",
+                            ),
+                        ])
                         messages.success(request, "Cotización aceptada. Inspección asignada al técnico.")
                         return redirect('dashboard_cliente')
                 except Exception as e:
@@ -450,16 +671,14 @@ def aceptar_cotizacion_cliente(request, pk):
             else:
                 messages.error(request, "Faltan datos de preasignación. Contacte al administrador.")
         elif action == 'rechazar':
-            solicitud.estado = EstadoSolicitud.RECHAZADA
-            solicitud.save()
-            # Notificación interna a los admins
-            from .models import Notificacion, Roles
-            from django.contrib.auth.models import User
-            for admin in User.objects.filter(groups__name=Roles.ADMINISTRADOR):
-                Notificacion.objects.create(
-                    usuario=admin,
-                    mensaje=f"El cliente {solicitud.cliente.username} rechazó la cotización de la solicitud #{solicitud.pk}.",
-                    enlace=f"/usuarios/solicitud/detalle/{solicitud.pk}/"
+            with transaction.atomic():
+                solicitud.estado = EstadoSolicitud.RECHAZADA
+                solicitud.save()
+                # Notificación interna a los admins
+                notificar_rol(
+                    Roles.ADMINISTRADOR,
+                    f"El cliente {request.user.username} rechazó la cotización de la solicitud #{solicitud.pk}.",
+                    f"/usuarios/solicitud/detalle/{solicitud.pk}/"
                 )
             messages.warning(request, "Has rechazado la cotización. La solicitud ha sido cancelada.")
             return redirect('dashboard_cliente')
@@ -544,12 +763,12 @@ def editar_perfil(request):
 @login_required
 def descargar_acta(request, pk):
     # 1. Obtener la inspección
-    inspeccion = get_object_or_404(Inspeccion, pk=pk)
+    inspeccion = get_object_or_404(Inspeccion.objects.select_related('solicitud', 'tecnico'), pk=pk)
     
     # 2. Validación de seguridad: Solo dueño, técnico o admin pueden verla
     es_autorizado = (
-        request.user == inspeccion.tecnico or 
-        request.user == inspeccion.solicitud.cliente or 
+        request.user.pk == inspeccion.tecnico_id or 
+        (inspeccion.solicitud is not None and request.user.pk == inspeccion.solicitud.cliente_id) or 
         is_administrador(request.user)
     )
     
@@ -557,20 +776,25 @@ def descargar_acta(request, pk):
         messages.error(request, "No tienes permiso para ver este documento.")
         return redirect('dashboard')
 
-    # 3. Generar el HTML en memoria usando el template que creamos
-    html_string = render_to_string('pdf/acta_inspeccion.html', {
-        'inspeccion': inspeccion,
-        'tareas': inspeccion.tareas.all()
-    })
-    
-    # 4. Convertir a PDF usando WeasyPrint
-    response = HttpResponse(content_type='application/pdf')
+    # 3. Huella del contenido actual: si el navegador ya tiene esta versión, 304
+    tareas = obtener_tareas_acta(inspeccion)
+    huella = huella_acta(inspeccion, tareas)
+    etag = f'"{huella}"'
+
+    no_modificado = get_conditional_response(request, etag=etag)
+    if no_modificado is not None:
+        return no_modificado
+
+    # 4. Servir el PDF desde el cache en disco (se genera solo si no existe)
+    ruta, _ = obtener_acta(inspeccion, tareas, huella)
     filename = f"Acta_OT_{inspeccion.id}.pdf"
     
     # 'inline' abre el PDF en el navegador. Si prefieres descarga directa, cambia a 'attachment'
+    response = FileResponse(open(ruta, 'rb'), content_type='application/pdf')
     response['Content-Disposition'] = f'inline; filename="{filename}"'
-    
-    HTML(string=html_string).write_pdf(response)
+    response['ETag'] = etag
+    # Privado (requiere login) y siempre revalidado con el ETag
+    patch_cache_control(response, private=True, no_cache=True)
     
     return response
 
@@ -581,17 +805,173 @@ def marcar_notificacion_leida(request, pk):
     Solo permite modificar notificaciones que pertenezcan al usuario actual.
     """
     if request.method == 'GET':
-        # Buscamos la notificación asegurando que sea del usuario logueado (Seguridad)
-        notif = get_object_or_404(Notificacion, pk=pk, usuario=request.user)
-        
-        # Cambiamos el estado
-        notif.leido = True
-        notif.save()
-        
+        # Filtramos por el usuario logueado (Seguridad): un solo UPDATE, sin SELECT previo.
+        # Solo si no cambió nada verificamos si existe (ya leída vs. ajena/inexistente).
+        if not marcar_leidas(request.user.pk, [pk]) and not Notificacion.objects.filter(pk=pk, usuario=request.user).exists():
+            return JsonResponse({'status': 'error'}, status=404)
+
         return JsonResponse({'status': 'ok', 'mensaje': 'Notificación marcada como leída'})
     
     return JsonResponse({'status': 'error'}, status=400)
 
+@login_required
+@require_POST
+def marcar_notificaciones_leidas(request):
+    """
+    Marca varias notificaciones en un solo UPDATE.
+    Cuerpo JSON ``{"ids": [1, 2, 3]}`` o ``{"todas": true}`` (también acepta formulario).
+    """
+    if request.content_type == 'application/json':
+        try:
+            datos = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'status': 'error', 'mensaje': 'JSON inválido'}, status=400)
+        todas, ids = datos.get('todas'), datos.get('ids')
+    else:
+        todas, ids = request.POST.get('todas'), request.POST.getlist('ids')
+
+    if todas:
+        actualizadas = marcar_leidas(request.user.pk)
+    else:
+        try:
+            ids = [int(i) for i in (ids or [])]
+        except (TypeError, ValueError):
+            return JsonResponse({'status': 'error', 'mensaje': 'ids inválidos'}, status=400)
+        if not ids:
+            return JsonResponse({'status': 'error', 'mensaje': 'Indique ids o todas'}, status=400)
+        actualizadas = marcar_leidas(request.user.pk, ids)
+
+    return JsonResponse({'status': 'ok', 'actualizadas': actualizadas})
+
+@login_required
+@require_GET
+def bandeja_notificaciones(request):
+    """
+    Bandeja paginada por cursor (``?despues=`` / ``?antes=``), más recientes
+    primero. ``?solo_no_leidas=1`` filtra las pendientes.
+    """
+    notificaciones = Notificacion.objects.filter(usuario=request.user).only(
+        'id', 'mensaje', 'enlace', 'leido', 'fecha_creacion'
+    )
+    if request.GET.get('solo_no_leidas'):
+        notificaciones = notificaciones.filter(leido=False)
+
+    pagina = paginar_keyset(request, notificaciones, ('fecha_creacion', 'id'), contar=False)
+    return JsonResponse({
+        'notificaciones': [
+            dict(evento_notificacion(n), leido=n.leido) for n in pagina
+        ],
+        'siguiente': pagina.url_siguiente,
+        'anterior': pagina.url_anterior,
+        'no_leidas': contar_no_leidas(request.user.pk),
+    })
+
+# ----------------------------------------------------------
+# NOTIFICACIONES EN TIEMPO REAL (SSE + long-poll)
+# ----------------------------------------------------------
+
+def _id_desde(request):
+    """Último id que el navegador ya tiene (Last-Event-ID al reconectar o ?desde=)."""
+    valor = request.headers.get('Last-Event-ID') or request.GET.get('desde')
+    try:
+        return max(int(valor), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+async def _notificaciones_desde(usuario_id, desde):
+    limite = getattr(settings, 'NOTIFICACIONES_MAX_VISIBLES', 5)
+    consulta = Notificacion.objects.filter(
+        usuario_id=usuario_id, leido=False, pk__gt=desde
+    ).order_by('-pk')[:limite]
+    return [evento_notificacion(n) async for n in consulta][::-1]
+
+
+async def _eventos_nuevos(suscripcion, usuario_id, desde, segundos, hasta_el_primero=False):
+    """
+    Genera listas de eventos con id > ``desde`` durante ``segundos``: primero
+    lo pendiente en la BD y luego lo que llegue por el pub/sub. Genera una
+    lista vacía en cada latido (para mantener viva la conexión SSE).
+    """
+    loop = asyncio.get_running_loop()
+    limite = loop.time() + segundos
+    latido = getattr(settings, 'TIEMPO_REAL_LATIDO', 15)
+
+    # La suscripción ya está activa: lo que se cree ahora no se pierde
+    pendientes = await _notificaciones_desde(usuario_id, desde)
+    if pendientes:
+        yield pendientes
+        if hasta_el_primero:
+            return
+        desde = pendientes[-1]['id']
+
+    while (restante := limite - loop.time()) > 0:
+        evento = await suscripcion.recibir(min(restante, latido))
+        if evento is None:
+            yield []
+            continue
+        if evento.get('id') and evento['id'] <= desde:
+            continue
+        desde = evento.get('id') or desde
+        yield [evento]
+        if hasta_el_primero:
+            return
+
+
+@login_required
+async def stream_notificaciones(request):
+    """
+    Server-Sent Events con las notificaciones nuevas del usuario. La conexión
+    queda abierta TIEMPO_REAL_DURACION_STREAM segundos y el EventSource del
+    navegador se reconecta solo. Solo bajo ASGI: bajo WSGI la conexión
+    retendría un hilo del servidor, así que responde 204 (el EventSource deja
+    de reconectarse) y el template usa ``esperar_notificaciones``.
+    """
+    if not admite_conexiones_largas(request):
+        return HttpResponse(status=204)
+    usuario = await request.auser()
+    desde = _id_desde(request)
+    segundos = getattr(settings, 'TIEMPO_REAL_DURACION_STREAM', 300)
+
+    async def eventos():
+        yield 'retry: 3000\n\n'
+        async with obtener_backend().suscribir(usuario.pk) as suscripcion:
+            async for lote in _eventos_nuevos(suscripcion, usuario.pk, desde, segundos):
+                if not lote:
+                    yield ': latido\n\n'
+                for evento in lote:
+                    yield f"id: {evento['id']}\nevent: notificacion\ndata: {json.dumps(evento)}\n\n"
+
+    response = StreamingHttpResponse(eventos(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: no acumular el stream
+    return response
+
+
+@login_required
+async def esperar_notificaciones(request):
+    """
+    Long-poll: responde apenas haya notificaciones con id > ?desde=, o una
+    lista vacía tras TIEMPO_REAL_ESPERA segundos. Bajo WSGI no espera:
+    responde de inmediato con lo pendiente y el navegador vuelve a consultar
+    cada TIEMPO_REAL_INTERVALO_WSGI segundos.
+    """
+    usuario = await request.auser()
+    desde = _id_desde(request)
+    if not admite_conexiones_largas(request):
+        notificaciones = await _notificaciones_desde(usuario.pk, desde)
+    else:
+        notificaciones = []
+        async with obtener_backend().suscribir(usuario.pk) as suscripcion:
+            segundos = getattr(settings, 'TIEMPO_REAL_ESPERA', 25)
+            async for lote in _eventos_nuevos(suscripcion, usuario.pk, desde, segundos, hasta_el_primero=True):
+                notificaciones.extend(lote)
+
+    return JsonResponse({
+        'notificaciones': notificaciones,
+        'ultimo_id': max([desde] + [n['id'] for n in notificaciones if n['id']]),
+    })
+
 class CambioContrasenaForzadoView(PasswordChangeView):
     template_name = 'registration/password_change_force.html'
     success_url = reverse_lazy('dashboard') # Redirige al dashboard al terminar
@@ -636,7 +1016,7 @@ def enviar_orden_facturacion(request, pk):
 
     # 4. Generar PDF en memoria
     html_string = render_to_string('pdf/orden_facturacion.html', context)
-    pdf_file = HTML(string=html_string).write_pdf()
+    pdf_file = renderizar_pdf(html_string, 'orden_facturacion')
 
     # 5. Configurar Correo
     asunto = f"Orden de Facturación - OT #{solicitud.id} - {solicitud.nombre_cliente}"
@@ -654,24 +1034,18 @@ def enviar_orden_facturacion(request, pk):
     
     email_destino = getattr(settings, 'EMAIL_COBRANZA_DESTINO', 'admin@localhost')
 
-    try:
-        email = EmailMessage(
-            asunto,
-            mensaje,
-            settings.DEFAULT_FROM_EMAIL,
-            [email_destino], # Destinatario (Cobranzas)
-        )
-        # Adjuntar el PDF generado
-        email.attach(f'Orden_Facturacion_{solicitud.id}.pdf', pdf_file, 'application/pdf')
-        email.send()
-        
-        messages.success(request, f"Orden de facturación enviada correctamente a {email_destino}")
-        
-    except Exception as e:
-        messages.error(request, f"Error al enviar correo: {e}")
+    # El envío real lo hace el worker de la bandeja de salida (enviar_correos)
+    encolar_correo(
+        asunto=asunto,
+        cuerpo_texto=mensaje,
+        destinatarios=[email_destino], # Destinatario (Cobranzas)
+        adjunto=(f'Orden_Facturacion_{solicitud.id}.pdf', pdf_file, 'application/pdf'),
+    )
+    messages.success(request, f"Orden de facturación encolada para envío a {email_destino}")
 
     return redirect('dashboard_administrador')
 @login_required
+@leer_de_replica
 def estadisticas_view(request):
     user = request.user
     role = None
@@ -686,40 +1060,45 @@ def estadisticas_view(request):
         role = 'cliente'
 
     # 2. Lógica según Rol
+    # Admin y técnico leen SOLO los resúmenes (usuarios/estadisticas.py):
+    # el costo no depende del tamaño de las tablas de solicitudes/inspecciones.
     if role == 'admin':
         # A. OTs Semanales
-        hoy = timezone.now()
-        hace_una_semana = hoy - datetime.timedelta(days=7)
-        ots_semanales = SolicitudInspeccion.objects.filter(
-            fecha_solicitud__gte=hace_una_semana
-        ).extra(select={'day': 'date(fecha_solicitud)'}).values('day').annotate(count=Count('id')).order_by('day')
+        hace_una_semana = timezone.localdate() - datetime.timedelta(days=7)
+        ots_semanales = ResumenDiarioSolicitudes.objects.filter(
+            fecha__gte=hace_una_semana
+        ).values('fecha').annotate(cantidad=Sum('total')).filter(cantidad__gt=0).order_by('fecha')
 
         # B. Carga de Técnicos
-        tecnicos_carga = User.objects.filter(groups__name='Técnico').annotate(
-            carga_trabajo=Count('inspecciones_asignadas', filter=Q(inspecciones_asignadas__estado__in=['ASIGNADA', 'EN_CURSO']))
+        tecnicos_carga = User.objects.filter(groups__name=Roles.TECNICO).only('id', 'username').annotate(
+            carga_trabajo=Coalesce(Sum(
+                'resumen_inspecciones__total',
+                filter=Q(resumen_inspecciones__estado__in=[EstadoInspeccion.ASIGNADA, EstadoInspeccion.EN_CURSO])
+            ), 0)
         ).order_by('carga_trabajo')
 
         # C. Estados Globales
-        estados_globales = SolicitudInspeccion.objects.values('estado').annotate(total=Count('estado'))
+        estados_globales = ResumenDiarioSolicitudes.objects.values('estado').annotate(
+            cantidad=Sum('total')
+        ).filter(cantidad__gt=0).order_by('estado')
 
         context = {
             'role': 'admin',
-            'labels_semana': [entry['day'] for entry in ots_semanales],
-            'data_semana': [entry['count'] for entry in ots_semanales],
+            'labels_semana': [entry['fecha'].isoformat() for entry in ots_semanales],
+            'data_semana': [entry['cantidad'] for entry in ots_semanales],
             'labels_tecnicos': [t.username for t in tecnicos_carga],
             'data_carga': [t.carga_trabajo for t in tecnicos_carga],
             'labels_estados': [e['estado'] for e in estados_globales],
-            'data_estados': [e['total'] for e in estados_globales],
+            'data_estados': [e['cantidad'] for e in estados_globales],
         }
 
     elif role == 'tecnico':
-        mis_inspecciones = Inspeccion.objects.filter(tecnico=user)
-        resumen = mis_inspecciones.values('estado').annotate(total=Count('estado'))
+        resumen = ResumenTecnicoEstado.objects.filter(tecnico=user, total__gt=0).order_by('estado')
         context = {
             'role': 'tecnico',
-            'labels_estado': [item['estado'] for item in resumen],
-            'data_estado': [item['total'] for item in resumen],
-            'total_completadas': mis_inspecciones.filter(estado='COMPLETADA').count()
+            'labels_estado': [item.estado for item in resumen],
+            'data_estado': [item.total for item in resumen],
+            'total_completadas': sum(item.total for item in resumen if item.estado == EstadoInspeccion.COMPLETADA)
         }
 
     elif role == 'cliente':
@@ -732,11 +1111,107 @@ def estadisticas_view(request):
         }
 
     return render(request, 'dashboards/estadisticas.html', context)
+# ----------------------------------------------------------
+# DISPONIBILIDAD DE TÉCNICOS (usuarios/disponibilidad.py)
+# ----------------------------------------------------------
+
+def _respuesta_disponibilidad(request, tecnico_ids, desde, hasta, armar):
+    """
+    Responde 304 si el navegador ya tiene esta versión (sin consultar la BD);
+    si no, arma el JSON con ``armar(ocupacion)`` desde el cache.
+    """
+    huella = huella_disponibilidad(tecnico_ids, desde, hasta)
+    etag = f'"{huella}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(armar(ocupacion_tecnicos(tecnico_ids, desde, hasta, clave=huella)))
+    response['ETag'] = etag
+    # Privado y siempre revalidado: la invalidación cambia el ETag al instante
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def _fecha_parametro(request, nombre):
+    valor = request.GET.get(nombre)
+    return datetime.date.fromisoformat(valor) if valor else None
+
+@login_required
+@user_passes_test(is_administrador)
+@require_GET
+def api_disponibilidad_tecnicos(request):
+    """
+    Ocupación diaria de varios técnicos en un rango:
+    ``?tecnicos=1,2,3&desde=AAAA-MM-DD&hasta=AAAA-MM-DD``
+    -> ``{"tecnicos": {"1": {"AAAA-MM-DD": 2, ...}, ...}}`` (solo días ocupados).
+    """
+    try:
+        tecnico_ids = sorted({
+            int(pk) for valor in request.GET.getlist('tecnicos') for pk in valor.split(',') if pk.strip()
+        })
+        desde, hasta = rango_consulta(_fecha_parametro(request, 'desde'), _fecha_parametro(request, 'hasta'))
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=400)
+    if not tecnico_ids or len(tecnico_ids) > MAX_TECNICOS:
+        return JsonResponse({'status': 'error', 'mensaje': f"Indique entre 1 y {MAX_TECNICOS} técnicos."}, status=400)
+
+    return _respuesta_disponibilidad(request, tecnico_ids, desde, hasta, lambda ocupacion: {
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'tecnicos': {str(pk): dias for pk, dias in ocupacion.items()},
+    })
+
+@login_required
+@user_passes_test(is_administrador)
+@require_GET
 def api_disponibilidad_tecnico(request, tecnico_id):
-    ocupadas = Inspeccion.objects.filter(
-        tecnico_id=tecnico_id,
-        estado__in=[EstadoInspeccion.ASIGNADA, EstadoInspeccion.EN_CURSO],
-        fecha_programada__isnull=False
-    ).values_list('fecha_programada', flat=True)
-    return JsonResponse({'fechas_ocupadas': [f.strftime('%Y-%m-%d') for f in ocupadas]})
+    """Compatibilidad: fechas ocupadas de un técnico desde hoy."""
+    desde, hasta = rango_consulta(None, None)
+    return _respuesta_disponibilidad(request, [tecnico_id], desde, hasta, lambda ocupacion: {
+        'fechas_ocupadas': sorted(ocupacion[tecnico_id]),
+    })
+
+def _parada_json(parada):
+    inspeccion = parada.inspeccion
+    comuna = parada.comuna
+    return {
+        'orden': parada.orden,
+        'inspeccion_id': inspeccion.pk,
+        'solicitud_id': inspeccion.solicitud_id,
+        'nombre': inspeccion.nombre_inspeccion,
+        'estado': inspeccion.estado,
+        'direccion': inspeccion.solicitud.direccion if inspeccion.solicitud else None,
+        'comuna': comuna.nombre if comuna else None,
+        'latitud': comuna.latitud if comuna else None,
+        'longitud': comuna.longitud if comuna else None,
+        'km_tramo': parada.km_tramo,
+        'enlace': reverse('completar_inspeccion', args=[inspeccion.pk]),
+    }
+
+@login_required
+@user_passes_test(lambda u: is_tecnico(u) or is_administrador(u))
+@require_GET
+def api_ruta_tecnico(request):
+    """
+    Agenda ordenada como ruta: ``?desde=AAAA-MM-DD&hasta=AAAA-MM-DD``.
+    El administrador puede consultar la de otro técnico con ``?tecnico=<id>``.
+    """
+    tecnico_id = request.user.pk
+    try:
+        if is_administrador(request.user) and request.GET.get('tecnico'):
+            tecnico_id = int(request.GET['tecnico'])
+        desde, hasta = _fecha_parametro(request, 'desde'), _fecha_parametro(request, 'hasta')
+    except ValueError:
+        return JsonResponse({'status': 'error', 'mensaje': "Parámetros inválidos."}, status=400)
+
+    base, agenda = agenda_tecnico(tecnico_id, desde, hasta)
+    return JsonResponse({
+        'tecnico': tecnico_id,
+        'base': base.nombre if base else None,
+        'dias': [{
+            'fecha': dia.fecha.isoformat() if dia.fecha else None,
+            'km_total': dia.km_total,
+            'sin_ubicacion': dia.sin_ubicacion,
+            'paradas': [_parada_json(p) for p in dia.paradas],
+        } for dia in agenda],
+    })
 # ==========================================================
\ No newline at end of file